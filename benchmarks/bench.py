@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Model benchmark: load time, prefill speed, time-to-first-token and decode rate.
+
+    python benchmarks/bench.py                                   # configured model and device
+    python benchmarks/bench.py --models a.gguf b.gguf --devices cpu gpu --prompt-lengths 32 512 2048
+    python benchmarks/bench.py --out today.json --baseline last_week.json
+    python benchmarks/bench.py --stub --render                   # no weights: Python/rendering overhead only
+
+Results are written as JSON with --out (or printed with --json). With
+--baseline the run is compared metric by metric against an earlier report and
+the exit status is 1 if anything regressed by more than --threshold.
+--stub swaps GPT4All for the deterministic StubGPT4All; its timing comes from
+the ONYX_STUB_* environment variables (see core/stub.py).
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.bench import compare, environment, load_report, run_case, save_report
+from core.config import ConfigManager
+
+STUB_MODEL = "stub-model.gguf"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model load, prefill, TTFT and decode speed.")
+    parser.add_argument("--models", nargs="+", help="Model files to benchmark (default: configured model)")
+    parser.add_argument("--devices", nargs="+", help="Devices: cpu, gpu, nvidia, amd, intel (default: configured)")
+    parser.add_argument("--prompt-lengths", nargs="+", type=int, default=[32, 512],
+                        help="Approximate prompt sizes in tokens (default: 32 512)")
+    parser.add_argument("--max-tokens", type=int, default=128, help="Tokens generated per run (default: 128)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per prompt length; the median is kept")
+    parser.add_argument("--render", action="store_true", help="Also stream tokens through the chat renderer")
+    parser.add_argument("--stub", action="store_true", help="Use the deterministic stub model (no weights)")
+    parser.add_argument("--config", default="config.yaml", help="Config file for model path and defaults")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--json", action="store_true", help="Print the JSON report")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent (default: 10)")
+    args = parser.parse_args(argv)
+
+    from core.engine import ModelEngine
+    model_class = None
+    config = ConfigManager(args.config)
+    if args.stub:
+        from core.stub import StubGPT4All
+        model_class = StubGPT4All
+        config.settings.model_path = tempfile.mkdtemp(prefix="onyx-bench-")
+    # The benchmark never writes the config back; it only changes settings in memory.
+    engine = ModelEngine(config, model_class=model_class)
+    models = args.models or [STUB_MODEL if args.stub else config.settings.model_name]
+    devices = args.devices or [config.settings.device]
+
+    results = []
+    failed = False
+    for model_name in models:
+        for device in devices:
+            print(f"Benchmarking {model_name} on {device}...", file=sys.stderr)
+            try:
+                # Engine progress messages go to stderr so --json output stays parseable
+                with contextlib.redirect_stdout(sys.stderr):
+                    results += run_case(engine, model_name, device, args.prompt_lengths,
+                                        args.max_tokens, args.repeat, args.render)
+            except Exception as e:
+                print(f"  skipped: {e}", file=sys.stderr)
+                failed = True
+            engine.pool.clear()
+            engine.model = None
+            engine.current_model_name = None
+
+    env = environment(stub=args.stub)
+    if args.out:
+        save_report(args.out, results, env)
+    if args.json:
+        print(json.dumps({"environment": env, "results": results}, indent=2))
+    else:
+        print_results(results)
+
+    if args.baseline:
+        rows = compare(results, load_report(args.baseline)["results"], args.threshold / 100)
+        print_comparison(rows)
+        if any(row[-1] for row in rows):
+            return 1
+    return 1 if failed and not results else 0
+
+
+def print_results(results: list):
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    print(f"{'model':<40} {'device':<7} {'prompt':>6} {'cold s':>7} {'warm s':>7} "
+          f"{'prefill t/s':>11} {'TTFT ms':>8} {'decode t/s':>10}")
+    for r in results:
+        print(f"{r['model'][:40]:<40} {r['device']:<7} {fmt(r['prompt_tokens'], 'g'):>6} "
+              f"{fmt(r['load_cold_s'], '.3f'):>7} {fmt(r['load_warm_s'], '.3f'):>7} "
+              f"{fmt(r['prefill_tok_s'], '.1f'):>11} {fmt(r['ttft_ms'], '.1f'):>8} "
+              f"{fmt(r['decode_tok_s'], '.1f'):>10}"
+              + (f"  render {r['render_us_per_token']:.1f} us/token" if r.get("render_us_per_token") is not None else ""))
+
+
+def print_comparison(rows: list):
+    if not rows:
+        print("\nNo matching entries in the baseline.")
+        return
+    print("\nChange vs baseline:")
+    for (model, device, length), metric, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"  {model[:32]:<32} {device:<7} {length:>5}  {metric:<20} {old:>10.4g} -> {new:<10.4g} "
+              f"{change * 100:+6.1f}%{flag}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
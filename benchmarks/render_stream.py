@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Render microbenchmark for the chat stream.
+
+Replays a recorded token stream through the legacy renderer (re-parse the
+whole reply as Markdown on every token) and through StreamingMarkdown, and
+reports render CPU time per token for each.
+
+    python benchmarks/render_stream.py
+    python benchmarks/render_stream.py --stream tokens.json --json
+
+A recorded stream is a JSON list of token strings. Without --stream a
+synthetic ~4k token reply (prose, lists, tables and code fences) is used.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rich.console import Console
+from rich.live import Live
+from rich.markdown import Markdown
+
+from core.render import StreamingMarkdown
+
+REFRESH_PER_SECOND = 10  # Same rate as chat_mode
+
+
+def synthetic_stream(target_tokens: int = 4000, seed: int = 1234) -> list:
+    """Builds a deterministic long reply and splits it into token-sized pieces."""
+    rng = random.Random(seed)
+    words = ("the model streams tokens into the terminal while markdown blocks are "
+             "parsed rendered frozen and kept on screen for the user to read").split()
+    sections = []
+    n = 0
+    while n < target_tokens * 4:  # ~4 chars per token
+        kind = n // 300 % 4
+        if kind == 0:
+            text = " ".join(rng.choice(words) for _ in range(60)) + ".\n\n"
+        elif kind == 1:
+            text = "".join(f"{i}. **{rng.choice(words)}** {' '.join(rng.choice(words) for _ in range(8))}\n"
+                           for i in range(1, 6)) + "\n"
+        elif kind == 2:
+            rows = "".join(f"| {rng.choice(words)} | {rng.randint(1, 999)} | {rng.choice(words)} |\n" for _ in range(6))
+            text = "| Name | Value | Note |\n|---|---|---|\n" + rows + "\n"
+        else:
+            body = "".join(f"    x_{i} = compute({i}, '{rng.choice(words)}')\n" for i in range(8))
+            text = f"## Step {n // 300}\n\n```python\ndef step():\n{body}    return x_0\n```\n\n"
+        sections.append(text)
+        n += len(text)
+
+    full = "".join(sections)
+    tokens = []
+    i = 0
+    while i < len(full):
+        size = rng.randint(1, 6)
+        tokens.append(full[i:i + size])
+        i += size
+    return tokens
+
+
+def load_stream(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _console() -> Console:
+    return Console(file=io.StringIO(), force_terminal=True, width=100, color_system="truecolor")
+
+
+def _paced(tokens: list, tokens_per_second: float):
+    delay = 1.0 / tokens_per_second if tokens_per_second else 0
+    for token in tokens:
+        if delay:
+            time.sleep(delay)
+        yield token
+
+
+def run_legacy(tokens: list, tokens_per_second: float = 0) -> dict:
+    """The pre-StreamingMarkdown chat_mode loop."""
+    console = _console()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    with Live(console=console, refresh_per_second=REFRESH_PER_SECOND) as live:
+        full_response = ""
+        for token in _paced(tokens, tokens_per_second):
+            full_response += token
+            live.update(Markdown(full_response))
+    return _result("legacy", tokens, start_wall, start_cpu)
+
+
+def run_streaming(tokens: list, tokens_per_second: float = 0) -> dict:
+    console = _console()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    with Live(console=console, refresh_per_second=REFRESH_PER_SECOND) as live:
+        renderer = StreamingMarkdown(live)
+        for token in _paced(tokens, tokens_per_second):
+            renderer.feed(token)
+        renderer.close()
+    result = _result("streaming", tokens, start_wall, start_cpu)
+    result["frames"] = renderer.frames
+    return result
+
+
+def _result(name: str, tokens: list, start_wall: float, start_cpu: float) -> dict:
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start_wall
+    return {
+        "renderer": name,
+        "tokens": len(tokens),
+        "cpu_s": round(cpu, 4),
+        "wall_s": round(wall, 4),
+        "cpu_us_per_token": round(cpu / max(len(tokens), 1) * 1e6, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chat stream rendering.")
+    parser.add_argument("--stream", help="JSON file with a recorded list of tokens")
+    parser.add_argument("--tokens", type=int, default=4000, help="Synthetic stream length (default: 4000)")
+    parser.add_argument("--tps", type=float, default=0,
+                        help="Replay rate in tokens/sec (default: 0, as fast as possible)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run StreamingMarkdown")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    tokens = load_stream(args.stream) if args.stream else synthetic_stream(args.tokens)
+
+    results = [run_streaming(tokens, args.tps)]
+    if not args.skip_legacy:
+        results.append(run_legacy(tokens, args.tps))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        extra = f"  frames={r['frames']}" if "frames" in r else ""
+        print(f"{r['renderer']:>10}: {r['tokens']} tokens  cpu={r['cpu_s']:.3f}s  "
+              f"wall={r['wall_s']:.3f}s  {r['cpu_us_per_token']:.1f} us/token{extra}")
+
+
+if __name__ == "__main__":
+    main()
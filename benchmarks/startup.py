@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time and time-to-menu of main.py.
+
+Runs `main.py --time-to-menu` (which draws the main menu once and exits) in a
+fresh interpreter several times with -X importtime, and reports:
+
+  - time-to-menu as measured inside the process and as wall time of the process
+  - the slowest imports (cumulative)
+  - heavy modules that were imported before the menu appeared (should be none)
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --max-ms 500 --json
+
+Exits with status 1 if the median time-to-menu exceeds --max-ms or a heavy
+module was imported on the way to the menu.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the menu must not wait for: they are imported when first needed.
+HEAVY_MODULES = ("gpt4all", "requests", "rich.markdown", "numpy")
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_once(stub: bool = True) -> dict:
+    cmd = [sys.executable, "-X", "importtime", os.path.join(ROOT, "main.py"), "--time-to-menu"]
+    if stub:
+        cmd.append("--stub")
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, timeout=60)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"main.py --time-to-menu failed:\n{proc.stderr[-2000:]}")
+
+    match = re.search(r"time-to-menu: ([\d.]+) ms", proc.stdout)
+    imports = {}
+    for line in proc.stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if m:
+            imports[m.group(4)] = int(m.group(2)) / 1000  # cumulative ms
+    return {"menu_ms": float(match.group(1)) if match else None, "wall_ms": wall_ms, "imports": imports}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time and time-to-menu.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreter runs; the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--max-ms", type=float, default=1000, help="Fail if median time-to-menu exceeds this")
+    parser.add_argument("--real", action="store_true", help="Use the configured model class instead of the stub")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(stub=not args.real) for _ in range(args.runs)]
+    last_imports = runs[-1]["imports"]
+    heavy = sorted(m for m in last_imports if m.split(".")[0] in HEAVY_MODULES or m in HEAVY_MODULES)
+    top_level = {name: ms for name, ms in last_imports.items() if "." not in name or name.startswith("core.")}
+    slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    result = {
+        "runs": args.runs,
+        "menu_ms": round(statistics.median(r["menu_ms"] for r in runs), 1),
+        "wall_ms": round(statistics.median(r["wall_ms"] for r in runs), 1),
+        "slowest_imports_ms": {name: round(ms, 1) for name, ms in slowest},
+        "heavy_imports": heavy,
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"time-to-menu: {result['menu_ms']:.1f} ms in-process, {result['wall_ms']:.1f} ms wall "
+              f"(median of {args.runs})")
+        print("slowest imports (cumulative):")
+        for name, ms in result["slowest_imports_ms"].items():
+            print(f"  {ms:8.1f} ms  {name}")
+        if heavy:
+            print(f"heavy modules imported before the menu: {', '.join(heavy)}")
+
+    if result["menu_ms"] > args.max_ms or heavy:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import ctypes
+import functools
+import re
+
+from core.pool import available_ram_gb
+from core.tuning import DEFAULT_KNOBS
+
+# Before a model is built, its estimated footprint (weights from the GGUF size,
+# KV cache for the context length) is compared with the memory that can hold
+# it: available RAM plus whatever evicting other resident models would free on
+# the CPU, the GPU's memory on a GPU device. If it does not fit, in this order:
+# a shorter context (down to MIN_CTX), the largest smaller quantization of the
+# same model that fits (downloaded ones, then catalog ones), or a refusal.
+# Building it anyway would push the host into swap for minutes before failing.
+
+HEADROOM_GB = 0.5  # Left for the OS and the app itself
+MIN_CTX = 1024
+# "...-7B-DPO.Q4_0.gguf", "...-q4_k_m.gguf", "...-f16.gguf": the quantization just before the extension
+QUANT_SUFFIX = re.compile(r"[.\-_](?:I?Q\d[A-Z0-9_]*|F16|F32|BF16)(?=\.gguf$)", re.IGNORECASE)
+
+
+class Admission:
+    """What loading a model on a device will do: load | reduce_context | fallback | refuse."""
+    def __init__(self, action: str, requested: str, model_name: str, device: str, n_ctx: int,
+                 footprint_gb: float = None, available_gb: float = None, memory: str = "RAM",
+                 requested_gb: float = None, download: bool = False, free_gb: float = 0.0):
+        self.action = action
+        self.requested = requested
+        self.model_name = model_name    # What will actually be loaded
+        self.device = device
+        self.n_ctx = n_ctx
+        self.footprint_gb = footprint_gb
+        self.available_gb = available_gb  # None when the memory could not be checked
+        self.memory = memory
+        self.requested_gb = requested_gb  # Footprint of the requested model at the requested context
+        self.download = download          # The fallback variant has to be downloaded first
+        self.free_gb = free_gb            # Resident models to evict beyond the pool budget to make room
+
+    @property
+    def ok(self) -> bool:
+        return self.action != "refuse"
+
+    def short(self) -> str:
+        """A few characters for a table column."""
+        if self.action == "reduce_context":
+            return f"ctx {self.n_ctx}"
+        if self.action == "fallback":
+            match = QUANT_SUFFIX.search(self.model_name)
+            return "→ " + (match.group(0)[1:] if match else self.model_name)
+        if self.action == "refuse":
+            return "✗ too big"
+        return "✓" if self.available_gb is not None else "?"
+
+    def describe(self) -> str:
+        if self.available_gb is None:
+            return f"{self.model_name}: {self.memory} not checked."
+        room = f"{self.available_gb:.1f} GB {self.memory} available"
+        if self.action == "load":
+            return f"{self.model_name} fits: ~{self.footprint_gb:.1f} GB of {room}."
+        if self.action == "reduce_context":
+            return (f"{self.model_name} needs ~{self.requested_gb:.1f} GB with its full context; "
+                    f"loading with a {self.n_ctx}-token context (~{self.footprint_gb:.1f} GB of {room}).")
+        if self.action == "fallback":
+            return (f"{self.requested} needs ~{self.requested_gb:.1f} GB but only {room}; "
+                    f"loading the smaller {self.model_name} instead (~{self.footprint_gb:.1f} GB"
+                    + (", downloaded first)." if self.download else ")."))
+        return (f"{self.requested} needs ~{self.requested_gb:.1f} GB but only {room}, "
+                f"and no smaller context or quantization fits. Not loading it.")
+
+
+def check_admission(engine, name: str, device: str, keep=()) -> Admission:
+    """Decides how (and whether) `name` can be loaded on `device` with the memory available now."""
+    n_ctx = engine.tuning.get(name, device).get("n_ctx") or DEFAULT_KNOBS["n_ctx"]
+    if (name, device) in engine.pool or getattr(engine._model_class(), "weightless", False):
+        return Admission("load", name, name, device, n_ctx, memory="memory")  # Nothing to allocate
+
+    available, memory = _available_gb(engine, device, keep)
+    if available is None:
+        return Admission("load", name, name, device, n_ctx, memory=memory)
+    requested_gb = engine._footprint_gb(name, n_ctx)
+
+    def decide(action, model_name, ctx, footprint, download=False):
+        ram_now = available_ram_gb() - HEADROOM_GB
+        free = max(0.0, footprint - ram_now) if memory == "RAM" else 0.0
+        return Admission(action, name, model_name, device, ctx, footprint, available, memory,
+                         requested_gb, download, free)
+
+    if requested_gb <= available:
+        return decide("load", name, n_ctx, requested_gb)
+
+    kv_hint = (engine.registry.entry(name) or {}).get("kv_bytes_per_token")
+    if kv_hint:
+        ctx = n_ctx // 2
+        while ctx >= MIN_CTX:
+            footprint = engine._footprint_gb(name, ctx)
+            if footprint <= available:
+                return decide("reduce_context", name, ctx, footprint)
+            ctx //= 2
+
+    local = engine.registry.files()
+    for variant in smaller_variants(engine, name):
+        footprint = engine._footprint_gb(variant, n_ctx, kv_hint)
+        if footprint <= available:
+            return decide("fallback", variant, n_ctx, footprint, download=variant not in local)
+    return decide("refuse", name, n_ctx, requested_gb)
+
+
+def smaller_variants(engine, name: str) -> list:
+    """Other quantizations of the same model (local or in the catalog), largest first, smaller than `name`."""
+    match = QUANT_SUFFIX.search(name)
+    if match is None:
+        return []
+    stem = name[:match.start()].lower()
+    candidates = set(engine.registry.files())
+    candidates.update(entry.get("filename") for entry in engine.catalog_entries() if entry.get("filename"))
+    size = engine.model_size(name)
+    variants = []
+    for filename in candidates:
+        other = QUANT_SUFFIX.search(filename)
+        if filename == name or other is None or filename[:other.start()].lower() != stem:
+            continue
+        variant_size = engine.model_size(filename)
+        if variant_size and (size is None or variant_size < size):
+            variants.append((variant_size, filename))
+    return [filename for _, filename in sorted(variants, reverse=True)]
+
+
+def _available_gb(engine, device: str, keep) -> tuple:
+    if device == "cpu":
+        return available_ram_gb() + engine.pool.evictable_gb(keep) - HEADROOM_GB, "RAM"
+    vram = gpu_memory_gb(engine._model_class(), device)
+    if vram is None:
+        return None, "VRAM"
+    # Models kept on the same GPU stay there; the others would be evicted
+    kept = sum(engine.pool.footprint_gb(key) for key in keep if key and key[1] == device)
+    return vram - kept - HEADROOM_GB, "VRAM"
+
+
+def gpu_memory_gb(model_class, device: str):
+    """Memory of the largest GPU that `device` selects, in GB, or None if it cannot be told."""
+    if not model_class.__module__.startswith("gpt4all"):
+        return None
+    sizes = [heap for backend, name, vendor, heap in _gpu_devices() if _selects(device, backend, name, vendor)]
+    return max(sizes) / 1024 ** 3 if sizes else None
+
+
+@functools.lru_cache(maxsize=1)
+def _gpu_devices() -> tuple:
+    # GPT4All.list_gpus() only returns names; the heap sizes come from the same ctypes call
+    try:
+        from gpt4all import _pyllmodel
+        count = ctypes.c_int32(0)
+        devices = _pyllmodel.llmodel.llmodel_available_gpu_devices(0, ctypes.byref(count))
+        if not devices:
+            return ()
+        return tuple((d.backend.decode(), d.name.decode(), (d.vendor or b"").decode().lower(), d.heapSize)
+                     for d in devices[:count.value])
+    except Exception:
+        return ()
+
+
+def _selects(device: str, backend: str, name: str, vendor: str) -> bool:
+    if ":" in device:  # An exact "backend:name" from list_gpus()
+        return device == f"{backend}:{name}"
+    if device in ("cuda", "kompute"):
+        return backend == device
+    if device in ("nvidia", "amd", "intel"):
+        return device in vendor or device in name.lower()
+    return device == "gpu"
@@ -0,0 +1,190 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+# Batch mode: prompts from a JSONL file through a pool of worker processes.
+#
+# Input, one object per line:  {"id": "doc-1", "prompt": "...", "system": "...",
+#                               "max_tokens": 256, "temperature": 0.2, "top_k": 40}
+# Only "prompt" is required; "id" defaults to the line number. Every prompt is
+# answered as a chat turn after its system message (empty when "system" is not
+# given), so all records in a file get the same prompt format.
+# Output, one object per line, in input order:
+#   {"id": "doc-1", "index": 0, "response": "...", "prompt_tokens": 812,
+#    "completion_tokens": 143, "seconds": 4.2}          (or "error": "...")
+#
+# Each worker process loads its own model on the CPU and is pinned to its own
+# `threads` of the machine's cores. The output file doubles as the checkpoint: a rerun skips
+# every index already in it. Failed prompts are retried on a rerun, so an index
+# can appear again after its error line; the last line for an index wins.
+
+_engine = None  # Per worker process
+_load_error = None  # Set when the worker's model failed to load
+
+
+def _init_worker(config_path: str, model_name: str, threads: int, stub: bool, defaults: dict):
+    global _engine, _load_error
+    from core.config import ConfigManager
+    from core.engine import ModelEngine
+
+    _pin_worker(threads)
+    config = ConfigManager(config_path, read_only=True)  # The overrides below stay in this process
+    config.settings.device = "cpu"
+    config.settings.metrics_path = ""  # The batch runner reports throughput itself
+    config.settings.model_name = model_name or config.settings.model_name
+    for key, value in defaults.items():
+        if value is not None:
+            setattr(config.settings, key, value)
+    model_class = None
+    if stub:
+        from core.stub import StubGPT4All
+        model_class = StubGPT4All
+
+    _engine = ModelEngine(config, model_class=model_class)
+    # Raising here would make the pool respawn the worker forever; _run_item reports it instead
+    try:
+        loaded = _engine.load_model(persist=False)
+    except Exception as e:
+        loaded, _load_error = False, str(e)
+    if not loaded:
+        _load_error = _load_error or f"could not load {config.settings.model_name}"
+        return
+    set_threads = getattr(_engine.model.model, "set_thread_count", None)
+    if threads and set_threads:
+        set_threads(threads)
+
+
+def _pin_worker(threads: int):
+    """Pins this worker to its own `threads` cores, picked by its number in the pool."""
+    if not threads or not hasattr(os, "sched_setaffinity"):
+        return
+    cpus = sorted(os.sched_getaffinity(0))
+    shares = len(cpus) // threads
+    if shares < 2:
+        return  # One share or less: nothing to keep apart
+    identity = multiprocessing.current_process()._identity
+    slot = (identity[0] - 1) % shares if identity else 0
+    os.sched_setaffinity(0, cpus[slot * threads:(slot + 1) * threads])
+
+
+def _run_item(item: tuple) -> dict:
+    index, record = item
+    if _load_error:
+        return {"fatal": f"Worker {os.getpid()}: {_load_error}"}
+    result = {"id": record.get("id", index), "index": index}
+    start = time.perf_counter()
+    try:
+        history = [{"role": "system", "content": record.get("system") or ""}]
+        tokens = []
+        for token in _engine.generate_stateless(record["prompt"], history=history,
+                                                max_tokens=record.get("max_tokens"),
+                                                temperature=record.get("temperature"),
+                                                top_k=record.get("top_k")):
+            tokens.append(token)
+        context = _engine.context_tokens()
+        result["response"] = "".join(tokens)
+        result["prompt_tokens"] = max(context - len(tokens), 0) if context is not None else None
+        result["completion_tokens"] = len(tokens)
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def read_done(out_path: str) -> set:
+    """Indexes already in the output file. A torn last line from a crash is cut off."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    good_bytes = 0
+    with open(out_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            good_bytes += len(line)
+            if "error" not in record:
+                done.add(record["index"])
+    if good_bytes != os.path.getsize(out_path):
+        with open(out_path, "r+b") as f:
+            f.truncate(good_bytes)
+    return done
+
+
+def read_items(in_path: str, skip: set):
+    """(index, record) pairs from the input file, minus those in `skip`."""
+    with open(in_path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            line = line.strip()
+            if not line or index in skip:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            yield index, record
+
+
+def default_workers(threads: int = None) -> int:
+    cores = os.cpu_count() or 1
+    return max(1, cores // (threads or 4))
+
+
+def run_batch(in_path: str, out_path: str, workers: int = None, threads: int = None,
+              config_path: str = "config.yaml", model_name: str = None, stub: bool = False,
+              defaults: dict = None, report_every: float = 5.0) -> dict:
+    """
+    Processes every prompt in `in_path` not yet in `out_path`. Returns a summary
+    with items/sec and generated tokens/sec. Raises RuntimeError when a worker
+    cannot load the model.
+    """
+    cores = os.cpu_count() or 1
+    workers = workers or default_workers(threads)
+    threads = threads or max(1, cores // workers)
+    done = read_done(out_path)
+    with open(in_path, "r", encoding="utf-8") as f:
+        total = sum(1 for line in f if line.strip())
+    remaining = total - len(done)
+    if done:
+        print(f"Resuming: {len(done)} of {total} prompts already in {out_path}.", file=sys.stderr)
+    if remaining <= 0:
+        return {"items": 0, "total": total, "seconds": 0.0, "items_per_s": 0.0, "tokens_per_s": 0.0, "errors": 0}
+    print(f"Batch: {remaining} prompts, {workers} workers x {threads} threads.", file=sys.stderr)
+
+    ctx = multiprocessing.get_context("spawn")  # Fresh interpreters: no model state shared through fork
+    start = time.perf_counter()
+    processed = tokens = errors = 0
+    last_report = start
+    with ctx.Pool(workers, initializer=_init_worker,
+                  initargs=(config_path, model_name, threads, stub, defaults or {})) as pool, \
+            open(out_path, "a", encoding="utf-8") as out:
+        try:
+            # imap returns results in input order, so the output stays ordered
+            for result in pool.imap(_run_item, read_items(in_path, done), chunksize=1):
+                if "fatal" in result:
+                    pool.terminate()
+                    raise RuntimeError(result["fatal"])
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                processed += 1
+                tokens += result.get("completion_tokens") or 0
+                errors += "error" in result
+                now = time.perf_counter()
+                if now - last_report >= report_every:
+                    last_report = now
+                    elapsed = now - start
+                    print(f"  {processed}/{remaining} done, {processed / elapsed:.2f} prompts/s, "
+                          f"{tokens / elapsed:.1f} tokens/s", file=sys.stderr)
+        except KeyboardInterrupt:
+            pool.terminate()
+            print(f"\nInterrupted after {processed} prompts; rerun the same command to resume.", file=sys.stderr)
+            raise
+
+    elapsed = time.perf_counter() - start
+    return {"items": processed, "total": total, "seconds": round(elapsed, 2),
+            "items_per_s": round(processed / elapsed, 3), "tokens_per_s": round(tokens / elapsed, 1),
+            "errors": errors, "workers": workers, "threads": threads}
@@ -0,0 +1,199 @@
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Measurements for one (model, device, prompt length) combination:
+#   load_cold_s     first construction of the model in this process
+#   load_warm_s     construction again after eviction (weights in the OS page cache)
+#   load_resident_s switching back to the model while it is still in the pool
+#   prefill_tok_s   prompt tokens evaluated per second (no generation)
+#   ttft_ms         fresh context: prompt sent -> first token out
+#   decode_tok_s    generated tokens per second after the first one
+#   render_us_per_token  StreamingMarkdown cost per token (with --render)
+
+# Direction of "better" for each metric, used by compare().
+METRICS = {
+    "load_cold_s": "lower",
+    "load_warm_s": "lower",
+    "load_resident_s": "lower",
+    "prefill_tok_s": "higher",
+    "ttft_ms": "lower",
+    "decode_tok_s": "higher",
+    "render_us_per_token": "lower",
+}
+
+_FILLER = ("local models answer questions about code history science and travel while the "
+           "benchmark measures how quickly the prompt is read and the reply is written").split()
+
+
+def filler_prompt(tokens: int) -> str:
+    """A deterministic prompt of roughly `tokens` tokens (about 4 characters each)."""
+    words = []
+    length = 0
+    i = 0
+    while length < tokens * 4:
+        word = _FILLER[i % len(_FILLER)]
+        words.append(word)
+        length += len(word) + 1
+        i += 1
+    return " ".join(words) + "\n\nSummarize the text above in one sentence."
+
+
+def measure_load(engine, model_name: str, device: str) -> dict:
+    """Cold, warm and resident load times of `model_name` on `device`."""
+    settings = engine.config.settings
+    settings.model_name = model_name
+    settings.device = device
+    key = (model_name, device)
+
+    def load():
+        engine.reset_session(quiet=True)  # The open session belongs to the model being dropped
+        engine.model = None
+        engine.current_model_name = None
+        start = time.perf_counter()
+        if not engine.load_model(model_name, persist=False):
+            raise RuntimeError(f"Could not load {model_name} on {device}.")
+        if engine.current_model_name != model_name:
+            raise RuntimeError(f"{model_name} does not fit on {device}; "
+                               f"{engine.current_model_name} was loaded instead.")
+        return time.perf_counter() - start
+
+    engine.pool.evict(key)
+    cold = load()
+    engine.pool.evict(key)
+    warm = load()
+    resident = load()
+    return {"load_cold_s": round(cold, 4), "load_warm_s": round(warm, 4), "load_resident_s": round(resident, 4)}
+
+
+def measure_prefill(engine, prompt: str, n_batch: int = 512) -> dict:
+    """Evaluates `prompt` on a fresh context without generating."""
+    engine.reset_session(quiet=True)
+    start = time.perf_counter()
+    engine.model.model.prompt_model(prompt, "%1%2", lambda token_id, response: True,
+                                    n_batch=n_batch, n_predict=0, reset_context=True, special=True)
+    elapsed = time.perf_counter() - start
+    tokens = engine.context_tokens() or 0
+    return {"prompt_tokens": tokens, "prefill_tok_s": round(tokens / elapsed, 1) if elapsed else None}
+
+
+def measure_generation(engine, prompt: str, max_tokens: int = 128, render: bool = False) -> dict:
+    """Time to first token and decode rate for one completion on a fresh context."""
+    renderer = None
+    if render:
+        from rich.console import Console
+        from rich.live import Live
+        from core.render import StreamingMarkdown
+        console = Console(file=io.StringIO(), force_terminal=True, width=100)
+        live = Live(console=console, refresh_per_second=10)
+        live.start()
+        renderer = StreamingMarkdown(live)
+
+    render_s = 0.0
+    generated = 0
+    first = None
+    start = time.perf_counter()
+    try:
+        for token in engine.generate_stateless(prompt, max_tokens=max_tokens, temperature=0.0):
+            if first is None:
+                first = time.perf_counter()
+            generated += 1
+            if renderer:
+                mark = time.perf_counter()
+                renderer.feed(token)
+                render_s += time.perf_counter() - mark
+    finally:
+        if renderer:
+            renderer.close()
+            renderer.live.stop()
+    end = time.perf_counter()
+
+    result = {
+        "generated_tokens": generated,
+        "ttft_ms": round((first - start) * 1000, 2) if first else None,
+        "decode_tok_s": round((generated - 1) / (end - first), 1) if first and generated > 1 and end > first else None,
+    }
+    if render:
+        result["render_us_per_token"] = round(render_s / max(generated, 1) * 1e6, 1)
+    return result
+
+
+def run_case(engine, model_name: str, device: str, prompt_lengths: list, max_tokens: int = 128,
+             repeat: int = 3, render: bool = False) -> list:
+    """Loads a model once and measures every prompt length. Returns one result per length."""
+    load = measure_load(engine, model_name, device)
+    results = []
+    for length in prompt_lengths:
+        prompt = filler_prompt(length)
+        runs = []
+        for _ in range(repeat):
+            run = measure_prefill(engine, prompt)
+            run.update(measure_generation(engine, prompt, max_tokens, render))
+            runs.append(run)
+        result = {"model": model_name, "device": device, "prompt_length": length, "repeat": repeat}
+        result.update(load)
+        result.update(_median(runs))
+        results.append(result)
+    return results
+
+
+def _median(runs: list) -> dict:
+    merged = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run.get(key) is not None]
+        merged[key] = statistics.median(values) if values else None
+    return merged
+
+
+def environment(stub: bool = False) -> dict:
+    try:
+        from importlib.metadata import version
+        gpt4all_version = version("gpt4all")
+    except Exception:
+        gpt4all_version = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "gpt4all": gpt4all_version,
+        "stub": stub,
+    }
+
+
+def save_report(path: str, results: list, env: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": env, "results": results}, f, indent=2)
+
+
+def load_report(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results: list, baseline: list, threshold: float = 0.10) -> list:
+    """
+    Matches results to a baseline by (model, device, prompt length) and returns
+    one row per metric: (key, metric, old, new, relative change, regressed).
+    A change counts as a regression when it is worse than `threshold` (0.10 = 10%).
+    """
+    previous = {(r["model"], r["device"], r["prompt_length"]): r for r in baseline}
+    rows = []
+    for result in results:
+        key = (result["model"], result["device"], result["prompt_length"])
+        old = previous.get(key)
+        if old is None:
+            continue
+        for metric, better in METRICS.items():
+            a, b = old.get(metric), result.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            worse = change > threshold if better == "lower" else change < -threshold
+            rows.append((key, metric, a, b, change, worse))
+    return rows
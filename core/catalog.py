@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_MANIFEST_URL = "https://gpt4all.io/models/models3.json"
+
+# The cache file holds the manifest plus what is needed to revalidate it:
+#   {"url": ..., "fetched_at": <epoch>, "etag": ..., "last_modified": ..., "models": [...]}
+# Reads never touch the network. A stale cache is still served while a
+# background thread revalidates it with If-None-Match / If-Modified-Since, so
+# an unchanged manifest costs a 304 and an offline host costs nothing.
+
+
+class CatalogCache:
+    def __init__(self, path: str = "cache/catalog.json", url: str = DEFAULT_MANIFEST_URL,
+                 ttl_hours: float = 24, timeout: float = 10):
+        self.path = path
+        self.url = url or DEFAULT_MANIFEST_URL
+        self.ttl = ttl_hours * 3600
+        self.timeout = timeout
+        self.last_error = None
+        self._data = None
+        self._lock = threading.Lock()
+        self._refresh = None  # Background refresh thread, while one runs
+
+    # --- Reading ---
+
+    def _load(self) -> dict:
+        if self._data is None:
+            data = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                pass
+            if data.get("url") != self.url:
+                data = {}  # Cached from another manifest
+            self._data = data
+        return self._data
+
+    def models(self) -> list:
+        """Cached manifest entries (empty before the first successful fetch)."""
+        return list(self._load().get("models") or [])
+
+    @property
+    def fetched_at(self):
+        return self._load().get("fetched_at")
+
+    def is_stale(self) -> bool:
+        fetched = self.fetched_at
+        return fetched is None or time.time() - fetched > self.ttl
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refresh is not None and self._refresh.is_alive()
+
+    # --- Revalidation ---
+
+    def refresh(self) -> bool:
+        """
+        Revalidates the cache against the manifest URL. Returns True if the
+        cache is now fresh (updated or confirmed unchanged), False on failure.
+        """
+        import requests  # Only needed when actually going to the network
+
+        data = self._load()
+        headers = {}
+        if data.get("models") is not None:
+            if data.get("etag"):
+                headers["If-None-Match"] = data["etag"]
+            if data.get("last_modified"):
+                headers["If-Modified-Since"] = data["last_modified"]
+        try:
+            resp = requests.get(self.url, headers=headers, timeout=self.timeout)
+            if resp.status_code == 304:
+                updated = dict(data, fetched_at=time.time())
+            elif resp.status_code == 200:
+                models = resp.json()
+                if not isinstance(models, list):
+                    raise ValueError("Manifest is not a list of models.")
+                updated = {"url": self.url, "fetched_at": time.time(), "models": models,
+                           "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+            else:
+                raise ValueError(f"HTTP {resp.status_code} {resp.reason}")
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+
+        with self._lock:
+            self._data = updated
+            self._save(updated)
+        self.last_error = None
+        return True
+
+    def refresh_in_background(self, force: bool = False):
+        """Starts a revalidation thread if the cache is stale (or `force`). Returns the thread or None."""
+        with self._lock:
+            if self.refreshing:
+                return self._refresh
+            if not force and not self.is_stale():
+                return None
+            self._refresh = threading.Thread(target=self.refresh, name="onyx-catalog", daemon=True)
+            self._refresh.start()
+            return self._refresh
+
+    def wait(self, timeout: float = None) -> bool:
+        """Waits for a running refresh. Returns True if none is still running."""
+        thread = self._refresh
+        if thread is not None:
+            thread.join(timeout)
+        return not self.refreshing
+
+    def _save(self, data: dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"Debug: Could not write catalog cache: {e}")
+
@@ -0,0 +1,162 @@
+import socket
+from core.daemon import DEFAULT_SESSION, default_socket_path, read_message, send_message
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+class OnyxClient:
+    """
+    Thin client for onyxd. Holds no model and imports nothing heavy, so it
+    starts in a fraction of a second once the daemon is warm.
+    """
+    def __init__(self, socket_path: str = None, session: str = DEFAULT_SESSION):
+        self.socket_path = socket_path or default_socket_path()
+        self.session = session
+        self._sock = None
+        self._rfile = None
+        self._wfile = None
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise DaemonUnavailable(f"onyxd is not running on {self.socket_path} ({e})")
+        self._sock = sock
+        self._rfile = sock.makefile("rb")
+        self._wfile = sock.makefile("wb")
+        return self
+
+    def close(self):
+        for f in (self._rfile, self._wfile, self._sock):
+            if f is not None:
+                f.close()
+        self._sock = self._rfile = self._wfile = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, op: str, **fields) -> dict:
+        send_message(self._wfile, dict(op=op, **fields))
+        reply = read_message(self._rfile)
+        if reply is None:
+            raise DaemonUnavailable("onyxd closed the connection.")
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def chat(self, prompt: str):
+        """Yields reply tokens as the daemon streams them."""
+        send_message(self._wfile, {"op": "chat", "session": self.session, "prompt": prompt})
+        while True:
+            message = read_message(self._rfile)
+            if message is None:
+                raise DaemonUnavailable("onyxd closed the connection.")
+            if "error" in message:
+                raise RuntimeError(message["error"])
+            if message.get("done"):
+                return
+            yield message["token"]
+
+    def attach(self, session: str = None) -> dict:
+        if session:
+            self.session = session
+        return self.request("attach", session=self.session)
+
+    def sessions(self) -> list:
+        return self.request("sessions")["sessions"]
+
+    def reset(self):
+        return self.request("reset", session=self.session)
+
+    def close_session(self, session: str):
+        return self.request("close", session=session)
+
+    def status(self) -> dict:
+        return self.request("status")
+
+    def shutdown(self):
+        return self.request("shutdown")
+
+
+def chat_loop(client: OnyxClient):
+    """Interactive chat against a running daemon, rendered like chat_mode."""
+    from rich.console import Console
+    from rich.live import Live
+    from rich.markdown import Markdown
+    from rich.prompt import Prompt
+    from core.render import StreamingMarkdown
+
+    console = Console()
+
+    def show_attach(info: dict):
+        console.print(f"[bold]Session:[/bold] [cyan]{info['session']}[/cyan]  "
+                      f"[bold]Model:[/bold] [cyan]{info['model']}[/cyan]  "
+                      f"[dim]({len(info['history']) // 2} turns)[/dim]")
+        # Show the last exchange so a reattached session has context on screen
+        for message in info["history"][-2:]:
+            if message.get("role") == "user":
+                console.print(f"\n[bold green]>[/bold green] {message['content']}")
+            else:
+                console.print(Markdown(message["content"]))
+
+    show_attach(client.attach())
+    console.print("[dim]Commands: /exit, /clear, /sessions, /session <name>, /close <name>[/dim]\n")
+
+    while True:
+        try:
+            user_input = Prompt.ask("\n[bold green]>[/bold green]").strip()
+            if not user_input:
+                continue
+            command = user_input.lower()
+
+            if command == "/exit":
+                break
+            if command == "/clear":
+                client.reset()
+                console.print("[dim]Session reset.[/dim]")
+                continue
+            if command == "/sessions":
+                for info in client.sessions():
+                    marker = "*" if info["name"] == client.session else " "
+                    console.print(f"{marker} [cyan]{info['name']}[/cyan] ({info['persona']}, {info['turns']} turns)")
+                continue
+            if command.startswith("/close"):
+                parts = user_input.split(maxsplit=1)
+                if len(parts) < 2 or parts[1] == client.session:
+                    console.print("Usage: /close <name>  [dim](switch away from a session before closing it)[/dim]")
+                else:
+                    client.close_session(parts[1])
+                    console.print(f"[dim]Closed {parts[1]}.[/dim]")
+                continue
+            if command.startswith("/session"):
+                parts = user_input.split(maxsplit=1)
+                if len(parts) > 1:
+                    show_attach(client.attach(parts[1]))
+                else:
+                    console.print("Usage: /session <name>")
+                continue
+
+            console.print("")
+            with Live(console=console, refresh_per_second=10) as live:
+                renderer = StreamingMarkdown(live)
+                try:
+                    for token in client.chat(user_input):
+                        renderer.feed(token)
+                finally:
+                    renderer.close()
+
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Detached. The session stays on the daemon.[/yellow]")
+            break
+        except DaemonUnavailable as e:
+            console.print(f"\n[bold red]Error:[/bold red] {e}")
+            break
+        except Exception as e:
+            console.print(f"\n[bold red]Error:[/bold red] {e}")
@@ -0,0 +1,193 @@
+import multiprocessing
+import os
+import queue
+import time
+
+from core.admission import HEADROOM_GB
+from core.pool import available_ram_gb
+
+# /compare: one prompt, several models, each in its own worker process on the
+# CPU. Every worker loads its model, answers the prompt in the current persona
+# and streams the tokens back over a queue. How many run at once is decided by
+# RAM: the estimated footprints of the running models (weights plus KV cache,
+# as for a normal load) must fit in the memory available when the comparison
+# starts; the rest wait for a running one to finish. The cores are split evenly
+# between the workers that can run at once, and each worker is pinned to its
+# own share so they do not fight over the same cores.
+
+
+def _compare_worker(index: int, config_path: str, model_name: str, prompt: str, persona: str,
+                    cpus: list, stub: bool, events):
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    for fd in (1, 2):  # Load messages and backend logs would scribble over the live columns
+        os.dup2(devnull, fd)
+    try:
+        from core.config import ConfigManager
+        from core.engine import ModelEngine
+
+        if cpus and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        config = ConfigManager(config_path, read_only=True)  # The overrides below stay in this process
+        config.settings.device = "cpu"
+        config.settings.metrics_path = ""  # The comparison reports its own numbers
+        config.settings.model_name = model_name
+        model_class = None
+        if stub:
+            from core.stub import StubGPT4All
+            model_class = StubGPT4All
+        engine = ModelEngine(config, model_class=model_class)
+        messages = []
+
+        def report(message):
+            messages.append(message.strip())
+            events.put((index, "status", messages[-1]))
+
+        engine._status_hook = report  # stdout is gone; load progress and errors go to the parent
+        start = time.perf_counter()
+        if not engine.load_model(model_name, persist=False):
+            events.put((index, "error", messages[-1] if messages else f"Could not load {model_name}."))
+            return
+        set_threads = getattr(engine.model.model, "set_thread_count", None)
+        if cpus and set_threads:
+            set_threads(len(cpus))
+        events.put((index, "loaded", time.perf_counter() - start))
+        for token in engine.generate_response(prompt, persona_name=persona, stream=True):
+            events.put((index, "token", token))
+        turn = engine.metrics.recent[-1].to_dict() if engine.metrics.recent else {}
+        events.put((index, "done", turn))
+    except Exception as e:
+        events.put((index, "error", str(e)))
+
+
+class Comparison:
+    """
+    Runs `prompt` through each of `models` in worker processes, as many at a
+    time as fit in RAM. `results[i]` is updated as events come in:
+
+        comparison = Comparison(engine, ["a.gguf", "b.gguf"], "hello")
+        for index, kind in comparison.run():
+            ...  # redraw from comparison.results
+    """
+    def __init__(self, engine, models: list, prompt: str, persona: str = None, max_parallel: int = None):
+        self.engine = engine
+        self.models = models
+        self.prompt = prompt
+        self.persona = persona or engine.config.settings.persona
+        self.stub = getattr(engine._model_class(), "weightless", False)
+        self.results = [{"model": name, "status": "queued", "text": "", "tokens": 0, "footprint_gb": None,
+                         "load_s": None, "started": None, "generation_started": None, "seconds": None,
+                         "turn": {}, "error": None, "message": ""}
+                        for name in models]
+        self.budget_gb = available_ram_gb() - HEADROOM_GB
+        self.max_parallel = max_parallel
+        self._processes = {}
+        self._free_slots = []
+        self.plan()
+
+    def plan(self):
+        """Estimates each model's footprint and decides how many workers run at once and on which cores."""
+        for result in self.results:
+            result["footprint_gb"] = 0.0 if self.stub else self.engine._footprint_gb(result["model"])
+            if result["footprint_gb"] > self.budget_gb:
+                result["status"] = "skipped"
+                result["error"] = (f"needs ~{result['footprint_gb']:.1f} GB, "
+                                   f"{max(self.budget_gb, 0):.1f} GB RAM available")
+        # As many as fit together, taken in the order given (the first ones start right away)
+        parallel, used = 0, 0.0
+        for result in self.runnable:
+            if used + result["footprint_gb"] > self.budget_gb:
+                break
+            used += result["footprint_gb"]
+            parallel += 1
+        if self.max_parallel:
+            parallel = min(parallel, self.max_parallel)
+        self.parallel = max(parallel, 1)
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.threads = max(1, len(cpus) // self.parallel)
+        self._free_slots = [cpus[i * self.threads:(i + 1) * self.threads] if len(cpus) >= self.parallel else []
+                            for i in range(self.parallel)]
+
+    @property
+    def runnable(self) -> list:
+        return [r for r in self.results if r["status"] != "skipped"]
+
+    def run(self):
+        """Starts the workers as RAM allows and yields (index, event kind) until every model is done."""
+        ctx = multiprocessing.get_context("spawn")  # Fresh interpreters: no model state shared through fork
+        events = ctx.Queue()
+        waiting = [i for i, r in enumerate(self.results) if r["status"] == "queued"]
+        slots = {}
+        try:
+            while waiting or self._processes:
+                while waiting and self._free_slots and self._fits(self.results[waiting[0]]):
+                    index = waiting.pop(0)
+                    slots[index] = cpus = self._free_slots.pop(0)
+                    self._start(ctx, index, cpus, events)
+                    yield index, "started"
+                try:
+                    index, kind, payload = events.get(timeout=0.2)
+                    if index not in self._processes:
+                        continue  # Already given up on (see below)
+                except queue.Empty:
+                    for index, process in list(self._processes.items()):
+                        if not process.is_alive():  # Died without reporting (killed, out of memory)
+                            self._finish(index, "error", f"worker exited with code {process.exitcode}")
+                            del self._processes[index]
+                            self._free_slots.append(slots.pop(index))
+                            yield index, "error"
+                    continue
+                self._handle(index, kind, payload)
+                if kind in ("done", "error"):
+                    self._processes.pop(index).join(timeout=5)
+                    self._free_slots.append(slots.pop(index))
+                yield index, kind
+        finally:
+            self.stop()
+            for index in waiting:
+                self.results[index]["status"] = "cancelled"
+
+    def stop(self):
+        """Ends any workers still running (Ctrl-C, or an error in the caller)."""
+        for index, process in self._processes.items():
+            process.terminate()
+            process.join(timeout=5)
+            if self.results[index]["status"] not in ("done", "error"):
+                self.results[index]["status"] = "cancelled"
+        self._processes.clear()
+
+    def _fits(self, result: dict) -> bool:
+        running = sum(self.results[i]["footprint_gb"] for i in self._processes)
+        return not self._processes or running + result["footprint_gb"] <= self.budget_gb
+
+    def _start(self, ctx, index: int, cpus: list, events):
+        result = self.results[index]
+        result["status"] = "loading"
+        result["started"] = time.perf_counter()
+        process = ctx.Process(target=_compare_worker, daemon=True,
+                              args=(index, self.engine.config.config_path, result["model"], self.prompt,
+                                    self.persona, cpus, self.stub, events))
+        process.start()
+        self._processes[index] = process
+
+    def _handle(self, index: int, kind: str, payload):
+        result = self.results[index]
+        if kind == "status":
+            result["message"] = payload
+        elif kind == "loaded":
+            result["status"] = "generating"
+            result["load_s"] = payload
+            result["generation_started"] = time.perf_counter()
+        elif kind == "token":
+            result["text"] += payload
+            result["tokens"] += 1
+        else:
+            self._finish(index, kind, payload)
+
+    def _finish(self, index: int, kind: str, payload):
+        result = self.results[index]
+        result["status"] = kind
+        result["seconds"] = time.perf_counter() - result["started"]
+        if kind == "done":
+            result["turn"] = payload
+        else:
+            result["error"] = payload
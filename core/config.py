@@ -1,6 +1,6 @@
 import yaml
 import os
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from typing import Dict, Any
 
 CONFIG_FILE = "config.yaml"
@@ -9,15 +9,45 @@ CONFIG_FILE = "config.yaml"
 class Settings:
     model_name: str = "Nous-Hermes-2-Mistral-7B-DPO.Q4_0.gguf"
     model_path: str = "models/"
-    max_tokens: int = 409696
+    max_tokens: int = 2048
     temperature: float = 0.7
     top_k: int = 40
     persona: str = "phantom"
     device: str = "cpu"
+    pool_budget_gb: float = 0.0  # RAM for resident models; 0 = half of physical memory
+    session_path: str = "sessions/"
+    session_state_mb: float = 1024.0  # Evaluated contexts kept for parked named sessions; 0 = always replay
+    transcript_path: str = "transcripts/"
+    context_budget: int = 0  # History tokens kept in the model; 0 = 3/4 of the context length
+    context_policy: str = "truncate"  # truncate | pin | summary
+    context_pin_turns: int = 1
+    metrics_path: str = "metrics/"  # Empty to keep turn metrics in memory only
+    metrics_format: str = "jsonl"  # jsonl | prometheus
+    catalog_url: str = "https://gpt4all.io/models/models3.json"
+    catalog_cache: str = "cache/catalog.json"
+    catalog_ttl_hours: float = 24.0
+    download_connections: int = 4  # Parallel range requests per model download
+    registry_path: str = "cache/models.db"  # Index of the models in model_path
+    model_disk_budget_gb: float = 0.0  # Least recently used models are deleted past this; 0 = no limit
+    response_cache: bool = False  # Replay repeated prompts instead of generating them again
+    response_cache_path: str = "cache/responses/"
+    response_cache_entries: int = 256  # Replies kept in memory
+    response_cache_disk_mb: float = 256.0
+    tuning_path: str = "cache/tuning.json"  # Per-model profiles written by --tune
+    prefix_cache_mb: float = 1024.0  # Evaluated system prompts kept for new sessions; 0 disables
+    response_cache_max_temp: float = 0.3  # Only cache at or below this temperature; raise it to cache sampled replies too
+    rag_path: str = "cache/rag/"  # Indexes built by /index
+    rag_embedding_model: str = "all-MiniLM-L6-v2.gguf2.f16.gguf"  # Run through gpt4all's Embed4All, on the CPU
+    rag_top_k: int = 4  # Excerpts retrieved per /ask
+    rag_context_chars: int = 3000  # Most excerpt text put into one /ask prompt
+    # Strings that end a reply, keyed by persona name, model filename or "*" for all
+    stop_sequences: Dict[str, list] = field(default_factory=lambda: {"*": ["<|im_start|>", "<|im_end|>", "\n### Instruction:"]})
+    repeat_stop: int = 4  # End a reply once the same stretch of tokens comes back this many times in a row; 0 disables
 
 class ConfigManager:
-    def __init__(self, config_path: str = CONFIG_FILE):
+    def __init__(self, config_path: str = CONFIG_FILE, read_only: bool = False):
         self.config_path = config_path
+        self.read_only = read_only  # Worker processes change settings in memory only
         self.settings = Settings()
         self.load()
 
@@ -33,6 +63,8 @@ class ConfigManager:
     
     def save(self):
         """Save current settings to the config file."""
+        if self.read_only:
+            return
         with open(self.config_path, "w") as f:
             yaml.dump(asdict(self.settings), f)
 
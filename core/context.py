@@ -0,0 +1,144 @@
+POLICIES = ("truncate", "pin", "summary")
+
+# Chat template tokens around each turn (role markers, separators).
+TEMPLATE_OVERHEAD = 12
+
+# Rolling summary for the "summary" policy, kept at the end of the system prompt.
+SUMMARY_MAX_TOKENS = 200
+SUMMARY_MARKER = "\n\nSummary of the earlier conversation:\n"
+
+
+class TokenCounter:
+    """
+    Token counts from the loaded model's tokenizer where they have been
+    measured (the growth of the model's n_past over a turn), and an estimate
+    for text the model has not evaluated yet. The estimate's chars-per-token
+    ratio is calibrated from those measurements, so it follows the model's
+    actual vocabulary instead of a fixed rule of thumb.
+    """
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+
+    def estimate(self, text: str) -> int:
+        return int(len(text) / self.chars_per_token) + 1 if text else 0
+
+    def observe(self, chars: int, tokens: int):
+        """Feeds a measured (characters, tokens) pair into the ratio."""
+        if chars < 32 or tokens <= TEMPLATE_OVERHEAD:
+            return
+        ratio = chars / (tokens - TEMPLATE_OVERHEAD)
+        if 1.0 <= ratio <= 8.0:
+            self.chars_per_token = 0.8 * self.chars_per_token + 0.2 * ratio
+
+
+class ContextPlan:
+    """What to keep when the history no longer fits the budget."""
+    def __init__(self, keep: list, dropped: list, tokens_before: int, tokens_after: int):
+        self.keep = keep          # (user, assistant) message pairs to replay
+        self.dropped = dropped    # pairs removed from the model context
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+
+
+class ContextWindow:
+    """
+    Keeps the system prompt plus the newest turns inside a token budget.
+
+    When a new prompt would push the context over `budget`, the oldest turns are
+    dropped down to `low_water` of the budget, so the cost of re-evaluating the
+    kept turns is paid once per several turns rather than every turn.
+
+    Policies:
+      truncate  drop the oldest turns
+      pin       like truncate, but the first `pin_turns` turns always stay
+      summary   dropped turns are folded into a rolling summary kept with the system prompt
+    """
+    def __init__(self, budget: int, policy: str = "truncate", pin_turns: int = 1,
+                 low_water: float = 0.75, counter: TokenCounter = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown context policy '{policy}'. Use one of: {', '.join(POLICIES)}")
+        self.budget = budget
+        self.policy = policy
+        self.pin_turns = pin_turns
+        self.low_water = low_water
+        self.counter = counter or TokenCounter()
+
+    def turn_tokens(self, user: dict, assistant: dict) -> int:
+        measured = user.get("tokens")
+        if measured:
+            return measured
+        return (self.counter.estimate(user.get("content", "")) +
+                self.counter.estimate(assistant.get("content", "")) + TEMPLATE_OVERHEAD)
+
+    def history_tokens(self, history: list) -> int:
+        system, pairs = split_history(history)
+        total = self.counter.estimate(system["content"]) if system else 0
+        return total + sum(self.turn_tokens(u, a) for u, a in pairs)
+
+    def plan(self, history: list, prompt: str, context_used: int = None):
+        """
+        Returns a ContextPlan if `prompt` would not fit after `history`, else None.
+        `context_used` is the model's real n_past when the backend reports it.
+        """
+        system, pairs = split_history(history)
+        used = context_used if context_used is not None else self.history_tokens(history)
+        incoming = self.counter.estimate(prompt) + TEMPLATE_OVERHEAD
+        if used + incoming <= self.budget or not pairs:
+            return None
+
+        target = int(self.budget * self.low_water) - incoming
+        fixed = self.counter.estimate(system["content"]) if system else 0
+        pinned = pairs[:self.pin_turns] if self.policy == "pin" else []
+        candidates = pairs[len(pinned):]
+        fixed += sum(self.turn_tokens(u, a) for u, a in pinned)
+        if self.policy == "summary":
+            fixed += SUMMARY_MAX_TOKENS
+
+        # Walk back from the newest turn, keeping as many as fit.
+        kept = []
+        total = fixed
+        for user, assistant in reversed(candidates):
+            cost = self.turn_tokens(user, assistant)
+            if total + cost > target:
+                break
+            kept.append((user, assistant))
+            total += cost
+        kept.reverse()
+        dropped = candidates[:len(candidates) - len(kept)]
+        if not dropped:
+            return None
+        return ContextPlan(pinned + kept, dropped, used, total)
+
+
+def split_history(history: list):
+    """(system message or None, list of (user, assistant) pairs)."""
+    system = history[0] if history and history[0].get("role") == "system" else None
+    rest = history[1:] if system else history
+    pairs = [(rest[i], rest[i + 1]) for i in range(0, len(rest) - 1, 2)]
+    return system, pairs
+
+
+def summary_prompt(dropped: list, previous_summary: str = "") -> str:
+    lines = []
+    if previous_summary:
+        lines.append(f"Earlier summary: {previous_summary}")
+    for user, assistant in dropped:
+        lines.append(f"User: {user['content']}\nAssistant: {assistant['content']}")
+    transcript = "\n\n".join(lines)
+    return ("Summarize the key facts, decisions and open questions of this conversation "
+            f"in a short paragraph.\n\n{transcript}\n\nSummary:")
+
+
+def build_history(system_prompt: str, plan: ContextPlan, summary: str = None) -> list:
+    """System message (with the rolling summary, if any) followed by the kept turns."""
+    base = system_prompt.split(SUMMARY_MARKER, 1)[0]
+    content = base + SUMMARY_MARKER + summary.strip() if summary else base
+    history = [{"role": "system", "content": content}]
+    for user, assistant in plan.keep:
+        history.extend([dict(user), dict(assistant)])
+    return history
+
+
+def previous_summary(system_prompt: str) -> str:
+    parts = system_prompt.split(SUMMARY_MARKER, 1)
+    return parts[1] if len(parts) > 1 else ""
@@ -0,0 +1,171 @@
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+
+from core.sessions import DEFAULT_SESSION
+
+# Wire protocol: one JSON object per line in both directions.
+#   {"op": "chat", "session": "work", "prompt": "..."}  -> {"token": "..."}* then {"done": true, ...}
+#   {"op": "attach", "session": "work"}                 -> {"session": ..., "persona": ..., "history": [...]}
+#   {"op": "sessions"}                                  -> {"sessions": [{"name": ..., "turns": ...}, ...]}
+#   {"op": "reset" | "close", "session": "work"}        -> {"ok": true}
+#   {"op": "status"} / {"op": "shutdown"}               -> {"ok": true, ...}
+# Errors come back as {"error": "..."}.
+
+
+def default_socket_path() -> str:
+    """Per-user socket path, preferring the XDG runtime dir."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"onyxd-{os.getuid()}.sock")
+
+
+def send_message(stream, message: dict):
+    stream.write((json.dumps(message) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+def read_message(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class OnyxDaemon:
+    """
+    Keeps one ModelEngine resident and serves its named sessions
+    (engine.sessions) to clients. The session manager decides which session is
+    in the model context and schedules turns between clients.
+    """
+    def __init__(self, engine, socket_path: str = None):
+        self.engine = engine
+        self.sessions = engine.sessions
+        self.socket_path = socket_path or default_socket_path()
+        self.started = time.time()
+        self.server = None
+
+    # --- Operations ---
+
+    def handle_chat(self, request: dict, stream):
+        name = request.get("session") or DEFAULT_SESSION
+        prompt = request.get("prompt", "")
+        start = time.perf_counter()
+        tokens = 0
+        client_alive = True
+        # A client that hangs up cancels decoding; the partial reply stays in the session history.
+        for token in self.sessions.turn(name, prompt, should_stop=lambda: not client_alive,
+                                        persona=request.get("persona")):
+            tokens += 1
+            if not client_alive:
+                continue  # At most a token or two still in flight
+            try:
+                send_message(stream, {"token": token})
+            except (BrokenPipeError, ConnectionResetError):
+                client_alive = False
+
+        if client_alive:
+            send_message(stream, {"done": True, "tokens": tokens,
+                                  "seconds": round(time.perf_counter() - start, 3)})
+
+    def handle_attach(self, request: dict) -> dict:
+        name = request.get("session") or DEFAULT_SESSION
+        session = self.sessions.open(name, request.get("persona"))
+        history = self.sessions.history(name)
+        return {"session": session.name, "persona": session.persona, "model": self.engine.current_model_name,
+                "history": [m for m in history if m.get("role") != "system"]}
+
+    def handle_reset(self, request: dict, close: bool = False) -> dict:
+        name = request.get("session") or DEFAULT_SESSION
+        if self.sessions.get(name) is None:
+            return {"error": f"No such session: {name}"}
+        if close:
+            self.sessions.close(name)
+        else:
+            self.sessions.reset(name)
+        return {"ok": True}
+
+    def status(self) -> dict:
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "model": self.engine.current_model_name,
+            "device": self.engine.config.settings.device,
+            "uptime": round(time.time() - self.started, 1),
+            "sessions": len(self.sessions.sessions),
+            "active": self.sessions.active,
+        }
+
+    # --- Server ---
+
+    def serve_forever(self):
+        self._remove_stale_socket()
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon._handle_connection(self.rfile, self.wfile)
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        print(f"onyxd listening on {self.socket_path} (model: {self.engine.current_model_name})")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        if self.server:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def _handle_connection(self, rfile, wfile):
+        while True:
+            try:
+                request = read_message(rfile)
+            except ValueError:
+                send_message(wfile, {"error": "Malformed request."})
+                continue
+            if request is None:
+                return
+
+            op = request.get("op")
+            try:
+                if op == "chat":
+                    self.handle_chat(request, wfile)
+                elif op == "attach":
+                    send_message(wfile, self.handle_attach(request))
+                elif op == "sessions":
+                    send_message(wfile, {"sessions": self.sessions.list()})
+                elif op in ("reset", "close"):
+                    send_message(wfile, self.handle_reset(request, close=(op == "close")))
+                elif op == "status":
+                    send_message(wfile, self.status())
+                elif op == "shutdown":
+                    send_message(wfile, {"ok": True})
+                    self.shutdown()
+                    return
+                else:
+                    send_message(wfile, {"error": f"Unknown op: {op}"})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                send_message(wfile, {"error": str(e)})
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)  # Left behind by a dead daemon
+        else:
+            raise RuntimeError(f"onyxd is already running on {self.socket_path}")
+        finally:
+            probe.close()
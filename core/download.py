@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_BASE_URL = "https://gpt4all.io/models/gguf/"
+CHUNK_SIZE = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+# A download in progress lives next to its destination as
+#   <file>.part        the file, preallocated to full size, chunks written in place
+#   <file>.part.json   {"url", "size", "etag", "chunk_size", "done": [chunk numbers]}
+# Chunks are fetched with parallel range requests. A rerun skips the chunks
+# listed as done, so an interrupted 7 GB download resumes instead of restarting.
+# Nothing reaches the destination name until size and MD5 check out.
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadCancelled(DownloadError):
+    pass
+
+
+def model_url(entry: dict, filename: str) -> str:
+    """Download URL of a catalog entry (GPT4All's default location if it has none)."""
+    return entry.get("url") or DEFAULT_BASE_URL + filename
+
+
+class ModelDownloader:
+    """
+    Downloads `url` to `dest` with `connections` parallel range requests.
+
+    `progress(done_bytes, total_bytes, bytes_per_second, phase)` is called from
+    worker threads as data arrives (phase "download") and while the file is
+    hashed (phase "verify"). `status(message)` gets one-off notes such as a
+    resumed download (default: print).
+    """
+    def __init__(self, url: str, dest: str, expected_size: int = None, expected_md5: str = None,
+                 connections: int = 4, chunk_size: int = CHUNK_SIZE, progress=None, timeout: float = 30,
+                 retries: int = 5, status=None):
+        self.url = url
+        self.dest = dest
+        self.expected_size = int(expected_size) if expected_size else None
+        self.expected_md5 = expected_md5.lower() if expected_md5 else None
+        self.connections = max(1, connections)
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.status = status or print
+        self.timeout = timeout
+        self.retries = retries
+        self.fetch_url = url  # After redirects
+        self.part_path = dest + ".part"
+        self.state_path = dest + ".part.json"
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._done_bytes = 0
+        self._started = None
+        self._resumed_bytes = 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    # --- Public entry point ---
+
+    def run(self) -> str:
+        """
+        Downloads, verifies and moves the file into place. Returns the
+        destination path. Network and disk errors are raised as DownloadError.
+        """
+        import requests
+
+        try:
+            return self._run(requests.Session())
+        except DownloadError:
+            raise
+        except (requests.RequestException, OSError) as e:
+            raise DownloadError(str(e)) from e
+
+    def _run(self, session) -> str:
+        size, etag, ranges = self._probe(session)
+        if self.expected_size and size and size != self.expected_size:
+            raise DownloadError(f"Server reports {size} bytes, catalog expects {self.expected_size}.")
+        size = size or self.expected_size
+
+        if ranges and size:
+            self._download_ranges(size, etag)
+        else:
+            self._download_single(session)
+
+        self._verify()
+        os.replace(self.part_path, self.dest)
+        self._remove(self.state_path)
+        return self.dest
+
+    # --- Download strategies ---
+
+    def _probe(self, session):
+        """(size, etag, supports ranges) from a HEAD request."""
+        resp = session.head(self.url, allow_redirects=True, timeout=self.timeout,
+                            headers={"Accept-Encoding": "identity"})
+        if resp.status_code >= 400:
+            raise DownloadError(f"HTTP {resp.status_code} {resp.reason} for {self.url}")
+        self.fetch_url = resp.url  # Ranges go straight to the final location
+        size = int(resp.headers.get("Content-Length") or 0) or None
+        ranges = resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return size, resp.headers.get("ETag"), ranges
+
+    def _download_ranges(self, size: int, etag: str):
+        state = self._load_state(size, etag)
+        chunks = [(i, i * self.chunk_size, min((i + 1) * self.chunk_size, size) - 1)
+                  for i in range((size + self.chunk_size - 1) // self.chunk_size)]
+        pending = [c for c in chunks if c[0] not in state["done"]]
+        self._resumed_bytes = self._done_bytes = size - sum(end - start + 1 for _, start, end in pending)
+        if self._resumed_bytes:
+            self.status(f"Resuming download at {self._resumed_bytes / 1024 ** 2:.0f} of {size / 1024 ** 2:.0f} MB.")
+
+        if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) != size:
+            with open(self.part_path, "ab") as f:
+                f.truncate(size)
+
+        self._started = time.perf_counter()
+        work = list(reversed(pending))  # Popped from the end: lowest offsets first
+        errors = []
+        fd = os.open(self.part_path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+
+        def worker():
+            import requests
+            session = requests.Session()
+            while not errors and not self.cancelled.is_set():
+                with self._lock:
+                    if not work:
+                        return
+                    chunk = work.pop()
+                try:
+                    self._fetch_chunk(session, fd, chunk, size, etag)
+                except Exception as e:
+                    errors.append(e)
+                    return
+                with self._lock:
+                    state["done"].append(chunk[0])
+                    self._save_state(state)
+
+        try:
+            threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(self.connections, len(pending)))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if self.cancelled.is_set():
+            raise DownloadCancelled("Download cancelled; run it again to resume.")
+        if errors:
+            raise DownloadError(f"Download failed: {errors[0]}") from errors[0]
+
+    def _fetch_chunk(self, session, fd: int, chunk: tuple, size: int, etag: str):
+        index, start, end = chunk
+        position = start
+        for attempt in range(self.retries + 1):
+            headers = {"Range": f"bytes={position}-{end}", "Accept-Encoding": "identity"}
+            if etag and not etag.startswith("W/"):
+                headers["If-Range"] = etag
+            try:
+                with session.get(self.fetch_url, headers=headers, stream=True, timeout=self.timeout) as resp:
+                    if resp.status_code != 206:
+                        raise DownloadError(f"Range request answered with HTTP {resp.status_code}")
+                    for data in resp.iter_content(READ_SIZE):
+                        if self.cancelled.is_set():
+                            raise DownloadCancelled("Download cancelled.")
+                        data = data[:end + 1 - position]
+                        os.pwrite(fd, data, position)
+                        position += len(data)
+                        self._advance(len(data), size)
+                if position > end:
+                    return
+            except DownloadError:
+                raise
+            except Exception:
+                if attempt == self.retries:
+                    raise
+            time.sleep(min(2 ** attempt * 0.5, 10))  # Dropped connection: resume this chunk where it stopped
+        raise DownloadError(f"Chunk {index} incomplete after {self.retries} retries.")
+
+    def _download_single(self, session):
+        """Fallback for servers without range support: one stream, no resume."""
+        self._started = time.perf_counter()
+        self._done_bytes = 0
+        with session.get(self.fetch_url, stream=True, timeout=self.timeout, headers={"Accept-Encoding": "identity"}) as resp:
+            if resp.status_code != 200:
+                raise DownloadError(f"HTTP {resp.status_code} {resp.reason} for {self.url}")
+            total = int(resp.headers.get("Content-Length") or 0) or self.expected_size
+            with open(self.part_path, "wb") as f:
+                for data in resp.iter_content(READ_SIZE):
+                    if self.cancelled.is_set():
+                        raise DownloadCancelled("Download cancelled.")
+                    f.write(data)
+                    self._advance(len(data), total)
+                f.flush()
+                os.fsync(f.fileno())
+
+    # --- Verification ---
+
+    def _verify(self):
+        size = os.path.getsize(self.part_path)
+        if self.expected_size and size != self.expected_size:
+            self._discard()
+            raise DownloadError(f"Expected {self.expected_size} bytes, got {size}.")
+        if not self.expected_md5:
+            return
+        digest = hashlib.md5()
+        done = 0
+        started = time.perf_counter()
+        with open(self.part_path, "rb") as f:
+            while data := f.read(READ_SIZE * 8):
+                digest.update(data)
+                done += len(data)
+                if self.progress:
+                    self.progress(done, size, done / max(time.perf_counter() - started, 1e-6), "verify")
+        if digest.hexdigest() != self.expected_md5:
+            self._discard()
+            raise DownloadError(f"MD5 mismatch: expected {self.expected_md5}, got {digest.hexdigest()}.")
+
+    # --- Helpers ---
+
+    def _advance(self, nbytes: int, total: int):
+        with self._lock:
+            self._done_bytes += nbytes
+            done = self._done_bytes
+        if self.progress:
+            elapsed = max(time.perf_counter() - self._started, 1e-6)
+            self.progress(done, total, (done - self._resumed_bytes) / elapsed, "download")
+
+    def _load_state(self, size: int, etag: str) -> dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if (state.get("url"), state.get("size"), state.get("etag"), state.get("chunk_size")) == \
+                    (self.url, size, etag, self.chunk_size) and os.path.exists(self.part_path):
+                return state
+        except (OSError, ValueError):
+            pass
+        # No usable state: the remote file changed or this is a fresh start
+        self._remove(self.part_path)
+        return {"url": self.url, "size": size, "etag": etag, "chunk_size": self.chunk_size, "done": []}
+
+    def _save_state(self, state: dict):
+        with open(self.state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def _discard(self):
+        self._remove(self.part_path)
+        self._remove(self.state_path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
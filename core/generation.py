@@ -0,0 +1,70 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class GenerationTask:
+    """
+    Runs one streamed reply on a worker thread and hands its tokens to the
+    caller through a queue, so the UI thread stays free to render and to react
+    to a cancel. cancel() makes the backend stop before its next token; the
+    partial reply stays in the session history.
+
+        task = GenerationTask(engine, "hello").start()
+        for token in task:
+            ...
+        task.cancel()  # from anywhere, e.g. a KeyboardInterrupt handler
+    """
+    def __init__(self, engine, prompt: str, persona_name: str = None, session: str = None):
+        self.engine = engine
+        self.prompt = prompt
+        self.persona_name = persona_name
+        self.session = session  # Named session (engine.sessions) to answer in, if any
+        self.cancelled = threading.Event()
+        self.error = None
+        self._tokens = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="onyx-generation", daemon=True)
+
+    def start(self) -> "GenerationTask":
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def _run(self):
+        try:
+            if self.session is not None:
+                stream = self.engine.sessions.turn(self.session, self.prompt, should_stop=self.cancelled.is_set,
+                                                   persona=self.persona_name)
+            else:
+                stream = self.engine.generate_response(self.prompt, persona_name=self.persona_name,
+                                                       stream=True, should_stop=self.cancelled.is_set)
+            for token in stream:
+                self._tokens.put(token)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._tokens.put(_DONE)
+
+    def __iter__(self):
+        """Yields tokens until the reply ends. Raises the worker's exception, if any."""
+        while True:
+            try:
+                # A short timeout keeps the caller's thread responsive to Ctrl-C
+                token = self._tokens.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if token is _DONE:
+                break
+            yield token
+        if self.error is not None:
+            raise self.error
+
+    def wait(self, timeout: float = None):
+        self._thread.join(timeout)
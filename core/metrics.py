@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+FORMATS = ("jsonl", "prometheus")
+
+
+class TurnMetrics:
+    """Timing and token counts of one chat turn."""
+    def __init__(self, model: str, device: str, persona: str = None):
+        self.model = model
+        self.device = device
+        self.persona = persona
+        self.started = time.perf_counter()
+        self.timestamp = time.time()
+        self.first_token = None
+        self.finished = None
+        self.prompt_tokens = None
+        self.generated_tokens = 0
+        self.consumer_s = 0.0   # Time the caller spent between tokens (rendering, I/O)
+        self.outcome = "complete"
+        self.stop_reason = None  # stop_sequence | repetition | max_tokens when decoding did not end on its own
+
+    @property
+    def ttft_s(self):
+        return self.first_token - self.started if self.first_token else None
+
+    @property
+    def latency_s(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def decode_tok_s(self):
+        if not self.first_token or self.generated_tokens < 2:
+            return None
+        elapsed = (self.finished or time.perf_counter()) - self.first_token
+        return (self.generated_tokens - 1) / elapsed if elapsed > 0 else None
+
+    def finish(self, outcome: str = None):
+        self.finished = time.perf_counter()
+        if outcome:
+            self.outcome = outcome
+
+    def to_dict(self) -> dict:
+        def rounded(value, digits):
+            return round(value, digits) if value is not None else None
+        return {
+            "ts": round(self.timestamp, 3),
+            "model": self.model,
+            "device": self.device,
+            "persona": self.persona,
+            "prompt_tokens": self.prompt_tokens,
+            "generated_tokens": self.generated_tokens,
+            "ttft_ms": rounded(self.ttft_s and self.ttft_s * 1000, 1),
+            "decode_tok_s": rounded(self.decode_tok_s, 1),
+            "latency_ms": rounded(self.latency_s * 1000, 1),
+            "consumer_ms": rounded(self.consumer_s * 1000, 1),
+            "outcome": self.outcome,
+            "stop_reason": self.stop_reason,
+        }
+
+
+class MetricsRecorder:
+    """
+    Keeps the most recent turns in memory for /stats and writes each finished
+    turn to `path`: one JSON line per turn in metrics/turns.jsonl, or running
+    totals in Prometheus text format in metrics/onyx.prom (rewritten atomically,
+    for a node_exporter textfile collector). An empty path keeps metrics in memory only.
+    """
+    def __init__(self, path: str = "metrics/", fmt: str = "jsonl", keep: int = 200):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown metrics format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+        self.path = path
+        self.format = fmt
+        self.recent = deque(maxlen=keep)
+        self.loads = deque(maxlen=keep)  # (model, device, seconds)
+        self._totals = {}  # (model, device) -> counters for the Prometheus file
+        self._lock = threading.Lock()
+
+    @property
+    def file_path(self):
+        if not self.path:
+            return None
+        return os.path.join(self.path, "turns.jsonl" if self.format == "jsonl" else "onyx.prom")
+
+    def record_load(self, model: str, device: str, seconds: float):
+        self.loads.append((model, device, seconds))
+
+    def record(self, turn: TurnMetrics):
+        with self._lock:
+            self.recent.append(turn)
+            totals = self._totals.setdefault((turn.model, turn.device), dict.fromkeys(
+                ("turns", "prompt_tokens", "generated_tokens", "latency_s", "ttft_s", "ttft_count", "early_stops"), 0))
+            totals["turns"] += 1
+            totals["prompt_tokens"] += turn.prompt_tokens or 0
+            totals["generated_tokens"] += turn.generated_tokens
+            totals["latency_s"] += turn.latency_s
+            if turn.outcome == "stopped":
+                totals["early_stops"] += 1
+            if turn.ttft_s is not None:
+                totals["ttft_s"] += turn.ttft_s
+                totals["ttft_count"] += 1
+            try:
+                self._write(turn)
+            except OSError as e:
+                print(f"Debug: Could not write metrics: {e}")
+
+    def summary(self) -> dict:
+        """Averages over the turns kept in memory."""
+        turns = list(self.recent)
+        def mean(values):
+            values = [v for v in values if v is not None]
+            return sum(values) / len(values) if values else None
+        generated = [t for t in turns if t.outcome != "cached"]  # Replayed replies would skew the speeds
+        return {
+            "turns": len(turns),
+            "cached": len(turns) - len(generated),
+            "prompt_tokens": sum(t.prompt_tokens or 0 for t in turns),
+            "generated_tokens": sum(t.generated_tokens for t in turns),
+            "ttft_ms": mean(t.ttft_s * 1000 if t.ttft_s is not None else None for t in generated),
+            "decode_tok_s": mean(t.decode_tok_s for t in generated),
+            "latency_ms": mean(t.latency_s * 1000 for t in turns),
+        }
+
+    def _write(self, turn: TurnMetrics):
+        path = self.file_path
+        if path is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        if self.format == "jsonl":
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(turn.to_dict()) + "\n")
+            return
+
+        lines = []
+        def metric(name, kind, help_text, field, scale=1):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (model, device), totals in sorted(self._totals.items()):
+                lines.append(f'{name}{{model="{_label(model)}",device="{_label(device)}"}} {totals[field] * scale:g}')
+        metric("onyx_turns_total", "counter", "Chat turns generated.", "turns")
+        metric("onyx_prompt_tokens_total", "counter", "Prompt tokens evaluated.", "prompt_tokens")
+        metric("onyx_generated_tokens_total", "counter", "Tokens generated.", "generated_tokens")
+        metric("onyx_turn_latency_seconds_total", "counter", "Time spent answering turns.", "latency_s")
+        metric("onyx_ttft_seconds_sum", "counter", "Sum of time-to-first-token.", "ttft_s")
+        metric("onyx_ttft_seconds_count", "counter", "Turns with a first token.", "ttft_count")
+        metric("onyx_early_stops_total", "counter", "Replies cut by a stop sequence or loop detection.", "early_stops")
+        last = turn.to_dict()
+        for name, field, scale in (("onyx_last_ttft_seconds", "ttft_ms", 0.001),
+                                   ("onyx_last_decode_tokens_per_second", "decode_tok_s", 1)):
+            if last[field] is not None:
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f'{name}{{model="{_label(turn.model)}",device="{_label(turn.device)}"}} {last[field] * scale:g}')
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
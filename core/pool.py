@@ -0,0 +1,164 @@
+import os
+from collections import OrderedDict
+
+# Working memory on top of the weights: scratch buffers and runtime, plus the
+# KV cache (a flat allowance when its size per token is not known).
+OVERHEAD_FACTOR = 1.15
+CONTEXT_OVERHEAD_GB = 0.5
+
+
+def total_ram_gb() -> float:
+    """Physical memory of the host in GB (8 GB if it cannot be determined)."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3
+    except (ValueError, OSError, AttributeError):
+        return 8.0
+
+
+def available_ram_gb() -> float:
+    """Memory that can be allocated without swapping, in GB (MemAvailable on Linux)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES") / 1024 ** 3
+    except (ValueError, OSError, AttributeError):
+        return total_ram_gb() / 2
+
+
+def estimate_footprint_gb(path: str = None, ramrequired=None, size_bytes: int = None,
+                          n_ctx: int = None, kv_bytes_per_token: int = None) -> float:
+    """
+    Estimates the resident size of a model in GB from its GGUF file size (given,
+    or read from `path`) and, when the KV cache size per token is known, the
+    context length. The catalog's `ramrequired` figure is only used when the
+    file size is unknown (a model not downloaded yet).
+    """
+    if size_bytes is None and path and os.path.exists(path):
+        size_bytes = os.path.getsize(path)
+    if size_bytes:
+        context_gb = CONTEXT_OVERHEAD_GB
+        if kv_bytes_per_token and n_ctx:
+            context_gb = kv_bytes_per_token * n_ctx / 1024 ** 3
+        return size_bytes / 1024 ** 3 * OVERHEAD_FACTOR + context_gb
+    try:
+        from_catalog = float(ramrequired) if ramrequired not in (None, "", "?") else 0.0
+    except (TypeError, ValueError):
+        from_catalog = 0.0
+    return from_catalog or 4.0
+
+
+class PoolEntry:
+    def __init__(self, model, footprint_gb: float):
+        self.model = model
+        self.footprint_gb = footprint_gb
+
+
+class ModelPool:
+    """
+    Keeps loaded models resident up to a memory budget and evicts the least
+    recently used ones when a new model would not fit. Keys are
+    (model filename, device), since the same file loaded on another device is a
+    different instance.
+    """
+    def __init__(self, budget_gb: float = 0):
+        # A budget of 0 means half of physical RAM.
+        self.budget_gb = budget_gb or total_ram_gb() / 2
+        self._entries = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def used_gb(self) -> float:
+        return sum(entry.footprint_gb for entry in self._entries.values())
+
+    def keys(self) -> list:
+        """Resident keys, least recently used first."""
+        return list(self._entries)
+
+    def get(self, key):
+        """Returns the resident model for `key` (marking it most recent), or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry.model
+
+    def reserve(self, footprint_gb: float, keep=()) -> list:
+        """
+        Evicts least recently used models (except those in `keep`) until
+        `footprint_gb` more fits in the budget. Returns the evicted keys.
+        """
+        evicted = []
+        for old_key in list(self._entries):
+            if self.used_gb + footprint_gb <= self.budget_gb:
+                break
+            if old_key in keep:
+                continue
+            self._close(self._entries.pop(old_key).model)
+            evicted.append(old_key)
+        return evicted
+
+    def put(self, key, model, footprint_gb: float, keep=()) -> list:
+        """
+        Adds a model, evicting least recently used entries (except those in
+        `keep`) until it fits. A model larger than the whole budget is still
+        admitted. Returns the evicted keys.
+        """
+        self._entries.pop(key, None)
+        evicted = self.reserve(footprint_gb, keep)
+        self._entries[key] = PoolEntry(model, footprint_gb)
+        return evicted
+
+    def footprint_gb(self, key) -> float:
+        entry = self._entries.get(key)
+        return entry.footprint_gb if entry else 0.0
+
+    def evictable_gb(self, keep=()) -> float:
+        return sum(entry.footprint_gb for key, entry in self._entries.items() if key not in keep)
+
+    def free(self, footprint_gb: float, keep=()) -> list:
+        """
+        Evicts least recently used models (except those in `keep`) until at
+        least `footprint_gb` has been released. Returns the evicted keys.
+        """
+        evicted, freed = [], 0.0
+        for old_key in list(self._entries):
+            if freed >= footprint_gb:
+                break
+            if old_key in keep:
+                continue
+            entry = self._entries.pop(old_key)
+            self._close(entry.model)
+            freed += entry.footprint_gb
+            evicted.append(old_key)
+        return evicted
+
+    def evict(self, key) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._close(entry.model)
+        return True
+
+    def clear(self, keep=()):
+        for key in list(self._entries):
+            if key not in keep:
+                self.evict(key)
+
+    @staticmethod
+    def _close(model):
+        close = getattr(model, "close", None)
+        if close:
+            try:
+                close()
+            except Exception as e:
+                print(f"Debug: Error releasing model: {e}")
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Every new chat session starts by evaluating its persona's system prompt. The
+# evaluated state of that prefix is the same for every session with the same
+# model, device and prompt, so it is captured once and restored into new
+# sessions (after /clear, /persona, a reopened chat...) instead of re-evaluated.
+
+
+class PersonaPrompts:
+    """Persona prompt files, read once and re-read only when their mtime changes."""
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache = {}  # path -> (mtime_ns, text)
+
+    def get(self, persona_name: str, default: str = None):
+        for path in (os.path.join(self.directory, f"{persona_name}.txt"),
+                     os.path.join(self.directory, persona_name)):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            try:
+                with open(path, 'r') as f:
+                    text = f.read().strip()
+            except Exception:
+                continue
+            self._cache[path] = (mtime, text)
+            return text
+        return default
+
+
+class PrefixCache:
+    """
+    Evaluated system-prompt states keyed by (model, device, prompt), least
+    recently used dropped first once `budget_mb` or `max_entries` is exceeded.
+    """
+    def __init__(self, budget_mb: float = 1024, max_entries: int = 8):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._states = OrderedDict()
+        self._too_large = set()  # Keys whose state exceeds the budget: not worth capturing again
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_bytes > 0
+
+    @staticmethod
+    def key(model_name: str, device: str, system_prompt: str) -> tuple:
+        return model_name, device, hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+    def wants(self, key: tuple) -> bool:
+        return self.enabled and key not in self._too_large
+
+    def get(self, key: tuple):
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                self.misses += 1
+                return None
+            self._states.move_to_end(key)
+            self.hits += 1
+            return state
+
+    def put(self, key: tuple, state: dict):
+        if len(state["data"]) > self.budget_bytes:
+            self._too_large.add(key)
+            return
+        with self._lock:
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_entries or self.used_bytes > self.budget_bytes:
+                self._states.popitem(last=False)
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(len(state["data"]) for state in self._states.values())
+
+    def __len__(self):
+        return len(self._states)
+
+
+def skip_next_system_ingest(model, system_prompt: str):
+    """
+    GPT4All re-evaluates the system prompt from scratch (reset_context=True) on
+    the first turn of a session. When the context already holds exactly that
+    prefix, this makes the next such call a no-op. It is one-shot: any call to
+    the inner model's prompt_model removes it again.
+    """
+    inner = model.model
+    original = inner.prompt_model
+
+    def prompt_model(prompt, prompt_template, callback, *args, **kwargs):
+        clear_system_ingest_skip(model)
+        if prompt == system_prompt and kwargs.get("n_predict") == 0 and kwargs.get("reset_context"):
+            return None
+        return original(prompt, prompt_template, callback, *args, **kwargs)
+
+    inner.prompt_model = prompt_model
+
+
+def has_system_ingest_skip(model) -> bool:
+    inner = getattr(model, "model", None)
+    return inner is not None and "prompt_model" in vars(inner)
+
+
+def clear_system_ingest_skip(model):
+    inner = getattr(model, "model", None)
+    if inner is not None and "prompt_model" in vars(inner):
+        del inner.prompt_model
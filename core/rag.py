@@ -0,0 +1,380 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+# Retrieval over local files. `/index <dir>` splits the text files under a
+# directory into overlapping line-based chunks, embeds them in batches with a
+# local embedding model (gpt4all's Embed4All) and keeps one index per directory:
+#   <path>/<id>/index.json    {"root": ..., "model": ..., "dim": ...}
+#   <path>/<id>/vectors.f32   unit-length float32 rows, appended; searched through np.memmap
+#   <path>/<id>/chunks.db     files (path, mtime_ns, size) and chunks (row, path, lines, text)
+# Re-indexing only embeds files whose mtime or size changed. The rows of changed
+# or deleted files stay in vectors.f32 as dead rows until there are more dead
+# than live ones, then the file is compacted. numpy is imported on first use.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, path TEXT NOT NULL, start_line INTEGER NOT NULL,
+                                   end_line INTEGER NOT NULL, text TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path);
+"""
+
+CHUNK_CHARS = 1200   # About 300 tokens: fits the embedding model's window, several fit in a prompt
+OVERLAP_CHARS = 200  # Lines repeated at the start of the next chunk
+EMBED_BATCH = 64
+MAX_FILE_BYTES = 2 * 1024 * 1024
+SKIP_DIRS = {"__pycache__", "node_modules", "venv", "site-packages"}  # Plus every hidden directory
+MIN_COMPACT_ROWS = 1024
+
+
+def _np():
+    import numpy  # Heavy; only needed once documents are indexed or searched
+    return numpy
+
+
+def chunk_lines(text: str, chunk_chars: int = CHUNK_CHARS, overlap_chars: int = OVERLAP_CHARS) -> list:
+    """(first line, last line, text) chunks of whole lines, each overlapping the previous one a little."""
+    lines = text.splitlines()
+    chunks = []
+    start = 0
+    while start < len(lines):
+        end, size = start, 0
+        while end < len(lines) and (end == start or size + len(lines[end]) + 1 <= chunk_chars):
+            size += len(lines[end]) + 1
+            end += 1
+        body = "\n".join(lines[start:end]).strip()
+        if body:
+            chunks.append((start + 1, end, body))
+        if end >= len(lines):
+            break
+        back, overlap = end, 0
+        while back > start + 1 and overlap + len(lines[back - 1]) + 1 <= overlap_chars:
+            back -= 1
+            overlap += len(lines[back]) + 1
+        start = back
+    return chunks
+
+
+def read_text(path: str):
+    """A file's text, or None for binary or oversized files."""
+    try:
+        if os.path.getsize(path) > MAX_FILE_BYTES:
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+class DocumentIndex:
+    """The chunks and vectors of one directory."""
+    def __init__(self, directory: str, root: str = None, model: str = None):
+        self.directory = directory
+        meta = {}
+        try:
+            with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self.root = root or meta.get("root")
+        self.model = meta.get("model") or model
+        self.dim = meta.get("dim")
+        self._conn = None
+        self._matrix = None  # np.memmap over vectors.f32, reopened after writes
+        self._live = None    # Boolean mask of rows that belong to a chunk
+        self._lock = threading.RLock()
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.directory, "chunks.db"), check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _save_meta(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"root": self.root, "model": self.model, "dim": self.dim}, f)
+
+    def stats(self) -> dict:
+        with self._lock:
+            db = self._db()
+            files = db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            chunks = db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return {"root": self.root, "files": files, "chunks": chunks, "rows": self._rows()}
+
+    # --- Indexing ---
+
+    def update(self, embed, progress=None) -> dict:
+        """
+        Embeds new and changed files, drops deleted ones. `embed(texts)` returns
+        one vector per text; `progress(done_bytes, total_bytes, chunks)` gets updates.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            db = self._db()
+            known = {path: (mtime, size) for path, mtime, size in db.execute("SELECT path, mtime_ns, size FROM files")}
+            on_disk = dict(self._walk())
+            removed = known.keys() - on_disk.keys()
+            changed = sorted(path for path, stamp in on_disk.items() if known.get(path) != stamp)
+            with db:
+                for path in removed:
+                    db.execute("DELETE FROM chunks WHERE path = ?", (path,))
+                    db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+            total_bytes = sum(on_disk[path][1] for path in changed)
+            done_bytes = chunk_count = 0
+            pending, finished = [], []
+            for path in changed:
+                db.execute("DELETE FROM chunks WHERE path = ?", (path,))  # Committed with the new chunks
+                text = read_text(os.path.join(self.root, path))
+                for first, last, body in chunk_lines(text) if text else ():
+                    pending.append((path, first, last, body))
+                finished.append((path,) + on_disk[path])
+                done_bytes += on_disk[path][1]
+                if len(pending) >= EMBED_BATCH:
+                    chunk_count += self._flush(embed, pending, finished)
+                    pending, finished = [], []
+                    if progress:
+                        progress(done_bytes, total_bytes, chunk_count)
+            chunk_count += self._flush(embed, pending, finished)
+            if progress:
+                progress(total_bytes, total_bytes, chunk_count)
+
+            dead = self._rows() - db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            if dead > max(MIN_COMPACT_ROWS, self._rows() - dead):
+                self._compact()
+        return {"files": len(changed), "removed": len(removed), "chunks": chunk_count,
+                "seconds": round(time.perf_counter() - start, 2)}
+
+    def _flush(self, embed, pending: list, finished: list) -> int:
+        """Embeds `pending` chunks in batches, then records them and the files they complete."""
+        db = self._db()
+        if pending:
+            vectors = []
+            for i in range(0, len(pending), EMBED_BATCH):
+                vectors.extend(embed([body for _, _, _, body in pending[i:i + EMBED_BATCH]]))
+            self.add(pending, vectors, commit=False)
+        db.executemany("INSERT OR REPLACE INTO files (path, mtime_ns, size) VALUES (?, ?, ?)", finished)
+        db.commit()
+        return len(pending)
+
+    def add(self, chunks: list, vectors, commit: bool = True):
+        """Appends (path, first line, last line, text) chunks with their vectors."""
+        np = _np()
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(chunks):
+            raise ValueError("Expected one vector per chunk.")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)  # Unit length: a dot product is the cosine similarity
+        with self._lock:
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self._save_meta()
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Vectors have {matrix.shape[1]} dimensions, the index {self.dim}.")
+            first = self._rows()
+            with open(self.vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            db = self._db()
+            db.executemany("INSERT INTO chunks (row, path, start_line, end_line, text) VALUES (?, ?, ?, ?, ?)",
+                           [(first + i,) + tuple(chunk) for i, chunk in enumerate(chunks)])
+            if commit:
+                db.commit()
+            self._matrix = self._live = None
+
+    def _walk(self):
+        """(relative path, (mtime_ns, size)) of every candidate file under the root."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".") and d not in SKIP_DIRS]
+            for name in filenames:
+                if name.startswith("."):
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                if st.st_size <= MAX_FILE_BYTES:
+                    yield os.path.relpath(full, self.root), (st.st_mtime_ns, st.st_size)
+
+    def _rows(self) -> int:
+        if not self.dim:
+            return 0
+        try:
+            return os.path.getsize(self.vectors_path) // (4 * self.dim)
+        except OSError:
+            return 0
+
+    def _compact(self):
+        """Rewrites vectors.f32 with live rows only."""
+        np = _np()
+        db = self._db()
+        rows = [row for (row,) in db.execute("SELECT row FROM chunks ORDER BY row")]
+        matrix = self._vectors()
+        with open(self.vectors_path + ".tmp", "wb") as f:
+            for i in range(0, len(rows), 8192):
+                f.write(np.ascontiguousarray(matrix[rows[i:i + 8192]]).tobytes())
+        self._matrix = matrix = None
+        with db:
+            # Ascending order: a row only ever moves down, into a slot already vacated
+            db.executemany("UPDATE chunks SET row = ? WHERE row = ?", [(new, old) for new, old in enumerate(rows)])
+            os.replace(self.vectors_path + ".tmp", self.vectors_path)
+        self._live = None
+
+    # --- Search ---
+
+    def _vectors(self):
+        if self._matrix is None:
+            rows = self._rows()
+            if not rows:
+                return None
+            self._matrix = _np().memmap(self.vectors_path, dtype="float32", mode="r", shape=(rows, self.dim))
+        return self._matrix
+
+    def _live_mask(self):
+        if self._live is None:
+            np = _np()
+            live = np.zeros(self._rows(), dtype=bool)
+            rows = np.fromiter((row for (row,) in self._db().execute("SELECT row FROM chunks")), dtype=np.int64)
+            live[rows[rows < len(live)]] = True
+            self._live = live
+        return self._live
+
+    def search(self, query, k: int = 4) -> list:
+        """The `k` chunks closest to the unit-length `query` vector, best first."""
+        np = _np()
+        with self._lock:
+            matrix = self._vectors()
+            if matrix is None or k <= 0:
+                return []
+            live = self._live_mask()
+            scores = matrix @ np.asarray(query, dtype=np.float32)
+            scores[~live[:len(scores)]] = -np.inf
+            k = min(k, int(live.sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            placeholders = ",".join("?" * len(top))
+            found = {row: (path, first, last, text) for row, path, first, last, text in self._db().execute(
+                f"SELECT row, path, start_line, end_line, text FROM chunks WHERE row IN ({placeholders})",
+                [int(row) for row in top])}
+        hits = []
+        for row in top:
+            path, first, last, text = found[int(row)]
+            hits.append({"root": self.root, "path": path, "start_line": first, "end_line": last,
+                         "text": text, "score": float(scores[row])})
+        return hits
+
+    def close(self):
+        with self._lock:
+            self._matrix = self._live = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class Retriever:
+    """
+    Every indexed directory under `path`, and the embedding model shared by
+    indexing and questions (loaded on first use).
+    """
+    def __init__(self, path: str = "cache/rag/", model_name: str = "all-MiniLM-L6-v2.gguf2.f16.gguf",
+                 model_path: str = "models/", embedder_class=None, top_k: int = 4, context_chars: int = 3000):
+        self.path = path
+        self.model_name = model_name
+        self.model_path = model_path
+        self.embedder_class = embedder_class  # None means gpt4all.Embed4All
+        self.top_k = top_k
+        self.context_chars = context_chars
+        self._embedder = None
+        self._indexes = None
+        self._lock = threading.Lock()
+
+    def _embed(self, texts: list, kind: str) -> list:
+        if self._embedder is None:
+            embedder_class = self.embedder_class
+            if embedder_class is None:
+                from gpt4all import Embed4All
+                embedder_class = Embed4All
+            self._embedder = embedder_class(self.model_name, model_path=self.model_path)
+        # Nomic embedding models expect a task prefix; the others none
+        prefix = kind if "nomic" in self.model_name.lower() else ""
+        return self._embedder.embed(texts, prefix=prefix)
+
+    def indexes(self) -> list:
+        with self._lock:
+            if self._indexes is None:
+                self._indexes = {}
+                if os.path.isdir(self.path):
+                    for entry in os.scandir(self.path):
+                        index = DocumentIndex(entry.path) if entry.is_dir() else None
+                        if index is not None and index.root:
+                            self._indexes[index.root] = index
+            return list(self._indexes.values())
+
+    def index_directory(self, directory: str, progress=None) -> dict:
+        """Indexes (or brings up to date) `directory`. Returns counts and timing."""
+        root = os.path.abspath(os.path.expanduser(directory))
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"{directory} is not a directory.")
+        self.indexes()
+        index = self._indexes.get(root)
+        if index is not None and index.model != self.model_name:
+            index.close()  # Vectors from another embedding model are not comparable: start over
+            shutil.rmtree(index.directory, ignore_errors=True)
+            index = None
+        if index is None:
+            key = hashlib.sha1(root.encode("utf-8")).hexdigest()[:12]
+            index = DocumentIndex(os.path.join(self.path, key), root=root, model=self.model_name)
+            index._save_meta()
+            with self._lock:
+                self._indexes[root] = index
+        result = index.update(lambda texts: self._embed(texts, "search_document"), progress)
+        stats = index.stats()
+        return dict(result, root=root, total_files=stats["files"], total_chunks=stats["chunks"])
+
+    def search(self, question: str, k: int = None) -> list:
+        """Best matching chunks over every index, best first."""
+        indexes = [index for index in self.indexes() if index.model == self.model_name]
+        if not indexes:
+            return []
+        k = k or self.top_k
+        query = _np().asarray(self._embed([question], "search_query")[0], dtype="float32")
+        norm = float(_np().linalg.norm(query))
+        if norm > 0:
+            query /= norm
+        hits = [hit for index in indexes for hit in index.search(query, k)]
+        return sorted(hits, key=lambda hit: hit["score"], reverse=True)[:k]
+
+    def build_prompt(self, question: str, hits: list) -> str:
+        """The question with as many retrieved chunks as fit in `context_chars`, best first."""
+        parts, used = [], 0
+        for i, hit in enumerate(hits, 1):
+            if parts and used + len(hit["text"]) > self.context_chars:
+                break
+            text = hit["text"][:self.context_chars]
+            parts.append(f"[{i}] {hit['path']} (lines {hit['start_line']}-{hit['end_line']}):\n{text}")
+            used += len(text)
+        return ("Answer the question using the excerpts below from local files. Cite them as [n]. "
+                "If they do not contain the answer, say so.\n\n" + "\n\n".join(parts) +
+                f"\n\nQuestion: {question}")
+
+    def close(self):
+        for index in self.indexes():
+            index.close()
+        if self._embedder is not None:
+            self._embedder.close()
+            self._embedder = None
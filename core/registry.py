@@ -0,0 +1,324 @@
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+# What we know about the .gguf files in model_path, kept in SQLite so a menu
+# never lists or reads the directory itself. A file's GGUF header is read once,
+# when it first shows up or its size/mtime changes; the directory is rescanned
+# only when its own mtime changes (files added, removed or renamed into place).
+# Load counts and last use are kept per file and drive evict(), which deletes
+# the least recently used models until the directory fits a disk budget.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    filename TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    architecture TEXT,
+    title TEXT,
+    quantization TEXT,
+    parameters INTEGER,
+    context_length INTEGER,
+    kv_bytes_per_token INTEGER,
+    expected_size INTEGER,
+    header_error TEXT,
+    added REAL NOT NULL,
+    load_count INTEGER NOT NULL DEFAULT 0,
+    last_used REAL
+)
+"""
+
+# llama.cpp's general.file_type values
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 4: "Q4_1_F16", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1",
+    10: "Q2_K", 11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M", 16: "Q5_K_S",
+    17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S", 22: "IQ3_XS", 23: "IQ3_XXS",
+    24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M", 28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS",
+    31: "IQ1_M", 32: "BF16",
+}
+
+# ggml tensor types: (elements per block, bytes per block)
+TENSOR_TYPES = {
+    0: (1, 4), 1: (1, 2), 2: (32, 18), 3: (32, 20), 6: (32, 22), 7: (32, 24), 8: (32, 34), 9: (32, 36),
+    10: (256, 84), 11: (256, 110), 12: (256, 144), 13: (256, 176), 14: (256, 210), 15: (256, 292),
+    16: (256, 66), 17: (256, 74), 18: (256, 98), 19: (256, 50), 20: (32, 18), 21: (256, 110),
+    22: (256, 82), 23: (256, 136), 24: (1, 1), 25: (1, 2), 26: (1, 4), 27: (1, 8), 28: (1, 8),
+    29: (256, 56), 30: (1, 2),
+}
+
+# GGUF metadata value types: struct format of the scalar ones
+_SCALARS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d"}
+_STRING, _ARRAY = 8, 9
+
+
+class GGUFError(ValueError):
+    pass
+
+
+class _Reader:
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, fmt: str):
+        size = struct.calcsize(fmt)
+        data = self.f.read(size)
+        if len(data) != size:
+            raise GGUFError("File ends inside the header.")
+        return struct.unpack(fmt, data)[0]
+
+    def string(self) -> str:
+        length = self.read("<Q")
+        data = self.f.read(length)
+        if len(data) != length:
+            raise GGUFError("File ends inside the header.")
+        return data.decode("utf-8", errors="replace")
+
+    def value(self, kind: int, keep: bool = True):
+        """Reads one metadata value; arrays (tokenizer vocabularies...) are skipped unless `keep`."""
+        if kind in _SCALARS:
+            return self.read(_SCALARS[kind])
+        if kind == _STRING:
+            return self.string()
+        if kind == _ARRAY:
+            item_kind, count = self.read("<I"), self.read("<Q")
+            if item_kind in _SCALARS and not keep:
+                self.f.seek(struct.calcsize(_SCALARS[item_kind]) * count, os.SEEK_CUR)
+                return None
+            items = [self.value(item_kind, keep) for _ in range(count)]
+            return items if keep else None
+        raise GGUFError(f"Unknown metadata type {kind}.")
+
+
+def read_gguf_header(path: str) -> dict:
+    """
+    Metadata from a GGUF file's header: architecture, name, quantization,
+    parameter count, trained context length, KV cache bytes per token of
+    context, and the size the file must have to hold all of its tensors (None
+    if a tensor type is unknown).
+    """
+    with open(path, "rb") as f:
+        r = _Reader(f)
+        if f.read(4) != b"GGUF":
+            raise GGUFError("Not a GGUF file.")
+        version = r.read("<I")
+        if version < 2:
+            raise GGUFError(f"GGUF version {version} is not supported.")
+        n_tensors, n_kv = r.read("<Q"), r.read("<Q")
+
+        meta = {}
+        for _ in range(n_kv):
+            key = r.string()
+            kind = r.read("<I")
+            meta[key] = r.value(kind, keep=kind != _ARRAY)
+
+        parameters = 0
+        end = 0
+        for _ in range(n_tensors):
+            r.string()
+            dims = [r.read("<Q") for _ in range(r.read("<I"))]
+            tensor_type, offset = r.read("<I"), r.read("<Q")
+            elements = 1
+            for dim in dims:
+                elements *= dim
+            parameters += elements
+            block = TENSOR_TYPES.get(tensor_type)
+            if block is None or end is None:
+                end = None
+            else:
+                end = max(end, offset + elements // block[0] * block[1])
+
+        alignment = meta.get("general.alignment") or 32
+        data_start = -(-f.tell() // alignment) * alignment
+
+    arch = meta.get("general.architecture")
+    file_type = meta.get("general.file_type")
+    # F16 K and V caches: 2 x layers x (embedding width scaled down by grouped-query attention) x 2 bytes
+    layers, width = meta.get(f"{arch}.block_count"), meta.get(f"{arch}.embedding_length")
+    heads = meta.get(f"{arch}.attention.head_count")
+    kv_heads = meta.get(f"{arch}.attention.head_count_kv") or heads
+    kv_bytes = 2 * layers * (width * kv_heads // heads) * 2 if layers and width and heads else None
+    return {
+        "architecture": arch,
+        "title": meta.get("general.name"),
+        "quantization": FILE_TYPES.get(file_type, str(file_type) if file_type is not None else None),
+        "parameters": parameters or None,
+        "context_length": meta.get(f"{arch}.context_length"),
+        "kv_bytes_per_token": kv_bytes,
+        "expected_size": data_start + end if end is not None else None,
+    }
+
+
+def format_parameters(count) -> str:
+    if not count:
+        return "?"
+    if count >= 1e9:
+        return f"{count / 1e9:.1f}B"
+    return f"{count / 1e6:.0f}M"
+
+
+class ModelRegistry:
+    def __init__(self, db_path: str = "cache/models.db", model_path: str = "models/"):
+        self.db_path = db_path
+        self.model_path = model_path
+        self._conn = None
+        self._lock = threading.RLock()
+        self._dir_mtime = None
+        self._files = frozenset()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Shared by the UI, loader and server threads (under self._lock); batch workers open their own
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute(SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(models)")}
+            if "kv_bytes_per_token" not in columns:  # Index written before the column existed: re-read headers
+                with self._conn:
+                    self._conn.execute("ALTER TABLE models ADD COLUMN kv_bytes_per_token INTEGER")
+                    self._conn.execute("UPDATE models SET mtime_ns = 0")
+        return self._conn
+
+    # --- Indexing ---
+
+    def files(self) -> frozenset:
+        """Filenames of the models on disk."""
+        self.sync()
+        return self._files
+
+    def __contains__(self, filename) -> bool:
+        return filename in self.files()
+
+    def sync(self, force: bool = False):
+        """Brings the index up to date if the directory changed since the last look."""
+        try:
+            mtime = os.stat(self.model_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if mtime == self._dir_mtime and not force:
+                return
+            try:
+                self._scan(mtime is not None)
+            except sqlite3.Error as e:
+                print(f"Debug: Could not update the model registry: {e}")
+                return
+            self._dir_mtime = mtime
+
+    def _scan(self, exists: bool):
+        on_disk = {}
+        if exists:
+            with os.scandir(self.model_path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".gguf") and entry.is_file():
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        on_disk[entry.name] = (st.st_size, st.st_mtime_ns)
+
+        db = self._db()
+        known = {row["filename"]: (row["size"], row["mtime_ns"])
+                 for row in db.execute("SELECT filename, size, mtime_ns FROM models")}
+        with db:
+            for filename in known.keys() - on_disk.keys():
+                db.execute("DELETE FROM models WHERE filename = ?", (filename,))
+            for filename, (size, mtime_ns) in on_disk.items():
+                if known.get(filename) != (size, mtime_ns):
+                    self._index(db, filename, size, mtime_ns, new=filename not in known)
+        self._files = frozenset(on_disk)
+
+    def _index(self, db, filename: str, size: int, mtime_ns: int, new: bool):
+        header, error = {}, None
+        try:
+            header = read_gguf_header(os.path.join(self.model_path, filename))
+        except (OSError, GGUFError, struct.error, MemoryError, OverflowError) as e:
+            error = str(e) or type(e).__name__
+        values = (size, mtime_ns, header.get("architecture"), header.get("title"), header.get("quantization"),
+                  header.get("parameters"), header.get("context_length"), header.get("kv_bytes_per_token"),
+                  header.get("expected_size"), error)
+        if new:
+            db.execute("INSERT INTO models (size, mtime_ns, architecture, title, quantization, parameters, "
+                       "context_length, kv_bytes_per_token, expected_size, header_error, filename, added) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values + (filename, time.time()))
+        else:  # Replaced or re-downloaded: new header, same usage history
+            db.execute("UPDATE models SET size = ?, mtime_ns = ?, architecture = ?, title = ?, quantization = ?, "
+                       "parameters = ?, context_length = ?, kv_bytes_per_token = ?, expected_size = ?, "
+                       "header_error = ? WHERE filename = ?", values + (filename,))
+
+    # --- Queries ---
+
+    def entry(self, filename: str):
+        """The registry row for a model file as a dict, or None if it is not on disk."""
+        self.sync()
+        with self._lock:
+            row = self._db().execute("SELECT * FROM models WHERE filename = ?", (filename,)).fetchone()
+        return _entry(row) if row is not None else None
+
+    def entries(self) -> list:
+        """Every model on disk, most recently used first."""
+        self.sync()
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT * FROM models ORDER BY COALESCE(last_used, added) DESC").fetchall()
+        return [_entry(row) for row in rows]
+
+    def disk_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.entries())
+
+    # --- Usage ---
+
+    def record_load(self, filename: str):
+        self._touch("UPDATE models SET load_count = load_count + 1, last_used = ? WHERE filename = ?", filename)
+
+    def record_use(self, filename: str):
+        self._touch("UPDATE models SET last_used = ? WHERE filename = ?", filename)
+
+    def _touch(self, sql: str, filename: str):
+        self.sync()
+        try:
+            with self._lock, self._db() as db:
+                db.execute(sql, (time.time(), filename))
+        except sqlite3.Error as e:
+            print(f"Debug: Could not record model use: {e}")
+
+    # --- Eviction ---
+
+    def evict(self, budget_gb: float, keep=(), dry_run: bool = False) -> list:
+        """
+        Deletes model files, least recently used first, until the directory
+        holds at most `budget_gb`. Files in `keep` are never deleted. Returns
+        the entries removed (or that would be, with `dry_run`).
+        """
+        entries = self.entries()
+        used = sum(entry["size"] for entry in entries)
+        budget = budget_gb * 1024 ** 3
+        removed = []
+        for entry in reversed(entries):
+            if used <= budget:
+                break
+            if entry["filename"] in keep:
+                continue
+            if not dry_run:
+                try:
+                    os.remove(os.path.join(self.model_path, entry["filename"]))
+                except OSError as e:
+                    print(f"Debug: Could not delete {entry['filename']}: {e}")
+                    continue
+            used -= entry["size"]
+            removed.append(entry)
+        if removed and not dry_run:
+            self.sync(force=True)
+        return removed
+
+
+def _entry(row) -> dict:
+    entry = dict(row)
+    expected = entry["expected_size"]
+    # None when the header could not tell (unreadable, or a tensor type this parser does not know)
+    entry["complete"] = entry["size"] >= expected if expected else (False if entry["header_error"] else None)
+    return entry
@@ -0,0 +1,142 @@
+import time
+from rich.markdown import Markdown
+from rich.segment import Segment, Segments
+
+
+class StreamingMarkdown:
+    """
+    Incremental Markdown renderer for streamed replies.
+
+    Completed blocks (paragraphs, headings, closed code fences, tables, lists)
+    are frozen: they are parsed once and printed above the Live region, then
+    never touched again. Only the open tail block is re-parsed, and only once
+    per Live frame instead of once per token.
+    """
+
+    FENCE_CHARS = ("`", "~")
+
+    def __init__(self, live, refresh_per_second: float = None, code_theme: str = "monokai"):
+        self.live = live
+        self.code_theme = code_theme
+        rate = refresh_per_second or getattr(live, "refresh_per_second", 10) or 10
+        self.frame_interval = 1.0 / rate
+
+        self._parts = []          # Every token received, joined lazily for .text
+        self._tail = ""           # Text of the open (not yet frozen) block
+        self._scan_pos = 0        # Offset in _tail up to which lines are classified
+        self._fence = None        # Marker of the open code fence, e.g. "```"
+        self._pending = []        # Frozen blocks waiting for the next frame
+        self._printed_blocks = 0
+        self._dirty = False
+        self._last_frame = 0.0
+
+        self.tokens = 0
+        self.frames = 0
+
+    @property
+    def text(self) -> str:
+        """The full reply received so far."""
+        return "".join(self._parts)
+
+    def feed(self, token: str):
+        """Add a streamed token. Renders only if a frame is due."""
+        if not token:
+            return
+        self._parts.append(token)
+        self.tokens += 1
+        self._tail += token
+        self._dirty = True
+        if "\n" in token:
+            self._scan_lines()
+        self._maybe_render()
+
+    def close(self):
+        """Flush everything. Call once the stream has ended, before leaving Live."""
+        if self._tail.strip():
+            self._pending.append(self._tail)
+        self._tail = ""
+        self._scan_pos = 0
+        self._dirty = True
+        self._render()
+
+    # --- Block detection ---
+
+    def _scan_lines(self):
+        """Classify newly completed lines of the tail and freeze finished blocks."""
+        while True:
+            nl = self._tail.find("\n", self._scan_pos)
+            if nl == -1:
+                return
+            line_start = self._scan_pos
+            line = self._tail[line_start:nl]
+            self._scan_pos = nl + 1
+            stripped = line.strip()
+
+            if self._fence:
+                # Closing fence: same char, at least as long, nothing after it.
+                if stripped.startswith(self._fence) and not stripped.lstrip(self._fence[0]):
+                    self._fence = None
+                    self._freeze(self._scan_pos)
+                continue
+
+            marker = self._fence_marker(stripped)
+            if marker:
+                # A fence interrupts the paragraph before it; freeze that first.
+                if self._tail[:line_start].strip():
+                    self._freeze(line_start)
+                self._fence = marker
+            elif not stripped:
+                self._freeze(self._scan_pos)
+            elif stripped.startswith("#"):
+                self._freeze(self._scan_pos)
+
+    def _fence_marker(self, stripped: str):
+        for char in self.FENCE_CHARS:
+            if stripped.startswith(char * 3):
+                count = len(stripped) - len(stripped.lstrip(char))
+                return char * count
+        return None
+
+    def _freeze(self, end: int):
+        block = self._tail[:end]
+        self._tail = self._tail[end:]
+        self._scan_pos -= end
+        if block.strip():
+            self._pending.append(block)
+
+    # --- Rendering ---
+
+    def _maybe_render(self):
+        now = time.perf_counter()
+        if now - self._last_frame >= self.frame_interval:
+            self._render(now)
+
+    def _render(self, now: float = None):
+        if self._pending:
+            # Batch every block frozen since the last frame into one parse.
+            self.live.console.print(self._render_frozen("".join(self._pending)))
+            self._printed_blocks += len(self._pending)
+            self._pending = []
+        if self._dirty:
+            self.live.update(Markdown(self._tail, code_theme=self.code_theme))
+            self._dirty = False
+        self.frames += 1
+        self._last_frame = now if now is not None else time.perf_counter()
+
+    def _render_frozen(self, markdown_text: str) -> Segments:
+        """
+        Renders frozen blocks once, keeping the spacing a single Markdown of the
+        whole reply would have: one blank line between blocks.
+        """
+        console = self.live.console
+        markdown = Markdown(markdown_text, code_theme=self.code_theme)
+        lines = console.render_lines(markdown, console.options, pad=False)
+
+        segments = []
+        # Some elements (lists, tables) already lead with their own blank line.
+        if self._printed_blocks and lines and lines[0]:
+            segments.append(Segment.line())
+        for line in lines:
+            segments.extend(line)
+            segments.append(Segment.line())
+        return Segments(segments)
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Replies cached by what determines them: the model file, the system prompt,
+# the sampling parameters, where replies are cut short (stop strings and the
+# loop detector), the conversation so far and the prompt itself.
+# Hot entries live in an in-memory LRU; every entry is also written to
+# <path>/<key[:2]>/<key>.json so repeats survive restarts. The disk tier is
+# capped at `disk_mb` and trimmed oldest-first (a hit refreshes the file's mtime).
+
+
+def model_identity(path: str) -> str:
+    """Filename plus size and mtime, so a re-downloaded or replaced file gets new keys."""
+    try:
+        st = os.stat(path)
+        return f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return os.path.basename(path)
+
+
+def history_digest(history: list) -> str:
+    digest = hashlib.sha256()
+    for message in history or []:
+        digest.update(f"{message.get('role')}\x00{message.get('content')}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str = "cache/responses/", memory_entries: int = 256, disk_mb: float = 256,
+                 max_temperature: float = 0.3):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_bytes = int(disk_mb * 1024 * 1024)
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_used = None  # Bytes on disk, counted on first write
+
+    def cacheable(self, temperature: float) -> bool:
+        """Only near-deterministic sampling is cached, unless max_temperature is raised."""
+        return temperature is not None and temperature <= self.max_temperature
+
+    @staticmethod
+    def key(model: str, system_prompt: str, temperature: float, top_k: int, max_tokens: int,
+            history: list, prompt: str, stop_sequences=(), repeat_stop: int = None) -> str:
+        material = json.dumps([model, system_prompt, round(float(temperature), 4), top_k, max_tokens,
+                               sorted(set(stop_sequences or ())), repeat_stop,
+                               history_digest(history), prompt], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """The cached token list for `key`, or None."""
+        with self._lock:
+            tokens = self._memory.get(key)
+            if tokens is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return tokens
+        tokens = self._read(key)
+        with self._lock:
+            if tokens is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, tokens)
+        return tokens
+
+    def put(self, key: str, tokens: list):
+        tokens = list(tokens)
+        with self._lock:
+            self._remember(key, tokens)
+        if self.path and self.disk_bytes > 0:
+            try:
+                self._write(key, tokens)
+            except OSError as e:
+                print(f"Debug: Could not write response cache: {e}")
+
+    def clear(self) -> int:
+        """Drops both tiers. Returns the number of files removed."""
+        with self._lock:
+            self._memory.clear()
+            self._disk_used = 0
+        removed = 0
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self) -> dict:
+        entries = self._disk_entries()
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory),
+                "disk_entries": len(entries), "disk_mb": round(sum(size for _, size, _ in entries) / 1024 ** 2, 2)}
+
+    # --- Tiers ---
+
+    def _remember(self, key: str, tokens: list):
+        self._memory[key] = tokens
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    def _read(self, key: str):
+        if not self.path:
+            return None
+        path = self._file(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tokens = json.load(f)["tokens"]
+            os.utime(path)  # Recently used: trimmed last
+            return tokens
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write(self, key: str, tokens: list):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"tokens": tokens}, ensure_ascii=False).encode("utf-8")
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_used += len(data)
+            over = self._disk_used > self.disk_bytes
+        if over:
+            self._trim()
+
+    def _trim(self):
+        """Removes the least recently used files until the disk tier is within 90% of its cap."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        used = sum(size for _, size, _ in entries)
+        target = self.disk_bytes * 0.9
+        for path, size, _ in entries:
+            if used <= target:
+                break
+            try:
+                os.remove(path)
+                used -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_used = used
+
+    def _disk_entries(self) -> list:
+        """(path, size, mtime) of every cached file."""
+        entries = []
+        if not self.path or not os.path.isdir(self.path):
+            return entries
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((entry.path, st.st_size, st.st_mtime))
+        return entries
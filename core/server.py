@@ -0,0 +1,327 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# OpenAI-compatible HTTP front end for ModelEngine.
+#
+#   POST /v1/chat/completions   {"messages": [...], "stream": bool, "max_tokens", "temperature", "top_k"}
+#   POST /v1/completions        {"prompt": "...", ...same sampling fields}
+#   GET  /v1/models, GET /health
+#
+# One worker owns the model and runs one generation at a time. Requests wait in
+# a bounded queue that is served round-robin per client, so one busy client
+# cannot starve the others; a full queue answers 429 instead of piling up.
+
+MAX_BODY = 4 * 1024 * 1024
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, client: str, kind: str, body: dict):
+        self.id = uuid.uuid4().hex[:24]
+        self.client = client
+        self.kind = kind
+        self.body = body
+        self.created = time.perf_counter()
+        self.started = None
+        self.queue_depth = 0
+        self.cancelled = threading.Event()
+        self.tokens = asyncio.Queue()  # str tokens, then a final dict with the outcome
+        self.ready = asyncio.Event()   # set when the worker picks the job up
+
+    @property
+    def queue_wait_ms(self) -> float:
+        end = self.started or time.perf_counter()
+        return round((end - self.created) * 1000, 1)
+
+
+class FairQueue:
+    """Bounded queue that serves clients round-robin."""
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._queues = OrderedDict()  # client -> deque of jobs
+        self._size = 0
+        self._available = asyncio.Condition()
+
+    def __len__(self):
+        return self._size
+
+    async def put(self, job: Job):
+        async with self._available:
+            if self._size >= self.maxsize:
+                raise QueueFull()
+            self._queues.setdefault(job.client, deque()).append(job)
+            self._size += 1
+            job.queue_depth = self._size
+            self._available.notify()
+
+    async def get(self) -> Job:
+        async with self._available:
+            while True:
+                while not self._size:
+                    await self._available.wait()
+                client, jobs = next(iter(self._queues.items()))
+                job = jobs.popleft()
+                self._size -= 1
+                # Rotate: this client goes to the back of the line.
+                del self._queues[client]
+                if jobs:
+                    self._queues[client] = jobs
+                if not job.cancelled.is_set():
+                    return job
+
+
+class CompletionServer:
+    def __init__(self, engine, host: str = "127.0.0.1", port: int = 8080, max_queue: int = 32):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.queue = FairQueue(max_queue)
+        self.completed = 0
+        self._loop = None
+        self._server = None
+
+    # --- Worker ---
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            job.started = time.perf_counter()
+            job.ready.set()
+            # Generation is blocking; run it on a thread and hop tokens back to the loop.
+            await self._loop.run_in_executor(None, self._run_job, job)
+            self.completed += 1
+
+    def _run_job(self, job: Job):
+        body = job.body
+        put = lambda item: self._loop.call_soon_threadsafe(job.tokens.put_nowait, item)
+        max_tokens = body.get("max_tokens") or self.engine.config.settings.max_tokens
+        generated = 0
+        try:
+            if job.kind == "chat":
+                messages = body.get("messages") or []
+                history, prompt = _split_messages(messages)
+            else:
+                history, prompt = None, _prompt_text(body.get("prompt", ""))
+
+            stream = self.engine.generate_stateless(
+                prompt, history=history, max_tokens=max_tokens,
+                temperature=body.get("temperature"), top_k=body.get("top_k"),
+                should_stop=job.cancelled.is_set
+            )
+            for token in stream:
+                generated += 1
+                put(token)
+            context = self.engine.context_tokens()
+            prompt_tokens = max(context - generated, 0) if context is not None else 0
+            put({"finish_reason": "length" if generated >= max_tokens else "stop",
+                 "prompt_tokens": prompt_tokens, "completion_tokens": generated})
+        except Exception as e:
+            put({"error": str(e)})
+
+    # --- HTTP ---
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, headers, body = await _read_request(reader)
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            await _send_json(writer, 400, {"error": {"message": "Malformed request."}})
+            return
+
+        try:
+            if method == "GET" and path == "/health":
+                await _send_json(writer, 200, {"status": "ok", "queue_depth": len(self.queue),
+                                               "completed": self.completed})
+            elif method == "GET" and path == "/v1/models":
+                await _send_json(writer, 200, {"object": "list", "data": [
+                    {"id": self.engine.current_model_name, "object": "model", "owned_by": "local"}]})
+            elif method == "POST" and path in ("/v1/chat/completions", "/v1/completions"):
+                kind = "chat" if path == "/v1/chat/completions" else "text"
+                await self._completion(reader, writer, kind, headers, body)
+            else:
+                await _send_json(writer, 404, {"error": {"message": f"No route for {method} {path}"}})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _completion(self, reader, writer, kind, headers, raw_body):
+        try:
+            body = json.loads(raw_body or b"{}")
+        except ValueError:
+            await _send_json(writer, 400, {"error": {"message": "Body is not valid JSON."}})
+            return
+
+        peer = writer.get_extra_info("peername") or ("local",)
+        client = body.get("user") or headers.get("x-client-id") or str(peer[0])
+        job = Job(client, kind, body)
+        try:
+            await self.queue.put(job)
+        except QueueFull:
+            await _send_json(writer, 429, {"error": {"message": "Request queue is full."}},
+                             {"Retry-After": "1", "X-Queue-Depth": str(len(self.queue))})
+            return
+
+        # The client hanging up cancels the job, queued or running.
+        watcher = asyncio.ensure_future(reader.read(1))
+        on_hangup = lambda _: job.cancelled.set()
+        watcher.add_done_callback(on_hangup)
+        try:
+            ready = asyncio.ensure_future(job.ready.wait())
+            await asyncio.wait([ready, watcher], return_when=asyncio.FIRST_COMPLETED)
+            if not ready.done():
+                ready.cancel()
+                return  # Gone while still queued; the worker will skip the job
+            queue_headers = {"X-Queue-Depth": str(job.queue_depth), "X-Queue-Wait-Ms": str(job.queue_wait_ms)}
+            if body.get("stream"):
+                await self._stream_response(writer, job, queue_headers)
+            else:
+                await self._full_response(writer, job, queue_headers)
+        except ConnectionError:
+            job.cancelled.set()
+        finally:
+            watcher.remove_done_callback(on_hangup)
+            if not watcher.done():
+                watcher.cancel()
+
+    async def _full_response(self, writer, job: Job, queue_headers: dict):
+        parts = []
+        while True:
+            item = await job.tokens.get()
+            if isinstance(item, dict):
+                break
+            parts.append(item)
+        if "error" in item:
+            await _send_json(writer, 500, {"error": {"message": item["error"]}}, queue_headers)
+            return
+
+        text = "".join(parts)
+        if job.kind == "chat":
+            choice = {"index": 0, "message": {"role": "assistant", "content": text},
+                      "finish_reason": item["finish_reason"]}
+        else:
+            choice = {"index": 0, "text": text, "finish_reason": item["finish_reason"]}
+        headers = dict(queue_headers)
+        headers["X-Generation-Ms"] = str(round((time.perf_counter() - job.started) * 1000, 1))
+        await _send_json(writer, 200, {
+            "id": f"{'chatcmpl' if job.kind == 'chat' else 'cmpl'}-{job.id}",
+            "object": "chat.completion" if job.kind == "chat" else "text_completion",
+            "created": int(time.time()),
+            "model": self.engine.current_model_name,
+            "choices": [choice],
+            "usage": {"prompt_tokens": item["prompt_tokens"], "completion_tokens": item["completion_tokens"],
+                      "total_tokens": item["prompt_tokens"] + item["completion_tokens"]},
+        }, headers)
+
+    async def _stream_response(self, writer, job: Job, queue_headers: dict):
+        head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream", "Cache-Control: no-cache",
+                "Connection: close"] + [f"{k}: {v}" for k, v in queue_headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode())
+        await writer.drain()
+
+        base = {
+            "id": f"{'chatcmpl' if job.kind == 'chat' else 'cmpl'}-{job.id}",
+            "object": "chat.completion.chunk" if job.kind == "chat" else "text_completion",
+            "created": int(time.time()),
+            "model": self.engine.current_model_name,
+        }
+
+        def chunk(content, finish_reason=None):
+            if job.kind == "chat":
+                delta = {"content": content} if content is not None else {}
+                choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            else:
+                choice = {"index": 0, "text": content or "", "finish_reason": finish_reason}
+            return f"data: {json.dumps(dict(base, choices=[choice]))}\n\n".encode()
+
+        if job.kind == "chat":
+            writer.write(f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {'role': 'assistant'}, 'finish_reason': None}]))}\n\n".encode())
+        while True:
+            item = await job.tokens.get()
+            if isinstance(item, dict):
+                break
+            writer.write(chunk(item))
+            await writer.drain()
+
+        if "error" in item:
+            writer.write(f"data: {json.dumps({'error': {'message': item['error']}})}\n\n".encode())
+        else:
+            writer.write(chunk(None, item["finish_reason"]))
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._worker_task = asyncio.ensure_future(self._worker())
+        return self
+
+    async def stop(self):
+        self._worker_task.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def serve_forever(self):
+        async def run():
+            await self.start()
+            print(f"OpenAI-compatible API on http://{self.host}:{self.port}/v1 "
+                  f"(model: {self.engine.current_model_name})")
+            await self._server.serve_forever()
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+
+
+def _split_messages(messages: list):
+    """Splits OpenAI messages into (history with system first, last user prompt)."""
+    messages = [{"role": m.get("role", "user"), "content": _prompt_text(m.get("content", ""))} for m in messages]
+    prompt = ""
+    if messages and messages[-1]["role"] == "user":
+        prompt = messages.pop()["content"]
+    system = [m for m in messages if m["role"] == "system"]
+    history = [{"role": "system", "content": "\n".join(m["content"] for m in system)}]
+    history += [m for m in messages if m["role"] in ("user", "assistant")]
+    return history, prompt
+
+
+def _prompt_text(value) -> str:
+    if isinstance(value, list):  # Content parts or a batch of prompts: join the text
+        return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in value)
+    return str(value)
+
+
+async def _read_request(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    method, path, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise ValueError("Body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], headers, body
+
+
+async def _send_json(writer, status: int, payload: dict, headers: dict = None):
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+               500: "Internal Server Error"}
+    data = json.dumps(payload).encode()
+    head = [f"HTTP/1.1 {status} {reasons.get(status, 'OK')}", "Content-Type: application/json",
+            f"Content-Length: {len(data)}", "Connection: close"]
+    head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+    await writer.drain()
@@ -0,0 +1,233 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from core.snapshot import capture_backend_state, restore_backend_state
+
+DEFAULT_SESSION = "default"
+SAMPLING_PARAMS = ("temperature", "top_k", "max_tokens")
+
+
+class ChatSession:
+    """One named conversation: history, persona and sampling overrides."""
+    def __init__(self, name: str, persona: str, params: dict = None):
+        self.name = name
+        self.persona = persona
+        self.params = {k: v for k, v in (params or {}).items() if k in SAMPLING_PARAMS and v is not None}
+        self.history = []     # System message first, as ModelEngine.export_history returns it
+        self.state = None     # Evaluated context while parked, if it was captured
+        self.state_key = None  # (model, device) the state belongs to
+        self.created = self.last_used = time.time()
+
+    @property
+    def turns(self) -> int:
+        return sum(1 for m in self.history if m.get("role") == "user")
+
+    def info(self) -> dict:
+        return {"name": self.name, "persona": self.persona, "turns": self.turns, "last_used": self.last_used,
+                "params": dict(self.params), "parked_state": self.state is not None}
+
+
+class _Ticket:
+    def __init__(self, name: str):
+        self.name = name
+        self.since = time.monotonic()
+
+
+class SessionManager:
+    """
+    Named sessions multiplexed over one engine. Only one session is in the
+    model context at a time. Switching parks the active session (its history
+    and, within `state_budget_mb`, its evaluated context) and brings in the
+    next one: from its parked state when it has one, so no prefill at all, and
+    otherwise by replaying its history in one batched prefill.
+
+    Turns are serialized by a small scheduler: when the model frees up, a
+    waiting request for the session already in the context goes first (no
+    switch), unless another request has been waiting longer than `max_wait_s`.
+    """
+    def __init__(self, engine, state_budget_mb: float = 1024, max_wait_s: float = 2.0):
+        self.engine = engine
+        self.state_budget = int(state_budget_mb * 1024 * 1024)
+        self.max_wait_s = max_wait_s
+        self.sessions = OrderedDict()
+        self.active = None       # Name of the session in the model context
+        self.switches = {"state": 0, "replay": 0}
+        self._context = None     # The engine's history list when `active` was brought in
+        self._cond = threading.Condition()
+        self._busy = False
+        self._waiting = []
+
+    # --- Bookkeeping ---
+
+    def open(self, name: str = DEFAULT_SESSION, persona: str = None, **params) -> ChatSession:
+        """Returns the session `name`, creating it if needed. Given params override its sampling settings."""
+        with self._cond:
+            session = self.sessions.get(name)
+            if session is None:
+                session = ChatSession(name, persona or self.engine.config.settings.persona, params)
+                self.sessions[name] = session
+            else:
+                session.params.update({k: v for k, v in params.items() if k in SAMPLING_PARAMS and v is not None})
+            return session
+
+    def get(self, name: str):
+        return self.sessions.get(name)
+
+    def list(self) -> list:
+        """Session infos, most recently used first."""
+        infos = []
+        for session in self.sessions.values():
+            info = session.info()
+            info["active"] = session.name == self.active
+            infos.append(info)
+        return sorted(infos, key=lambda info: info["last_used"], reverse=True)
+
+    def history(self, name: str) -> list:
+        """Current history of a session, including a reply being generated in it right now."""
+        session = self.sessions[name]
+        if name == self.active and self._in_context():
+            return self.engine.export_history()
+        return list(session.history)
+
+    def close(self, name: str) -> bool:
+        with self._slot(name):
+            session = self.sessions.pop(name, None)
+            if session is not None and name == self.active:
+                self.engine.reset_session(quiet=True)
+                self.active = self._context = None
+        return session is not None
+
+    def reset(self, name: str, persona: str = None):
+        """Clears a session's conversation (and switches its persona if given)."""
+        with self._slot(name):
+            session = self.open(name)
+            session.history = []
+            session.state = session.state_key = None
+            if persona:
+                session.persona = persona
+            if name == self.active:
+                self.engine.reset_session(quiet=True)
+                self._context = None
+
+    def adopt(self, name: str):
+        """Makes whatever conversation is in the model now the content of session `name`."""
+        with self._slot(name):
+            session = self.open(name)
+            self._park_active(capture=False)
+            session.history = self.engine.export_history()
+            session.state = session.state_key = None
+            self._mark_active(session)
+
+    # --- Scheduling ---
+
+    def switch(self, name: str) -> str:
+        """
+        Brings session `name` into the model context. Returns "active" if it
+        already was, "state" if its parked context was restored, "replay" if
+        its history was re-evaluated, "new" for an empty session.
+        """
+        with self._slot(name):
+            return self._activate(self.open(name))
+
+    def turn(self, name: str, prompt: str, should_stop=None, persona: str = None):
+        """Streams the reply to `prompt` in session `name` (created on first use)."""
+        with self._slot(name):
+            session = self.open(name, persona)
+            self._activate(session)
+            session.last_used = time.time()
+            self.engine.overrides = dict(session.params)
+            try:
+                yield from self.engine.generate_response(prompt, persona_name=session.persona, stream=True,
+                                                         should_stop=should_stop)
+            finally:
+                self.engine.overrides = {}
+                session.history = self.engine.export_history()
+                self._context = self._history_list()
+
+    @contextmanager
+    def _slot(self, name: str):
+        """Waits for the model; see the class docstring for the order requests get it in."""
+        ticket = _Ticket(name)
+        with self._cond:
+            self._waiting.append(ticket)
+            while self._busy or self._next() is not ticket:
+                self._cond.wait()
+            self._waiting.remove(ticket)
+            self._busy = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _next(self) -> _Ticket:
+        oldest = self._waiting[0]
+        if self.active is not None and time.monotonic() - oldest.since < self.max_wait_s:
+            for ticket in self._waiting:
+                if ticket.name == self.active:
+                    return ticket
+        return oldest
+
+    # --- Context switching (with the slot held) ---
+
+    def _activate(self, session: ChatSession) -> str:
+        engine = self.engine
+        if session.name == self.active and self._in_context():
+            return "active"
+        self._park_active(capture=True)
+
+        how = "new"
+        if session.history:
+            how = "replay"
+            if session.state is not None and session.state_key == self._model_key():
+                engine.restore_history(session.history, session.persona, prefill=False)
+                if restore_backend_state(engine.model, session.state):
+                    how = "state"
+            if how == "replay":
+                engine.restore_history(session.history, session.persona)
+            self.switches[how] += 1
+        else:
+            engine.reset_session(quiet=True)
+        session.state = session.state_key = None  # The context is live again; a parked copy would go stale
+        self._mark_active(session)
+        return how
+
+    def _park_active(self, capture: bool):
+        """Saves the active session's history and, if the budget allows, its evaluated context."""
+        session = self.sessions.get(self.active) if self.active else None
+        if session is not None and self._in_context():
+            session.history = self.engine.export_history()
+            if capture and self.state_budget > 0 and session.history:
+                state = capture_backend_state(self.engine.model)
+                if state and len(state["data"]) <= self.state_budget:
+                    session.state, session.state_key = state, self._model_key()
+                    self._trim_states()
+        self.active = self._context = None
+
+    def _trim_states(self):
+        """Drops parked states, least recently used first, until they fit the budget."""
+        parked = sorted((s for s in self.sessions.values() if s.state is not None), key=lambda s: s.last_used)
+        used = sum(len(s.state["data"]) for s in parked)
+        for session in parked:
+            if used <= self.state_budget:
+                break
+            used -= len(session.state["data"])
+            session.state = session.state_key = None
+
+    def _mark_active(self, session: ChatSession):
+        self.active = session.name
+        self._context = self._history_list()
+
+    def _in_context(self) -> bool:
+        """False once something else replaced the active session's context (a reset, a model swap...)."""
+        history = self._history_list()
+        return history is not None and history is self._context
+
+    def _history_list(self):
+        return getattr(self.engine.model, "_history", None)
+
+    def _model_key(self) -> tuple:
+        return self.engine.current_model_name, self.engine.config.settings.device
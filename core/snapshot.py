@@ -0,0 +1,206 @@
+import ctypes
+import json
+import os
+import re
+import time
+
+SNAPSHOT_VERSION = 1
+
+# Snapshot layout in `session_path`:
+#   <name>.json   metadata + chat history (always), and the evaluated token ids with a state
+#   <name>.state  evaluated model state (KV cache) when the backend can export it
+# Loading prefers the state file when it was taken from the same model on the same
+# device and its tokens can be put back exactly; otherwise the history is replayed
+# in one batched prefill.
+
+
+def _state_api():
+    """The llmodel state functions from gpt4all's C library, or None if unavailable."""
+    try:
+        from gpt4all._pyllmodel import llmodel
+    except Exception:
+        return None
+    for name in ("llmodel_get_state_size", "llmodel_save_state_data", "llmodel_restore_state_data"):
+        if not hasattr(llmodel, name):
+            return None
+    llmodel.llmodel_get_state_size.argtypes = [ctypes.c_void_p]
+    llmodel.llmodel_get_state_size.restype = ctypes.c_uint64
+    llmodel.llmodel_save_state_data.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint8)]
+    llmodel.llmodel_save_state_data.restype = ctypes.c_uint64
+    llmodel.llmodel_restore_state_data.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint8)]
+    llmodel.llmodel_restore_state_data.restype = ctypes.c_uint64
+    return llmodel
+
+
+def _handle(model):
+    """(LLModel wrapper, raw C handle) of a GPT4All instance, or (None, None)."""
+    inner = getattr(model, "model", None)
+    handle = getattr(inner, "model", None)
+    if inner is None or not isinstance(handle, (int, ctypes.c_void_p)):
+        return None, None
+    return inner, handle
+
+
+def capture_backend_state(model):
+    """
+    Exports the evaluated context of a GPT4All model as {"n_past", "data",
+    "tokens"}, or None when the backend does not support it.
+    """
+    if hasattr(getattr(model, "model", None), "save_state"):
+        return model.model.save_state()  # Backends with their own state API (the stub)
+    api = _state_api()
+    inner, handle = _handle(model)
+    if api is None or handle is None or inner.context is None:
+        return None
+    size = api.llmodel_get_state_size(handle)
+    if not size:
+        return None
+    buffer = (ctypes.c_uint8 * size)()
+    written = api.llmodel_save_state_data(handle, buffer)
+    if not written:
+        return None
+    n_past = int(inner.context.n_past)
+    if inner.context.tokens_size < n_past:
+        return None
+    # The KV cache alone is not enough: the token list drives the repeat penalty and context shifts
+    return {"n_past": n_past, "data": bytes(buffer)[:written], "tokens": inner.context.tokens[:n_past]}
+
+
+def restore_backend_state(model, state: dict) -> bool:
+    """Loads a state from capture_backend_state into `model`. Returns False if it cannot."""
+    if hasattr(getattr(model, "model", None), "restore_state"):
+        return model.model.restore_state(state)
+    api = _state_api()
+    inner, handle = _handle(model)
+    if api is None or handle is None or not state:
+        return False
+    if inner.context is None:
+        inner._set_context(n_predict=0)
+    # The C side keeps its own token list and cuts it to n_past on the next prompt. It cannot be
+    # grown from here, so it must already cover n_past; the saved tokens are written over it.
+    n_past, tokens = state["n_past"], state.get("tokens")
+    if tokens is None or len(tokens) != n_past or inner.context.tokens_size < n_past:
+        return False
+    data = state["data"]
+    buffer = (ctypes.c_uint8 * len(data)).from_buffer_copy(data)
+    if not api.llmodel_restore_state_data(handle, buffer):
+        return False
+    for i, token in enumerate(tokens):
+        inner.context.tokens[i] = token
+    inner.context.n_past = n_past
+    return True
+
+
+class Snapshot:
+    """A conversation (and, if possible, its evaluated model state) at one point in time."""
+    def __init__(self, name: str, history: list, persona: str, model_name: str, device: str,
+                 state: dict = None, created: float = None):
+        self.name = name
+        self.history = history
+        self.persona = persona
+        self.model_name = model_name
+        self.device = device
+        self.state = state
+        self.created = created or time.time()
+
+    @property
+    def turns(self) -> int:
+        return sum(1 for m in self.history if m.get("role") == "user")
+
+    @classmethod
+    def capture(cls, engine, name: str, persona: str = None) -> "Snapshot":
+        history = engine.export_history()
+        if not history:
+            raise RuntimeError("Nothing to snapshot yet: the session is empty.")
+        return cls(
+            name=name,
+            history=history,
+            persona=persona or engine.config.settings.persona,
+            model_name=engine.current_model_name,
+            device=engine.config.settings.device,
+            state=capture_backend_state(engine.model),
+        )
+
+    def restore(self, engine) -> str:
+        """
+        Makes this snapshot the engine's active session. Returns "state" when the
+        saved model state was loaded directly, "replay" when the history was re-evaluated.
+        """
+        same_backend = self.model_name == engine.current_model_name and self.device == engine.config.settings.device
+        if self.state and same_backend:
+            engine.restore_history(self.history, self.persona, prefill=False)
+            if restore_backend_state(engine.model, self.state):
+                return "state"
+        engine.restore_history(self.history, self.persona)
+        return "replay"
+
+    def metadata(self) -> dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "name": self.name,
+            "persona": self.persona,
+            "model_name": self.model_name,
+            "device": self.device,
+            "created": self.created,
+            "n_past": self.state["n_past"] if self.state else None,
+            "tokens": self.state.get("tokens") if self.state else None,
+            "history": self.history,
+        }
+
+
+class SnapshotStore:
+    """
+    Saves snapshots under `path` and keeps the most recent ones in memory, so a
+    /fork followed by /load does not touch the disk.
+    """
+    def __init__(self, path: str = "sessions/", keep_in_memory: int = 4):
+        self.path = path
+        self.keep_in_memory = keep_in_memory
+        self._recent = {}
+
+    def _files(self, name: str):
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+        base = os.path.join(self.path, safe)
+        return base + ".json", base + ".state"
+
+    def save(self, snapshot: Snapshot):
+        os.makedirs(self.path, exist_ok=True)
+        meta_path, state_path = self._files(snapshot.name)
+        if snapshot.state:
+            with open(state_path + ".tmp", "wb") as f:
+                f.write(snapshot.state["data"])
+            os.replace(state_path + ".tmp", state_path)
+        elif os.path.exists(state_path):
+            os.remove(state_path)  # Stale state from an older snapshot of the same name
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot.metadata(), f)
+        os.replace(meta_path + ".tmp", meta_path)
+        self._remember(snapshot)
+
+    def load(self, name: str) -> Snapshot:
+        if name in self._recent:
+            return self._recent[name]
+        meta_path, state_path = self._files(name)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No snapshot named '{name}'.")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        state = None
+        if meta.get("n_past") is not None and os.path.exists(state_path):
+            with open(state_path, "rb") as f:
+                state = {"n_past": meta["n_past"], "data": f.read(), "tokens": meta.get("tokens")}
+        snapshot = Snapshot(meta["name"], meta["history"], meta.get("persona"), meta.get("model_name"),
+                            meta.get("device"), state=state, created=meta.get("created"))
+        self._remember(snapshot)
+        return snapshot
+
+    def list(self) -> list:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(f[:-len(".json")] for f in os.listdir(self.path) if f.endswith(".json"))
+
+    def _remember(self, snapshot: Snapshot):
+        self._recent.pop(snapshot.name, None)
+        self._recent[snapshot.name] = snapshot
+        while len(self._recent) > self.keep_in_memory:
+            del self._recent[next(iter(self._recent))]
@@ -0,0 +1,146 @@
+from collections import deque
+
+# Decoding otherwise only ends on the end-of-sequence token or max_tokens. A
+# model that leaks its chat template ("<|im_start|>user...") or falls into a
+# loop keeps going until the cap. StopGuard watches the reply as it streams and
+# ends it early. Both checks are incremental: a token costs a find() over the
+# token plus a few characters of tail, and one dict lookup.
+
+LOOP_NGRAM = 4         # Tokens per n-gram the loop detector tracks
+LOOP_MIN_TOKENS = 32   # A loop must span at least this many tokens (keeps "----" rules and short echoes)
+LOOP_WINDOW = 1024     # Longest loop period looked for, in tokens
+
+
+class StopSequences:
+    """
+    Finds the first of several stop strings in text fed piece by piece, even
+    when one straddles token boundaries. `safe` is how much of the text can be
+    shown: everything except a tail that could still turn into a stop string.
+    """
+    def __init__(self, sequences):
+        self.sequences = sorted({s for s in sequences or () if s}, key=len, reverse=True)
+        self.longest = len(self.sequences[0]) if self.sequences else 0
+        self.seen = 0       # Characters fed so far
+        self.safe = 0
+        self.cut = None     # Where the first stop string starts, once found
+        self.matched = None
+        self._tail = ""     # The last `longest - 1` characters fed
+
+    def feed(self, text: str) -> bool:
+        """Adds the next piece of the reply. True once a stop string has appeared."""
+        if self.cut is not None:
+            return True
+        start = self.seen - len(self._tail)
+        window = self._tail + text
+        self.seen += len(text)
+        if not self.sequences:
+            self.safe = self.seen
+            return False
+        for sequence in self.sequences:
+            at = window.find(sequence)
+            if at >= 0 and (self.cut is None or start + at < self.cut):
+                self.cut, self.matched = start + at, sequence
+        if self.cut is not None:
+            self.safe = self.cut
+            return True
+        self.safe = self.seen - self._pending(window)
+        self._tail = window[-(self.longest - 1):] if self.longest > 1 else ""
+        return False
+
+    def _pending(self, window: str) -> int:
+        """Length of the longest end of `window` that a stop string starts with."""
+        for k in range(min(self.longest - 1, len(window)), 0, -1):
+            end = window[-k:]
+            if any(sequence.startswith(end) for sequence in self.sequences):
+                return k
+        return 0
+
+
+class LoopDetector:
+    """
+    Spots a reply repeating itself: the same stretch of tokens coming back
+    `repeats` times in a row. Each n-gram's last position is remembered; when
+    consecutive n-grams all recur at the same distance, that distance is the
+    loop's period and the run of matching tokens measures how long it has looped.
+    """
+    def __init__(self, repeats: int = 4, ngram: int = LOOP_NGRAM, min_tokens: int = LOOP_MIN_TOKENS,
+                 window: int = LOOP_WINDOW):
+        self.repeats = repeats
+        self.min_tokens = min_tokens
+        self.window = window
+        self.period = None
+        self.run = 0
+        self._recent = deque(maxlen=ngram)
+        self._last_seen = {}
+        self._count = 0
+
+    def feed(self, token: str) -> bool:
+        """Adds the next token. True once the reply is looping."""
+        if self.repeats < 2:
+            return False
+        position = self._count
+        self._count += 1
+        self._recent.append(token)
+        if len(self._recent) < self._recent.maxlen:
+            return False
+        key = tuple(self._recent)
+        previous = self._last_seen.get(key)
+        self._last_seen[key] = position
+        if previous is None or position - previous > self.window:
+            self.period, self.run = None, 0
+            return False
+        period = position - previous
+        if period == self.period:
+            self.run += 1
+        else:
+            self.period, self.run = period, 1
+        return self.run >= max((self.repeats - 1) * period, self.min_tokens)
+
+
+class StopGuard:
+    """
+    Stop strings plus loop detection over one streamed reply. Feed each token;
+    `feed` returns the text that is safe to show now, and `reason` is set
+    ("stop_sequence" or "repetition") once the reply should end. `flush()`
+    returns the rest of the reply to show after decoding stops.
+    """
+    def __init__(self, stop_sequences=(), repeats: int = 4):
+        self.stops = StopSequences(stop_sequences)
+        self.loop = LoopDetector(repeats)
+        self.reason = None
+        self.detail = None
+        self.tokens = 0
+        self._parts = []
+        self._held = ""   # Fed but not shown yet: at most a possible start of a stop string
+        self._shown = 0
+
+    def feed(self, token: str) -> str:
+        if self.reason is not None:
+            return ""
+        self.tokens += 1
+        self._parts.append(token)
+        self._held += token
+        if self.stops.feed(token):
+            self.reason, self.detail = "stop_sequence", self.stops.matched
+        elif self.loop.feed(token):
+            self.reason, self.detail = "repetition", f"{self.loop.period}-token loop"
+        if self.reason is not None:
+            return ""  # flush() returns what is left to show
+        return self._take(self.stops.safe)
+
+    def flush(self) -> str:
+        return self._take(self.stops.cut if self.stops.cut is not None else self.stops.seen)
+
+    @property
+    def text(self) -> str:
+        """The reply as shown: cut before a stop string when one was found."""
+        text = "".join(self._parts)
+        return text[:self.stops.cut] if self.stops.cut is not None else text
+
+    def _take(self, upto: int) -> str:
+        count = upto - self._shown
+        if count <= 0:
+            return ""
+        piece, self._held = self._held[:count], self._held[count:]
+        self._shown = upto
+        return piece
@@ -0,0 +1,176 @@
+import os
+import random
+import time
+import zlib
+from contextlib import contextmanager
+
+STUB_PROMPT_TEMPLATE = "### Human:\n{0}\n\n### Assistant:\n{1}\n\n"
+
+_WORDS = (
+    "the model answers with a short deterministic reply so that tests and benchmarks "
+    "can measure queueing streaming rendering and scheduling overhead without weights"
+).split()
+
+
+def _count_tokens(text: str) -> int:
+    # Roughly one token per four characters, like most BPE vocabularies on English.
+    return max(1, len(text) // 4) if text else 0
+
+
+class _StubContext:
+    def __init__(self):
+        self.n_past = 0
+
+
+class _StubLLModel:
+    """Stand-in for gpt4all's LLModel: tracks n_past and emits deterministic tokens."""
+    def __init__(self, owner):
+        self.owner = owner
+        self.context = _StubContext()
+        self._threads = os.cpu_count() or 1
+
+    def prompt_model(self, prompt, prompt_template, callback, n_predict=4096, reset_context=False, **kwargs):
+        for token in self.stream(prompt, n_predict, reset_context):
+            if not callback(0, token):
+                break
+
+    def stream(self, prompt, n_predict, reset_context):
+        if reset_context:
+            self.context.n_past = 0
+        prompt_tokens = _count_tokens(prompt)
+        if self.owner.prefill_delay:
+            time.sleep(self.owner.prefill_delay * prompt_tokens)
+        self.context.n_past += prompt_tokens
+
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")) ^ self.owner.seed)
+        for i in range(min(n_predict, self.owner.reply_tokens)):
+            if self.owner.token_delay:
+                time.sleep(self.owner.token_delay)
+            self.context.n_past += 1
+            yield (" " if i else "") + rng.choice(_WORDS)
+
+    def save_state(self) -> dict:
+        return {"n_past": self.context.n_past, "data": b""}
+
+    def restore_state(self, state: dict) -> bool:
+        self.context.n_past = state["n_past"]
+        return True
+
+    def set_thread_count(self, n_threads):
+        self._threads = n_threads
+
+    def thread_count(self):
+        return self._threads
+
+    def close(self):
+        pass
+
+
+class StubGPT4All:
+    """
+    Deterministic, weightless drop-in for gpt4all.GPT4All.
+
+    Implements the parts ModelEngine uses (constructor, generate, chat_session,
+    list_models, the inner model's prompt_model/context) so the server, daemon
+    and benchmarks can run on any box. Timing is configurable through class
+    attributes or the ONYX_STUB_* environment variables.
+    """
+    token_delay = float(os.environ.get("ONYX_STUB_TOKEN_DELAY", "0"))      # seconds per generated token
+    prefill_delay = float(os.environ.get("ONYX_STUB_PREFILL_DELAY", "0"))  # seconds per prompt token
+    load_delay = float(os.environ.get("ONYX_STUB_LOAD_DELAY", "0"))        # seconds per load
+    reply_tokens = int(os.environ.get("ONYX_STUB_REPLY_TOKENS", "64"))
+    weightless = True  # No model file needed, so ModelEngine never downloads one
+    seed = 0
+
+    def __init__(self, model_name: str, *, model_path: str = None, allow_download: bool = True,
+                 n_threads: int = None, device: str = None, n_ctx: int = 2048, ngl: int = 100,
+                 verbose: bool = False, **kwargs):
+        if self.load_delay:
+            time.sleep(self.load_delay)
+        self.model_name = model_name
+        self.device = device
+        self.n_ctx = n_ctx
+        self.config = {"filename": model_name, "promptTemplate": STUB_PROMPT_TEMPLATE, "systemPrompt": ""}
+        self.model = _StubLLModel(self)
+        if n_threads:
+            self.model.set_thread_count(n_threads)
+        self._history = None
+        self._current_prompt_template = "{0}"
+
+    @property
+    def backend(self):
+        return "cpu"
+
+    @property
+    def current_chat_session(self):
+        return None if self._history is None else list(self._history)
+
+    @staticmethod
+    def list_models():
+        return []
+
+    @contextmanager
+    def chat_session(self, system_prompt: str = None, prompt_template: str = None):
+        self._history = [{"role": "system", "content": system_prompt or ""}]
+        self._current_prompt_template = prompt_template or STUB_PROMPT_TEMPLATE
+        try:
+            yield self
+        finally:
+            self._history = None
+            self._current_prompt_template = "{0}"
+
+    def generate(self, prompt: str, *, max_tokens: int = 200, temp: float = 0.7, top_k: int = 40,
+                 streaming: bool = False, callback=None, n_predict: int = None, **kwargs):
+        n_predict = n_predict if n_predict is not None else max_tokens
+        reset = True
+        if self._history is not None:
+            reset = len(self._history) == 1
+            if reset:
+                # Ingest the system prompt, as GPT4All does on a session's first turn
+                self.model.prompt_model(self._history[0]["content"], "%1%2", None, n_predict=0, reset_context=True)
+                reset = False
+            self._history.append({"role": "user", "content": prompt})
+            self._history.append({"role": "assistant", "content": ""})
+            collector = self._history
+        else:
+            collector = [{"content": ""}]
+
+        def run():
+            for token in self.model.stream(prompt, n_predict, reset):
+                collector[-1]["content"] += token
+                if callback is not None and not callback(0, token):
+                    break
+                yield token
+
+        if streaming:
+            return run()
+        for _ in run():
+            pass
+        return collector[-1]["content"]
+
+    def close(self):
+        self.model.close()
+
+
+class StubEmbed4All:
+    """
+    Weightless drop-in for gpt4all.Embed4All: hashed bag-of-words vectors, so
+    texts sharing words land close together and retrieval can be exercised.
+    """
+    dimensions = 384
+
+    def __init__(self, model_name: str = None, **kwargs):
+        self.model_name = model_name or "stub-embed"
+
+    def embed(self, text, *, prefix: str = None, **kwargs):
+        texts = [text] if isinstance(text, str) else text
+        vectors = []
+        for t in texts:
+            vector = [0.0] * self.dimensions
+            for word in t.lower().split():
+                vector[zlib.crc32(word.strip(".,:;!?()[]{}\"'`").encode()) % self.dimensions] += 1.0
+            vectors.append(vector)
+        return vectors[0] if isinstance(text, str) else vectors
+
+    def close(self):
+        pass
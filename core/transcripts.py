@@ -0,0 +1,276 @@
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+
+# On-disk layout under `path`:
+#   catalog.jsonl                 one line per session (append-only)
+#   <session>/seg-000001.jsonl    turns, one JSON record per line (append-only)
+#   <session>/index.bin           one fixed-size record per turn: (segment, offset, length)
+#
+# A turn is one append to a segment plus one append to the index, never a rewrite.
+# The newest N turns are found by seeking to the end of the index, so opening a
+# session costs the same whether it holds ten turns or a million.
+#
+#   search.db                     SQLite FTS5 index of every turn (TranscriptSearch)
+
+INDEX_RECORD = struct.Struct("<IQI")  # segment number, byte offset, byte length
+CATALOG_FILE = "catalog.jsonl"
+
+
+class TranscriptStore:
+    def __init__(self, path: str = "transcripts/", segment_bytes: int = 8 * 1024 * 1024, search: bool = True):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._catalog = None  # session id -> catalog record, loaded lazily
+        # Full-text index, updated with every appended turn
+        self.search_index = TranscriptSearch(os.path.join(path, "search.db"), self) if search else None
+
+    # --- Sessions ---
+
+    def create_session(self, title: str = None, model: str = None, persona: str = None) -> str:
+        session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        record = {"id": session_id, "title": title or "", "model": model, "persona": persona,
+                  "created": time.time()}
+        with self._lock:
+            os.makedirs(self._session_dir(session_id), exist_ok=True)
+            with open(os.path.join(self.path, CATALOG_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            if self._catalog is not None:
+                self._catalog[session_id] = record
+        return session_id
+
+    def list_sessions(self, limit: int = None) -> list:
+        """Sessions with their turn counts, most recently active first."""
+        sessions = []
+        for record in self._load_catalog().values():
+            index_path = self._index_path(record["id"])
+            try:
+                stat = os.stat(index_path)
+                turns, updated = stat.st_size // INDEX_RECORD.size, stat.st_mtime
+            except OSError:
+                turns, updated = 0, record.get("created", 0)
+            sessions.append(dict(record, turns=turns, updated=updated))
+        sessions.sort(key=lambda s: s["updated"], reverse=True)
+        return sessions[:limit] if limit else sessions
+
+    def session_info(self, session_id: str) -> dict:
+        record = self._load_catalog().get(session_id)
+        if record is None:
+            raise KeyError(f"No transcript named '{session_id}'.")
+        return dict(record, turns=self.turn_count(session_id))
+
+    def find_session(self, prefix: str) -> str:
+        """Resolves a full or unambiguous partial session id."""
+        catalog = self._load_catalog()
+        if prefix in catalog:
+            return prefix
+        matches = [sid for sid in catalog if sid.startswith(prefix) or sid.endswith(prefix)]
+        if len(matches) != 1:
+            raise KeyError(f"No unique transcript matching '{prefix}'.")
+        return matches[0]
+
+    # --- Turns ---
+
+    def append_turn(self, session_id: str, user: str, assistant: str, **fields) -> int:
+        """Appends one turn and returns its number (0-based)."""
+        with self._lock:
+            turn = self.turn_count(session_id)
+            record = dict(fields, turn=turn, ts=time.time(), user=user, assistant=assistant)
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+            segment = self._current_segment(session_id, len(line))
+            with open(self._segment_path(session_id, segment), "ab") as f:
+                offset = f.tell()
+                f.write(line)
+            with open(self._index_path(session_id), "ab") as f:
+                f.write(INDEX_RECORD.pack(segment, offset, len(line)))
+        if self.search_index is not None:
+            self.search_index.add(session_id, record)
+        return turn
+
+    def turn_count(self, session_id: str) -> int:
+        try:
+            return os.path.getsize(self._index_path(session_id)) // INDEX_RECORD.size
+        except OSError:
+            return 0
+
+    def tail(self, session_id: str, n: int = 20) -> list:
+        """The newest `n` turns, oldest first, read without scanning the rest."""
+        total = self.turn_count(session_id)
+        return self.read_turns(session_id, max(total - n, 0), total)
+
+    def read_turns(self, session_id: str, start: int, end: int = None) -> list:
+        """Turns [start, end) using the offset index."""
+        total = self.turn_count(session_id)
+        end = total if end is None else min(end, total)
+        if start >= end:
+            return []
+        with open(self._index_path(session_id), "rb") as f:
+            f.seek(start * INDEX_RECORD.size)
+            raw = f.read((end - start) * INDEX_RECORD.size)
+        entries = [INDEX_RECORD.unpack_from(raw, i) for i in range(0, len(raw), INDEX_RECORD.size)]
+
+        turns = []
+        handles = {}
+        try:
+            for segment, offset, length in entries:
+                f = handles.get(segment)
+                if f is None:
+                    f = handles[segment] = open(self._segment_path(session_id, segment), "rb")
+                f.seek(offset)
+                turns.append(json.loads(f.read(length)))
+        finally:
+            for f in handles.values():
+                f.close()
+        return turns
+
+    def iter_turns(self, session_id: str, start: int = 0, batch: int = 256):
+        """Streams turns from `start` onward in batches, for indexing or export."""
+        total = self.turn_count(session_id)
+        for begin in range(start, total, batch):
+            yield from self.read_turns(session_id, begin, begin + batch)
+
+    @staticmethod
+    def to_history(turns: list, system_prompt: str = None) -> list:
+        """Converts turn records into chat history for ModelEngine.restore_history."""
+        history = [{"role": "system", "content": system_prompt}] if system_prompt is not None else []
+        for turn in turns:
+            history.append({"role": "user", "content": turn["user"]})
+            history.append({"role": "assistant", "content": turn["assistant"]})
+        return history
+
+    # --- Files ---
+
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.path, session_id)
+
+    def _index_path(self, session_id: str) -> str:
+        return os.path.join(self._session_dir(session_id), "index.bin")
+
+    def _segment_path(self, session_id: str, segment: int) -> str:
+        return os.path.join(self._session_dir(session_id), f"seg-{segment:06d}.jsonl")
+
+    def _current_segment(self, session_id: str, incoming: int) -> int:
+        """Segment to append to, rolling over once the current one is full."""
+        index_path = self._index_path(session_id)
+        size = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+        if size % INDEX_RECORD.size:
+            # Drop a torn index record left by a crash mid-append
+            size -= size % INDEX_RECORD.size
+            with open(index_path, "r+b") as f:
+                f.truncate(size)
+        if not size:
+            os.makedirs(self._session_dir(session_id), exist_ok=True)
+            return 1
+        with open(index_path, "rb") as f:
+            f.seek(size - INDEX_RECORD.size)
+            segment, offset, length = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+        if offset + length + incoming > self.segment_bytes:
+            return segment + 1
+        return segment
+
+    def _load_catalog(self) -> dict:
+        if self._catalog is None:
+            catalog = {}
+            path = os.path.join(self.path, CATALOG_FILE)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # Torn write from a crash
+                        catalog[record["id"]] = record
+            self._catalog = catalog
+        return self._catalog
+
+
+def fts_query(text: str) -> str:
+    """Plain words as an FTS5 query matching turns that contain all of them (`word*` for a prefix)."""
+    terms = re.findall(r"\w+\*?", text)
+    return " ".join(f'"{term.rstrip("*")}"' + ("*" if term.endswith("*") else "") for term in terms)
+
+
+class TranscriptSearch:
+    """
+    SQLite FTS5 index over the turns of a TranscriptStore, ranked by BM25.
+    Turns are added as they are appended; turns written before the index
+    existed are picked up by catch_up() the first time a search runs.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS turns (id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, turn INTEGER NOT NULL,
+                                      ts REAL, UNIQUE (session_id, turn));
+    CREATE VIRTUAL TABLE IF NOT EXISTS turn_text USING fts5(user, assistant, tokenize = 'porter unicode61');
+    """
+
+    def __init__(self, db_path: str, store: TranscriptStore):
+        self.db_path = db_path
+        self.store = store
+        self._conn = None
+        self._lock = threading.Lock()
+        self._caught_up = False
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    def add(self, session_id: str, record: dict):
+        try:
+            with self._lock, self._db() as db:
+                self._insert(db, session_id, record)
+        except sqlite3.Error as e:
+            print(f"Debug: Could not index transcript turn: {e}")
+
+    @staticmethod
+    def _insert(db, session_id: str, record: dict):
+        cursor = db.execute("INSERT OR IGNORE INTO turns (session_id, turn, ts) VALUES (?, ?, ?)",
+                            (session_id, record["turn"], record.get("ts")))
+        if cursor.rowcount:
+            db.execute("INSERT INTO turn_text (rowid, user, assistant) VALUES (?, ?, ?)",
+                       (cursor.lastrowid, record.get("user") or "", record.get("assistant") or ""))
+
+    def catch_up(self) -> int:
+        """Indexes turns missing from the index (written before it existed). Returns how many."""
+        added = 0
+        with self._lock:
+            db = self._db()
+            counts = dict(db.execute("SELECT session_id, COUNT(*) FROM turns GROUP BY session_id"))
+            for session_id in list(self.store._load_catalog()):
+                if counts.get(session_id, 0) >= self.store.turn_count(session_id):
+                    continue
+                with db:
+                    for record in self.store.iter_turns(session_id):
+                        before = db.total_changes
+                        self._insert(db, session_id, record)
+                        added += db.total_changes > before
+            self._caught_up = True
+        return added
+
+    def search(self, query: str, limit: int = 20, mark: tuple = ("[", "]")) -> list:
+        """
+        Best matching turns: {"session_id", "turn", "ts", "title", "snippet", "score"},
+        best first. `mark` surrounds the matched words in the snippet.
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        if not self._caught_up:
+            self.catch_up()
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT t.session_id, t.turn, t.ts, snippet(turn_text, -1, ?, ?, ' … ', 16), bm25(turn_text) AS score "
+                "FROM turn_text JOIN turns t ON t.id = turn_text.rowid "
+                "WHERE turn_text MATCH ? ORDER BY score, t.ts DESC LIMIT ?", (mark[0], mark[1], match, limit)).fetchall()
+        catalog = self.store._load_catalog()
+        return [{"session_id": session_id, "turn": turn, "ts": ts,
+                 "title": (catalog.get(session_id) or {}).get("title", ""), "snippet": snippet, "score": -score}
+                for session_id, turn, ts, snippet, score in rows]
@@ -0,0 +1,194 @@
+import json
+import os
+import time
+
+from core.bench import filler_prompt, measure_generation
+
+# Per-model load profiles found by `python main.py --tune`, stored as
+#   {"<model file>": {"device": "<fastest device>", "tuned_at": <epoch>,
+#                     "devices": {"cpu": {"n_threads": 8, "n_batch": 256, "n_ctx": 2048, "ngl": 100,
+#                                         "ttft_ms": ..., "decode_tok_s": ..., "turn_s": ...}, ...}}}
+# ModelEngine applies the knobs for the model and the configured device when it
+# builds the model (n_threads, n_ctx, ngl) and when it generates (n_batch).
+
+LOAD_KNOBS = ("n_ctx", "ngl")        # Need a rebuild of the model
+RUNTIME_KNOBS = ("n_threads", "n_batch")
+DEFAULT_KNOBS = {"n_ctx": 2048, "ngl": 100, "n_threads": None, "n_batch": 8}  # GPT4All's own defaults
+
+BATCH_CANDIDATES = (32, 128, 256, 512, 1024)
+NGL_CANDIDATES = (100, 48, 32, 24, 16, 8)
+CTX_CANDIDATES = (2048, 4096, 8192)
+CTX_TOLERANCE = 0.05  # A longer context is kept if it costs at most 5% of the turn time
+MIN_GAIN = 0.02  # A knob value must beat the current best by 2% to be chosen (run-to-run noise)
+
+
+class TuningProfiles:
+    def __init__(self, path: str = "cache/tuning.json"):
+        self.path = path
+        self._data = None
+
+    def _load(self) -> dict:
+        if self._data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def get(self, model_name: str, device: str) -> dict:
+        """Tuned knobs for `model_name` on `device` ({} if it was never tuned there)."""
+        profile = self._load().get(model_name) or {}
+        knobs = (profile.get("devices") or {}).get(device) or {}
+        return {k: knobs[k] for k in LOAD_KNOBS + RUNTIME_KNOBS if knobs.get(k) is not None}
+
+    def profile(self, model_name: str) -> dict:
+        return self._load().get(model_name) or {}
+
+    def save(self, model_name: str, devices: dict, best_device: str):
+        data = self._load()
+        data[model_name] = {"device": best_device, "tuned_at": time.time(), "devices": devices}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def candidate_devices(model_class) -> list:
+    """CPU plus the GPU backends GPT4All reports (CUDA, Vulkan)."""
+    devices = ["cpu"]
+    try:
+        gpus = model_class.list_gpus()
+    except Exception:
+        gpus = []
+    if any(gpu.startswith("cuda:") for gpu in gpus):
+        devices.append("cuda")
+    if any(gpu.startswith("kompute:") for gpu in gpus):
+        devices.append("gpu")
+    return devices
+
+
+def thread_candidates() -> list:
+    cores = os.cpu_count() or 1
+    return sorted({max(1, cores // 4), max(1, cores // 2), cores} | {n for n in (4, 8) if n < cores})
+
+
+class Tuner:
+    """
+    Finds the fastest knobs for one model with short generation runs, one knob
+    at a time (layers offloaded, threads, batch size, then context length) on
+    each device. A trial's score is the time of a reference turn: time to first
+    token for a `prompt_tokens` prompt plus decoding `max_tokens` tokens.
+    """
+    def __init__(self, engine, model_name: str, prompt_tokens: int = 256, max_tokens: int = 32, say=print):
+        self.engine = engine
+        self.model_name = model_name
+        self.prompt = filler_prompt(prompt_tokens)
+        self.max_tokens = max_tokens
+        self.say = say
+        self._built = None  # (device, n_ctx, ngl) of the model currently built
+        self._default_threads = None
+
+    def run(self, devices: list = None) -> tuple:
+        """Tunes every device. Returns ({device: knobs and scores}, best device)."""
+        results = {}
+        for device in devices or candidate_devices(self.engine._model_class()):
+            try:
+                result = self.tune_device(device)
+            finally:
+                self._release()
+            if result is not None:
+                results[device] = result
+        if not results:
+            raise RuntimeError(f"{self.model_name} could not be run on any device.")
+        best = min(results, key=lambda d: results[d]["turn_s"])
+        return results, best
+
+    def tune_device(self, device: str):
+        knobs = dict(DEFAULT_KNOBS)
+        if device == "cpu":
+            best = self._trial(device, knobs)
+        else:
+            best = None
+            for ngl in NGL_CANDIDATES:  # Most layers that fit in VRAM
+                best = self._trial(device, dict(knobs, ngl=ngl))
+                if best is not None:
+                    knobs["ngl"] = ngl
+                    break
+        if best is None:
+            self.say(f"  {device}: could not load {self.model_name}, skipped.")
+            return None
+
+        if device == "cpu":
+            best, knobs = self._sweep(device, knobs, best, "n_threads", thread_candidates())
+        best, knobs = self._sweep(device, knobs, best, "n_batch", BATCH_CANDIDATES)
+
+        # Longest context whose turn time stays within CTX_TOLERANCE of the best
+        for n_ctx in CTX_CANDIDATES:
+            if n_ctx <= knobs["n_ctx"]:
+                continue
+            result = self._trial(device, dict(knobs, n_ctx=n_ctx))
+            if result is None or result["turn_s"] > best["turn_s"] * (1 + CTX_TOLERANCE):
+                break
+            best, knobs = result, dict(knobs, n_ctx=n_ctx)
+
+        self.say(f"  {device}: best {_describe(knobs)} -> {best['turn_s']:.2f}s per turn, "
+                 f"{best['decode_tok_s'] or 0:.1f} tok/s")
+        return dict(knobs, **best)
+
+    def _sweep(self, device: str, knobs: dict, best: dict, knob: str, candidates) -> tuple:
+        chosen = knobs
+        for value in candidates:
+            if value == knobs[knob]:
+                continue
+            trial_knobs = dict(knobs, **{knob: value})
+            result = self._trial(device, trial_knobs)
+            if result is not None and result["turn_s"] < best["turn_s"] * (1 - MIN_GAIN):
+                best, chosen = result, trial_knobs
+        return best, chosen
+
+    def _trial(self, device: str, knobs: dict):
+        """Score of one knob setting, or None if the model cannot run with it."""
+        engine = self.engine
+        try:
+            if self._built != (device, knobs["n_ctx"], knobs["ngl"]):
+                self._release()
+                engine.model = engine._model_class()(
+                    model_name=self.model_name, model_path=engine.config.settings.model_path,
+                    allow_download=False, device=device, n_ctx=knobs["n_ctx"], ngl=knobs["ngl"]
+                )
+                engine.current_model_name = self.model_name
+                self._built = (device, knobs["n_ctx"], knobs["ngl"])
+                self._default_threads = engine.model.model.thread_count()
+                measure_generation(engine, self.prompt, 4)  # Warm-up: first-use allocations
+            engine.model.model.set_thread_count(knobs["n_threads"] or self._default_threads)
+            engine.n_batch = knobs["n_batch"]
+            run = measure_generation(engine, self.prompt, self.max_tokens)
+        except Exception as e:
+            self.say(f"  {device} {_describe(knobs)}: failed ({e})")
+            return None
+        if run["ttft_ms"] is None:
+            return None
+        decode_s = (self.max_tokens - 1) / run["decode_tok_s"] if run["decode_tok_s"] else 0.0
+        result = {"ttft_ms": run["ttft_ms"], "decode_tok_s": run["decode_tok_s"],
+                  "turn_s": round(run["ttft_ms"] / 1000 + decode_s, 4)}
+        self.say(f"  {device} {_describe(knobs)}: {result['turn_s']:.2f}s per turn")
+        return result
+
+    def _release(self):
+        engine = self.engine
+        if engine.model is not None:
+            engine.reset_session(quiet=True)
+            try:
+                engine.model.close()
+            except Exception:
+                pass
+        engine.model = None
+        engine.current_model_name = None
+        self._built = None
+
+
+def _describe(knobs: dict) -> str:
+    return ", ".join(f"{k}={knobs[k]}" for k in ("n_threads", "n_batch", "n_ctx", "ngl") if knobs.get(k) is not None)
@@ -1,32 +1,42 @@
 #!/usr/bin/env python3
+import time
+STARTED = time.perf_counter()  # Reference point for --time-to-menu
+
+import argparse
+import importlib.util
 import os
 import sys
+import threading
 import webbrowser
 from core.engine import ModelEngine
 from core.config import ConfigManager
+from core.generation import GenerationTask
+from core.download import DownloadError
+from core.pool import total_ram_gb
+from core.sessions import DEFAULT_SESSION
+from core.snapshot import Snapshot, SnapshotStore
+from core.transcripts import TranscriptStore
 
 # Rich Imports
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.prompt import Prompt, IntPrompt, FloatPrompt, Confirm
 from rich.text import Text
-from rich.live import Live
 from rich.table import Table
 from rich.align import Align
 
 console = Console()
 
+# Turns loaded back into the model when a stored transcript is reopened
+OPEN_TRANSCRIPT_TURNS = 20
+
 def check_dependencies():
-    """Verify vital dependencies are installed."""
-    try:
-        import gpt4all
-        import yaml
-        import rich
-    except ImportError as e:
-        console.print(f"[bold red]Missing dependency:[/bold red] {e.name}")
-        console.print("Please run: [green]pip install -r requirements.txt[/green]")
-        sys.exit(1)
+    """Verify vital dependencies are installed (without importing them)."""
+    for name in ("gpt4all", "yaml", "rich"):
+        if importlib.util.find_spec(name) is None:
+            console.print(f"[bold red]Missing dependency:[/bold red] {name}")
+            console.print("Please run: [green]pip install -r requirements.txt[/green]")
+            sys.exit(1)
 
 def print_banner():
     # OnyxAI Header (ASCII Art)
@@ -44,10 +54,34 @@ def print_banner():
     console.print(Panel(Align.center(banner_text), border_style="cyan", expand=False))
 
 def chat_mode(engine):
+    # Markdown rendering is only needed here; importing it lazily keeps startup fast
+    from rich.live import Live
+    from rich.markdown import Markdown
+    from core.render import StreamingMarkdown
+
+    if engine.load_state == "loading":
+        with console.status("Waiting for the model to finish loading...") as status:
+            while not engine.wait_until_loaded(timeout=0.2) and engine.load_state == "loading":
+                status.update(f"Waiting for the model: {engine.load_message}")
+    if engine.model is None:
+        console.print(f"[bold red]No model loaded.[/bold red] {engine.load_message}")
+        console.print("Pick one under Change AI Model.")
+        Prompt.ask("Press Enter to continue")
+        return
+
+    config = engine.config
+    snapshots = SnapshotStore(config.settings.session_path)
+    transcripts = TranscriptStore(config.settings.transcript_path)
+    transcript_id = None  # Created on the first turn
+    session_name = DEFAULT_SESSION  # Named session (engine.sessions) the chat is in
+    transcript_ids = {}  # Transcripts of the sessions switched away from
+    search_hits = []  # Results of the last /search, for /open #n
+    engine.sessions.open(session_name)
     console.clear()
     print_banner()
     console.print(f"[bold]Loaded Model:[/bold] [cyan]{engine.current_model_name}[/cyan]")
-    console.print("[dim]Type your message and press Enter. Commands: /exit, /clear, /web[/dim]\n")
+    shown_model = engine.current_model_name
+    console.print("[dim]Type your message and press Enter. Commands: /exit, /clear, /web, /save, /load, /fork, /transcripts, /open, /stats, /cache, /sessions, /session, /close, /search, /index, /ask, /compare[/dim]\n")
 
     last_response = ""
     
@@ -55,6 +89,7 @@ def chat_mode(engine):
         try:
             # Rich Prompt
             user_input = Prompt.ask("\n[bold green]>[/bold green]").strip()
+            prompt_text = None  # What the model gets, when it differs from what was typed (/ask)
             
             if not user_input:
                 continue
@@ -63,7 +98,8 @@ def chat_mode(engine):
                 break
             
             if user_input.lower() == "/clear":
-                engine.reset_session()
+                engine.sessions.reset(session_name)
+                transcript_id = None
                 console.clear()
                 print_banner()
                 console.print("[dim]Session reset.[/dim]")
@@ -74,12 +110,195 @@ def chat_mode(engine):
                 if len(parts) > 1:
                     new_persona = parts[1]
                     config.update(persona=new_persona)
-                    engine.reset_session()
+                    engine.sessions.reset(session_name, persona=new_persona)
+                    transcript_id = None
                     console.print(f"[green]Persona set to {new_persona}. Session reset.[/green]")
                 else:
                     console.print("Usage: /persona <name>")
                 continue
             
+            if user_input.lower().startswith(("/save", "/fork")):
+                parts = user_input.split(maxsplit=1)
+                command = parts[0].lower()
+                name = parts[1] if len(parts) > 1 else f"{command[1:]}-{time.strftime('%Y%m%d-%H%M%S')}"
+                with console.status(f"Saving snapshot {name}..."):
+                    snapshot = Snapshot.capture(engine, name)
+                    snapshots.save(snapshot)
+                kind = "with model state" if snapshot.state else "history only"
+                if command == "/fork":
+                    console.print(f"[green]Forked at turn {snapshot.turns} as '{name}' ({kind}). "
+                                  f"Use /load {name} to come back and try another reply.[/green]")
+                else:
+                    console.print(f"[green]Saved '{name}' ({snapshot.turns} turns, {kind}).[/green]")
+                continue
+
+            if user_input.lower().startswith("/load"):
+                parts = user_input.split(maxsplit=1)
+                if len(parts) < 2:
+                    saved = snapshots.list()
+                    console.print("Usage: /load <name>" + (f"  [dim]Saved: {', '.join(saved)}[/dim]" if saved else ""))
+                    continue
+                with console.status(f"Restoring {parts[1]}..."):
+                    snapshot = snapshots.load(parts[1])
+                    start = time.perf_counter()
+                    how = snapshot.restore(engine)
+                    engine.sessions.adopt(session_name)
+                elapsed = time.perf_counter() - start
+                how_text = "model state restored" if how == "state" else "history replayed"
+                console.print(f"[green]Loaded '{snapshot.name}' ({snapshot.turns} turns, {how_text} in {elapsed:.2f}s).[/green]")
+                for message in snapshot.history[-2:]:
+                    if message.get("role") == "assistant":
+                        last_response = message["content"]
+                        console.print(Markdown(last_response))
+                continue
+
+            if user_input.lower() == "/transcripts":
+                table = Table(show_header=True, header_style="bold magenta", box=None)
+                table.add_column("ID", style="cyan")
+                table.add_column("Title", style="white")
+                table.add_column("Turns", style="dim", justify="right")
+                table.add_column("Last Active", style="dim")
+                for info in transcripts.list_sessions(limit=20):
+                    table.add_row(info["id"], info["title"], str(info["turns"]),
+                                  time.strftime("%Y-%m-%d %H:%M", time.localtime(info["updated"])))
+                console.print(table)
+                continue
+
+            if user_input.split()[0].lower() == "/search":
+                parts = user_input.split(maxsplit=1)
+                if len(parts) < 2:
+                    console.print("Usage: /search <words>  [dim](word* matches a prefix)[/dim]")
+                    continue
+                search_hits = search_transcripts(transcripts, parts[1])
+                continue
+
+            if user_input.lower().startswith("/open"):
+                parts = user_input.split(maxsplit=1)
+                if len(parts) < 2:
+                    console.print("Usage: /open <transcript id>[:turn] or /open #<n> for a /search hit  "
+                                  "[dim](see /transcripts)[/dim]")
+                    continue
+                ref, at_turn = parts[1], None
+                if ref.startswith("#"):
+                    try:
+                        hit = search_hits[int(ref[1:]) - 1]
+                    except (ValueError, IndexError):
+                        console.print(f"[yellow]No search hit {ref}.[/yellow]")
+                        continue
+                    ref, at_turn = hit["session_id"], hit["turn"]
+                elif ":" in ref:
+                    ref, _, turn_text = ref.rpartition(":")
+                    at_turn = int(turn_text) if turn_text.isdigit() else None
+                opened_id = transcripts.find_session(ref)
+                info = transcripts.session_info(opened_id)
+                if at_turn is None or at_turn >= info["turns"] - 1:
+                    turns = transcripts.tail(opened_id, OPEN_TRANSCRIPT_TURNS)
+                    transcript_id = opened_id
+                else:
+                    # Picking up from an earlier turn branches off: new turns go to a new transcript
+                    turns = transcripts.read_turns(opened_id, max(at_turn + 1 - OPEN_TRANSCRIPT_TURNS, 0), at_turn + 1)
+                    transcript_id = None
+                persona = info.get("persona") or config.settings.persona
+                with console.status(f"Opening {opened_id}..."):
+                    history = TranscriptStore.to_history(turns, engine.get_persona_prompt(persona))
+                    engine.restore_history(history, persona)
+                    engine.sessions.adopt(session_name)
+                if transcript_id is None:
+                    console.print(f"[green]Opened '{info['title'] or opened_id}' at turn {at_turn} "
+                                  f"({len(turns)} turns loaded); new turns start a new transcript.[/green]")
+                else:
+                    console.print(f"[green]Opened '{info['title'] or opened_id}' "
+                                  f"(last {len(turns)} of {info['turns']} turns loaded).[/green]")
+                if turns:
+                    last_response = turns[-1]["assistant"]
+                    console.print(f"\n[bold green]>[/bold green] {turns[-1]['user']}")
+                    console.print(Markdown(last_response))
+                continue
+
+            if user_input.lower() == "/sessions":
+                show_sessions(engine)
+                continue
+
+            if user_input.split()[0].lower() == "/session":
+                parts = user_input.split()
+                name, params = (parts[1], parse_session_params(parts[2:])) if len(parts) > 1 else (None, None)
+                if params is None:
+                    console.print("Usage: /session <name> [temperature=<t>] [top_k=<k>] [max_tokens=<n>]")
+                    continue
+                session = engine.sessions.open(name, config.settings.persona, **params)
+                with console.status(f"Switching to {name}..."):
+                    start = time.perf_counter()
+                    how = engine.sessions.switch(name)
+                transcript_ids[session_name] = transcript_id
+                session_name, transcript_id = name, transcript_ids.pop(name, None)
+                how_text = {"active": "already active", "new": "new session", "state": "context restored",
+                            "replay": "history replayed"}[how]
+                console.print(f"[green]Session '{name}' ({session.persona}, {session.turns} turns, {how_text} "
+                              f"in {time.perf_counter() - start:.2f}s).[/green]")
+                for message in session.history[-2:]:
+                    if message.get("role") == "assistant":
+                        last_response = message["content"]
+                        console.print(Markdown(last_response))
+                continue
+
+            if user_input.lower().startswith("/close"):
+                parts = user_input.split(maxsplit=1)
+                if len(parts) < 2 or parts[1] == session_name:
+                    console.print("Usage: /close <name>  [dim](switch away from a session before closing it)[/dim]")
+                elif engine.sessions.close(parts[1]):
+                    transcript_ids.pop(parts[1], None)
+                    console.print(f"[green]Closed session '{parts[1]}'.[/green]")
+                else:
+                    console.print(f"[yellow]No session named '{parts[1]}'.[/yellow]")
+                continue
+
+            if user_input.lower() == "/stats":
+                show_stats(engine)
+                continue
+
+            if user_input.split()[0].lower() == "/compare":
+                parts = user_input.split(maxsplit=1)
+                compare_models(engine, parts[1] if len(parts) > 1 else "")
+                continue
+
+            if user_input.split()[0].lower() == "/index":
+                parts = user_input.split(maxsplit=1)
+                if len(parts) < 2:
+                    show_indexes(engine)
+                    continue
+                index_directory(engine, parts[1])
+                continue
+
+            if user_input.split()[0].lower() == "/ask":
+                parts = user_input.split(maxsplit=1)
+                if len(parts) < 2:
+                    console.print("Usage: /ask <question about the indexed files>")
+                    continue
+                prompt_text = retrieval_prompt(engine, parts[1])
+                if prompt_text is None:
+                    continue
+
+            if user_input.lower().startswith("/cache"):
+                parts = user_input.split(maxsplit=1)
+                action = parts[1].lower() if len(parts) > 1 else ""
+                cache = engine.response_cache
+                if action in ("on", "off"):
+                    config.update(response_cache=action == "on")
+                elif action == "clear":
+                    console.print(f"[green]Cleared {cache.clear()} cached replies.[/green]")
+                elif action:
+                    console.print("Usage: /cache [on|off|clear]")
+                    continue
+                stats = cache.stats()
+                state = "on" if config.settings.response_cache else "off"
+                console.print(f"[dim]Response cache {state} (temperature <= {cache.max_temperature}): "
+                              f"{stats['hits']} hits, {stats['misses']} misses, {stats['memory_entries']} in memory, "
+                              f"{stats['disk_entries']} on disk ({stats['disk_mb']} MB).[/dim]")
+                if config.settings.response_cache and not cache.cacheable(config.settings.temperature):
+                    console.print(f"[yellow]Temperature {config.settings.temperature} is above the cache limit; "
+                                  f"set response_cache_max_temp in config.yaml to cache anyway.[/yellow]")
+                continue
+
             if user_input.lower().startswith("/core"):
                 parts = user_input.split(maxsplit=1)
                 if len(parts) > 1:
@@ -124,18 +343,45 @@ def chat_mode(engine):
                 console.print(f"[green]Opened web view:[/green] {path}")
                 continue
 
+            # A background hot-swap may have finished since the last reply
+            if engine.current_model_name != shown_model:
+                shown_model = engine.current_model_name
+                console.print(f"[dim]Now using {shown_model} (the conversation is carried over).[/dim]")
+
             # Generate Response with Live Rendering
             console.print("") # Spacer
             full_response = ""
             
-            # We use a Live display to stream the markdown
+            # Generation runs on a worker thread; Ctrl-C cancels it and keeps us in the chat.
+            task = GenerationTask(engine, prompt_text or user_input, session=session_name).start()
+
+            # We use a Live display to stream the markdown.
+            # Finished blocks are frozen above it; only the open tail is re-rendered per frame.
             with Live(console=console, refresh_per_second=10) as live:
-                for token in engine.generate_response(user_input, stream=True):
-                    full_response += token
-                    # Render current full response as Markdown
-                    live.update(Markdown(full_response))
+                renderer = StreamingMarkdown(live)
+                try:
+                    while True:
+                        try:
+                            for token in task:
+                                renderer.feed(token)
+                            break
+                        except KeyboardInterrupt:
+                            task.cancel()  # The worker stops within a token; keep draining what it already produced
+                finally:
+                    renderer.close()
+                full_response = renderer.text
             
             last_response = full_response
+            cancelled = task.cancelled.is_set()
+            if cancelled:
+                console.print("[yellow]Stopped. The partial reply is kept in the conversation.[/yellow]")
+
+            if transcript_id is None:
+                transcript_id = transcripts.create_session(
+                    title=user_input[:60], model=engine.current_model_name, persona=config.settings.persona
+                )
+            extra = {"cancelled": True} if cancelled else {}
+            transcripts.append_turn(transcript_id, user_input, full_response, model=engine.current_model_name, **extra)
 
         except KeyboardInterrupt:
             console.print("\n[yellow]Returning to menu...[/yellow]")
@@ -143,8 +389,245 @@ def chat_mode(engine):
         except Exception as e:
             console.print(f"\n[bold red]Error:[/bold red] {e}")
 
+def search_transcripts(transcripts, query: str) -> list:
+    """Runs /search and prints the ranked hits. Returns them for /open #n."""
+    from rich.markup import escape
+
+    start = time.perf_counter()
+    with console.status("Searching transcripts..."):
+        hits = transcripts.search_index.search(query, limit=20, mark=("\x02", "\x03"))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if not hits:
+        console.print(f"[yellow]No turns match '{query}'.[/yellow]")
+        return []
+    table = Table(show_header=True, header_style="bold magenta", box=None)
+    for column in ("#", "Transcript", "Turn", "When", "Match"):
+        table.add_column(column, style="dim" if column in ("#", "Turn", "When") else None)
+    for i, hit in enumerate(hits, 1):
+        snippet = escape(" ".join(hit["snippet"].split()))
+        snippet = snippet.replace("\x02", "[bold yellow]").replace("\x03", "[/bold yellow]")
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit["ts"])) if hit["ts"] else "-"
+        table.add_row(f"#{i}", f"[cyan]{hit['session_id']}[/cyan]\n{escape(hit['title'] or '')}",
+                      str(hit["turn"]), when, snippet)
+    console.print(table)
+    console.print(f"[dim]{len(hits)} hits in {elapsed_ms:.0f} ms. /open #<n> continues the conversation "
+                  f"from that turn.[/dim]")
+    return hits
+
+def index_directory(engine, directory: str):
+    """Runs /index with a progress bar."""
+    from rich.progress import Progress, BarColumn, TimeRemainingColumn
+
+    with Progress("[progress.description]{task.description}", BarColumn(), "{task.fields[chunks]} chunks",
+                  TimeRemainingColumn(), console=console) as progress:
+        bar = progress.add_task(f"Indexing {directory}", total=None, chunks=0)
+
+        def report(done, total, chunks):
+            progress.update(bar, completed=done, total=total or 1, chunks=chunks)
+
+        try:
+            result = engine.retriever.index_directory(directory, progress=report)
+        except (OSError, ImportError, ValueError) as e:
+            console.print(f"[bold red]Indexing failed:[/bold red] {e}")
+            return
+    console.print(f"[green]Indexed {result['root']}: {result['files']} new or changed files embedded "
+                  f"({result['chunks']} chunks) in {result['seconds']}s, {result['removed']} removed; "
+                  f"{result['total_chunks']} chunks from {result['total_files']} files in total.[/green]")
+
+def show_indexes(engine):
+    indexes = engine.retriever.indexes()
+    if not indexes:
+        console.print("Usage: /index <directory>  (then /ask <question>)")
+        return
+    table = Table(show_header=True, header_style="bold magenta", box=None)
+    for column in ("Directory", "Files", "Chunks"):
+        table.add_column(column)
+    for index in indexes:
+        stats = index.stats()
+        table.add_row(stats["root"], str(stats["files"]), str(stats["chunks"]))
+    console.print(table)
+    console.print("[dim]/index <directory> adds or refreshes one; /ask <question> searches them all.[/dim]")
+
+def retrieval_prompt(engine, question: str):
+    """The /ask prompt with the best matching excerpts, or None if nothing is indexed."""
+    retriever = engine.retriever
+    if not retriever.indexes():
+        console.print("[yellow]Nothing indexed yet. Use /index <directory> first.[/yellow]")
+        return None
+    start = time.perf_counter()
+    try:
+        hits = retriever.search(question)
+    except (OSError, ImportError, ValueError) as e:
+        console.print(f"[bold red]Search failed:[/bold red] {e}")
+        return None
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for i, hit in enumerate(hits, 1):
+        console.print(f"[dim][{i}] {hit['path']}:{hit['start_line']}-{hit['end_line']} ({hit['score']:.2f})[/dim]")
+    console.print(f"[dim]{len(hits)} excerpts retrieved in {elapsed_ms:.0f} ms.[/dim]")
+    return retriever.build_prompt(question, hits)
+
+def parse_session_params(args: list):
+    """`temperature=0.2 top_k=20 max_tokens=512` as a dict, or None if malformed."""
+    params = {}
+    types = {"temperature": float, "top_k": int, "max_tokens": int}
+    for arg in args:
+        key, _, value = arg.partition("=")
+        if key not in types or not value:
+            return None
+        try:
+            params[key] = types[key](value)
+        except ValueError:
+            return None
+    return params
+
+def show_sessions(engine):
+    table = Table(show_header=True, header_style="bold magenta", box=None)
+    for column in ("", "Session", "Persona", "Turns", "Settings", "Last Used"):
+        table.add_column(column)
+    for info in engine.sessions.list():
+        settings = " ".join(f"{k}={v}" for k, v in info["params"].items()) or "-"
+        table.add_row("*" if info["active"] else "", info["name"], info["persona"], str(info["turns"]), settings,
+                      time.strftime("%H:%M:%S", time.localtime(info["last_used"])))
+    console.print(table)
+    switches = engine.sessions.switches
+    console.print(f"[dim]Switches so far: {switches['state']} restored from saved context, "
+                  f"{switches['replay']} replayed.[/dim]")
+
+def compare_models(engine, spec: str):
+    """Runs /compare: one prompt through several local models at once, streamed side by side."""
+    from rich.live import Live
+    from core.compare import Comparison
+
+    names, _, prompt = spec.partition(" -- ")
+    local = sorted(engine.registry.files())
+    weightless = getattr(engine._model_class(), "weightless", False)
+    models = []
+    for name in names.split():
+        matches = [f for f in local if f == name] or [f for f in local if name.lower() in f.lower()]
+        if len(matches) == 1 or (weightless and not matches):
+            models.append(matches[0] if matches else name)
+        else:
+            found = f"matches {', '.join(matches)}" if matches else "is not a downloaded model"
+            console.print(f"[yellow]'{name}' {found}.[/yellow]")
+            return
+    if len(models) < 2:
+        console.print("Usage: /compare <model> <model> [...] [-- prompt]  [dim](downloaded models; "
+                      "any unique part of a file name)[/dim]")
+        return
+    prompt = prompt.strip() or Prompt.ask(f"Prompt for the {len(models)} models").strip()
+    if not prompt:
+        return
+
+    comparison = Comparison(engine, models, prompt)
+    for result in comparison.results:
+        if result["status"] == "skipped":
+            console.print(f"[yellow]Skipping {result['model']}: {result['error']}.[/yellow]")
+    if not comparison.runnable:
+        return
+    console.print(f"[dim]{comparison.parallel} at a time, {comparison.threads} threads each "
+                  f"({comparison.budget_gb:.1f} GB RAM to share), persona {comparison.persona}.[/dim]")
+    try:
+        with Live(compare_columns(comparison), console=console, refresh_per_second=8) as live:
+            drawn = 0.0
+            for index, kind in comparison.run():
+                now = time.perf_counter()
+                if kind != "token" or now - drawn >= 0.1:
+                    live.update(compare_columns(comparison))
+                    drawn = now
+            live.update(compare_columns(comparison))
+    except KeyboardInterrupt:
+        comparison.stop()
+        console.print("[yellow]Comparison stopped.[/yellow]")
+    show_comparison(comparison)
+
+def compare_columns(comparison) -> Table:
+    """One panel per model with the end of its reply so far."""
+    results = comparison.results
+    height = max(console.height - 8, 8)
+    width = max(console.width // len(results) - 4, 10)
+    grid = Table.grid(expand=True, padding=(0, 1))
+    for _ in results:
+        grid.add_column(ratio=1)
+    panels = []
+    for result in results:
+        status = result["status"]
+        if status == "generating" and result["generation_started"]:
+            elapsed = time.perf_counter() - result["generation_started"]
+            status = f"{result['tokens']} tok, {result['tokens'] / max(elapsed, 1e-6):.1f} tok/s"
+        elif status == "done":
+            status = f"done in {result['seconds']:.1f}s"
+        elif result["error"]:
+            status = f"{status}: {result['error']}"
+        elif status == "loading" and result["message"]:
+            status = result["message"]
+        body = "\n".join(_tail_lines(result["text"], width, height - 2))
+        style = {"done": "green", "error": "red", "skipped": "yellow", "cancelled": "yellow"}.get(result["status"], "cyan")
+        panels.append(Panel(Text(body), title=Text(result["model"], style="bold"), subtitle=Text(status[:width]),
+                            border_style=style, height=height))
+    grid.add_row(*panels)
+    return grid
+
+def _tail_lines(text: str, width: int, count: int) -> list:
+    """The last `count` lines of `text` wrapped at `width` characters."""
+    lines = []
+    for line in reversed(text.split("\n")):
+        wrapped = [line[i:i + width] for i in range(0, len(line), width)] or [""]
+        lines[:0] = wrapped
+        if len(lines) >= count:
+            break
+    return lines[-count:]
+
+def show_comparison(comparison):
+    """Per-model timings once a /compare is over."""
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    table = Table(show_header=True, header_style="bold magenta", box=None)
+    for column in ("Model", "Status", "Load s", "TTFT ms", "Tokens", "Decode t/s", "Total s", "Est. RAM GB"):
+        table.add_column(column, justify="left" if column in ("Model", "Status") else "right")
+    for result in comparison.results:
+        turn = result["turn"]
+        status = result["status"] + (f" ({turn['stop_reason']})" if turn.get("stop_reason") else "")
+        table.add_row(result["model"], status, fmt(result["load_s"], ".1f"), fmt(turn.get("ttft_ms"), ".0f"),
+                      str(turn.get("generated_tokens", result["tokens"])), fmt(turn.get("decode_tok_s"), ".1f"),
+                      fmt(result["seconds"], ".1f"), fmt(result["footprint_gb"], ".1f"))
+    console.print(table)
+
+def show_stats(engine, last: int = 10):
+    """Per-turn generation metrics for the most recent turns, plus averages."""
+    metrics = engine.metrics
+    turns = list(metrics.recent)[-last:]
+    if not turns:
+        console.print("[yellow]No turns recorded yet.[/yellow]")
+        return
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    table = Table(show_header=True, header_style="bold magenta", box=None)
+    for column in ("Model", "Device", "Prompt", "Generated", "TTFT ms", "Decode t/s", "Latency ms", "Render ms", "Outcome"):
+        table.add_column(column, justify="left" if column in ("Model", "Device", "Outcome") else "right")
+    for turn in turns:
+        row = turn.to_dict()
+        table.add_row(row["model"] or "-", row["device"] or "-", fmt(row["prompt_tokens"], "d"),
+                      str(row["generated_tokens"]), fmt(row["ttft_ms"], ".0f"), fmt(row["decode_tok_s"], ".1f"),
+                      fmt(row["latency_ms"], ".0f"), fmt(row["consumer_ms"], ".0f"),
+                      row["outcome"] + (f" ({row['stop_reason']})" if row["stop_reason"] else ""))
+    console.print(table)
+
+    summary = metrics.summary()
+    console.print(f"[dim]Last {summary['turns']} turns: avg TTFT {fmt(summary['ttft_ms'], '.0f')} ms, "
+                  f"avg decode {fmt(summary['decode_tok_s'], '.1f')} tok/s, "
+                  f"avg latency {fmt(summary['latency_ms'], '.0f')} ms, "
+                  f"{summary['prompt_tokens']} prompt / {summary['generated_tokens']} generated tokens"
+                  + (f", {summary['cached']} replayed from the response cache" if summary['cached'] else "") + ".[/dim]")
+    if metrics.loads:
+        model, device, seconds = metrics.loads[-1]
+        console.print(f"[dim]Last model load: {model} on {device} in {seconds:.2f}s.[/dim]")
+    if metrics.file_path:
+        console.print(f"[dim]Metrics file: {metrics.file_path}[/dim]")
+
 def change_model_menu(engine, config):
-    console.print("\n[bold]Fetching Model List...[/bold]")
     models_data = engine.fetch_available_models()
     
     # Create a nice table for selection
@@ -153,11 +636,12 @@ def change_model_menu(engine, config):
     table.add_column("Name", style="cyan")
     table.add_column("Description", style="white")
     table.add_column("Specs", style="dim")
+    table.add_column("Fit", style="dim")  # Memory check: loads as is, shorter context, smaller variant, or too big
 
     # Filter/Deduplicate based on filename to avoid massive lists if overlap
     # But for now just list them. 
     # Use a local cache check to mark downloaded ones?
-    local_files = engine.list_models()
+    local_files = engine.registry.files()
     
     display_list = []
     
@@ -169,19 +653,35 @@ def change_model_menu(engine, config):
         params = m.get('parameters', '?')
         
         is_local = fname in local_files
+        is_resident = engine.is_resident(fname)
         status_icon = "✓" if is_local else " "
         
         display_list.append(m)
         idx = len(display_list)
         
+        tag = '[bold green](Resident)[/bold green]' if is_resident else '[green](Local)[/green]' if is_local else ''
+        if is_local and not is_resident and (engine.registry.entry(fname) or {}).get('complete') is False:
+            tag = '[red](Incomplete)[/red]'
         table.add_row(
             str(idx), 
-            f"{name} {'[green](Local)[/green]' if is_local else ''}", 
+            f"{name} {tag}", 
             desc,
-            f"{params} / {ram}"
+            f"{params} / {ram}",
+            engine.check_admission(fname).short()
         )
 
     console.print(table)
+    catalog = engine.catalog
+    if catalog.fetched_at:
+        age_hours = (time.time() - catalog.fetched_at) / 3600
+        note = f"Catalog updated {age_hours:.0f}h ago" if age_hours >= 1 else "Catalog up to date"
+    else:
+        note = "Catalog not downloaded yet (offline?): showing built-in and local models"
+    if catalog.refreshing:
+        note += "; refreshing in the background"
+    elif catalog.last_error:
+        note += f"; last refresh failed ({catalog.last_error})"
+    console.print(f"[dim]{note}.[/dim]")
     console.print("[dim]Note: Selecting a non-local model will attempt to download it.[/dim]")
     
     model_idx = IntPrompt.ask("Select Model Number (0 to cancel)", default=0)
@@ -190,10 +690,27 @@ def change_model_menu(engine, config):
         selected = display_list[model_idx-1]
         target_name = selected.get('filename') # Best for GPT4All loading
         friendly_name = selected.get('name')
+
+        admission = engine.check_admission(target_name)
+        if admission.action != "load":
+            console.print(f"[yellow]{admission.describe()}[/yellow]")
+            if not admission.ok or not Confirm.ask("Continue?", default=True):
+                return
+            target_name = friendly_name = admission.model_name
+
+        if target_name not in local_files and not engine.is_resident(target_name):
+            if not download_with_progress(engine, target_name):
+                return
         
+        if engine.model is not None and not engine.is_resident(target_name):
+            # Hot-swap: the current model keeps answering until the new one is ready
+            engine.start_swap(target_name)
+            console.print(f"[green]Loading {friendly_name} in the background; "
+                          f"{engine.current_model_name} stays active until it is ready.[/green]")
+            return
+
         with console.status(f"Loading {friendly_name} ({target_name})...\n[dim]This may take a while if downloading...[/dim]"):
-            if engine.load_model(target_name):
-                    engine.reset_session()
+            if engine.swap_model(target_name):
                     console.print(f"[green]Successfully switched to {friendly_name}![/green]")
             else:
                 console.print(f"[bold red]Failed to load {friendly_name}.[/bold red]")
@@ -201,6 +718,62 @@ def change_model_menu(engine, config):
     else:
         console.print("Cancelled.")
 
+def download_with_progress(engine, filename: str) -> bool:
+    """Downloads a model with a progress bar. Ctrl-C stops it; the next attempt resumes."""
+    from rich.progress import Progress, BarColumn, DownloadColumn, TransferSpeedColumn, TimeRemainingColumn
+
+    columns = ("[progress.description]{task.description}", BarColumn(), DownloadColumn(),
+               TransferSpeedColumn(), TimeRemainingColumn())
+    outcome = {}
+    with Progress(*columns, console=console) as progress:
+        bar = progress.add_task(f"Downloading {filename}", total=None)
+        phase_seen = {"phase": "download"}
+
+        def report(done, total, rate, phase):
+            if phase != phase_seen["phase"]:
+                phase_seen["phase"] = phase
+                progress.reset(bar, description=f"Verifying {filename}")
+            progress.update(bar, completed=done, total=total)
+
+        def run():
+            try:
+                outcome["path"] = engine.download_model(filename, progress=report)
+            except Exception as e:
+                outcome["error"] = e
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        while worker.is_alive():
+            try:
+                worker.join(0.2)
+            except KeyboardInterrupt:
+                if engine.downloader:
+                    engine.downloader.cancel()
+
+    error = outcome.get("error")
+    if error is None:
+        console.print(f"[green]Downloaded and verified {filename}.[/green]")
+        return True
+    if isinstance(error, DownloadError):
+        console.print(f"[yellow]{error}[/yellow]")
+    else:
+        console.print(f"[bold red]Download failed:[/bold red] {error}")
+    return False
+
+def reload_on_device(engine, new_device: str):
+    """Hot-swaps the current model onto another device; nothing changes if that fails."""
+    if engine.model is None:
+        with console.status(f"Loading on {new_device}..."):
+            ok = engine.swap_model(device=new_device)
+        if ok:
+            console.print(f"[green]Model loaded on {new_device}.[/green]")
+        else:
+            console.print(f"[red]Failed to load on {new_device}; the device setting was not changed.[/red]")
+        return
+    engine.start_swap(device=new_device, release_old=True)
+    console.print(f"[green]Reloading on {new_device} in the background; the model keeps running on "
+                  f"{engine.config.settings.device} until then. If it fails, nothing changes.[/green]")
+
 def settings_menu(engine, config):
     while True:
         console.clear()
@@ -215,6 +788,10 @@ def settings_menu(engine, config):
             f"Temperature: {config.settings.temperature}",
             f"Device: {config.settings.device.upper()}",
             f"Core: {core_name}",
+            f"Model RAM Budget: {engine.pool.budget_gb:.1f} GB ({len(engine.pool)} resident, {engine.pool.used_gb:.1f} GB used)",
+            f"Context: {config.settings.context_policy} ({config.settings.context_budget or 'auto'} tokens)",
+            "Auto-tune: " + tuned_summary(engine),
+            "Model Disk Budget: " + disk_budget_summary(engine),
             # Persona option removed as per user request (Phantom Locked)
             "Back"
         ]
@@ -257,22 +834,14 @@ def settings_menu(engine, config):
             dev_map = {"1": "cpu", "2": "gpu", "3": "nvidia", "4": "amd", "5": "intel"}
             new_device = dev_map[dev_choice]
             
-            config.update(device=new_device)
-            console.print(f"[green]Device set to {new_device}. (Requires Restart/Model Reload to take effect)[/green]")
-            # Trigger reload to apply device change if possible, or warn user
+            # Trigger reload to apply device change if possible; the device is saved once the reload succeeds
             if Confirm.ask("Reload model now to apply change?"):
-                with console.status(f"Reloading on {new_device}..."):
-                     # Force reload logic
-                     engine.model = None 
-                     if engine.load_model():
-                         engine.reset_session()
-                         console.print("[green]Model reloaded on new device.[/green]")
-                     else:
-                         console.print("[red]Failed to reload model on new device! Reverting to CPU...[/red]")
-                         config.update(device="cpu")
-                         engine.load_model()
-
-        elif choice == "5":
+                reload_on_device(engine, new_device)
+            else:
+                config.update(device=new_device)
+                console.print(f"[green]Device set to {new_device}. (Requires Restart/Model Reload to take effect)[/green]")
+
+        elif choice.startswith("Core"):
              console.print("\n[bold]Select Core Backend:[/bold]")
              console.print("1. Vulkan (Generic GPU)")
              console.print("2. CUDA (NVIDIA Only)")
@@ -280,18 +849,11 @@ def settings_menu(engine, config):
              core_choice = Prompt.ask("Choose Core", choices=["1", "2"], default="1")
              new_device = "gpu" if core_choice == "1" else "nvidia"
              
-             config.update(device=new_device)
-             console.print(f"[green]Core set to {new_device} ({'Vulkan' if core_choice == '1' else 'CUDA'}).[/green]")
              if Confirm.ask("Reload model now to apply change?"):
-                with console.status(f"Reloading on {new_device}..."):
-                     engine.model = None 
-                     if engine.load_model():
-                         engine.reset_session()
-                         console.print("[green]Model reloaded on new core.[/green]")
-                     else:
-                         console.print("[red]Failed to reload! Reverting to CPU...[/red]")
-                         config.update(device="cpu")
-                         engine.load_model()
+                reload_on_device(engine, new_device)
+             else:
+                config.update(device=new_device)
+                console.print(f"[green]Core set to {new_device} ({'Vulkan' if core_choice == '1' else 'CUDA'}).[/green]")
         
         elif choice == "6":
             personas = []
@@ -316,19 +878,96 @@ def settings_menu(engine, config):
             
             Prompt.ask("Press Enter to continue")
 
-        elif choice == "7":
+        elif "Model RAM Budget" in choice:
+            new_budget = FloatPrompt.ask("Enter RAM budget for resident models in GB (0 = half of system RAM)",
+                                         default=config.settings.pool_budget_gb)
+            config.update(pool_budget_gb=new_budget)
+            engine.pool.budget_gb = new_budget or total_ram_gb() / 2
+            current_key = (engine.current_model_name, config.settings.device)
+            engine.pool.reserve(0, keep=[current_key])
+            console.print(f"[green]Model RAM budget set to {engine.pool.budget_gb:.1f} GB.[/green]")
+
+        elif choice.startswith("Context:"):
+            console.print("\n[bold]When the chat outgrows the budget:[/bold]")
+            console.print("1. Truncate (drop the oldest turns)")
+            console.print("2. Pin (keep the first turns, drop the ones after them)")
+            console.print("3. Summary (fold dropped turns into a rolling summary)")
+            policy_choice = Prompt.ask("Choose Policy", choices=["1", "2", "3"], default="1")
+            new_policy = {"1": "truncate", "2": "pin", "3": "summary"}[policy_choice]
+            new_budget = IntPrompt.ask("History token budget (0 = 3/4 of the model's context)",
+                                       default=config.settings.context_budget)
+            config.update(context_policy=new_policy, context_budget=new_budget)
+            console.print(f"[green]Context policy set to {new_policy}.[/green]")
+
+        elif choice.startswith("Auto-tune"):
+            console.print("[dim]Runs short benchmarks over devices, threads, batch size, GPU layers and context "
+                          "length, then reloads the model with the fastest settings. The model is unavailable meanwhile.[/dim]")
+            if Confirm.ask(f"Tune {engine.current_model_name or config.settings.model_name} now?"):
+                try:
+                    show_tuned(engine.tune(say=console.print))
+                except (FileNotFoundError, RuntimeError) as e:
+                    console.print(f"[bold red]Tuning failed:[/bold red] {e}")
+                Prompt.ask("Press Enter to continue")
+
+        elif choice.startswith("Model Disk Budget"):
+            show_model_usage(engine.registry.entries())
+            budget = FloatPrompt.ask("Disk budget for downloaded models in GB (0 = no limit)",
+                                     default=config.settings.model_disk_budget_gb)
+            config.update(model_disk_budget_gb=budget)
+            if budget > 0:
+                plan = engine.prune_models(dry_run=True)
+                if plan and Confirm.ask(f"Delete {', '.join(e['filename'] for e in plan)} now "
+                                        f"(least recently used)?"):
+                    for e in engine.prune_models():
+                        console.print(f"[green]Deleted {e['filename']}.[/green]")
+            Prompt.ask("Press Enter to continue")
+
+        elif choice == "Back":
             break
 
-def main_menu(engine, config):
+def disk_budget_summary(engine) -> str:
+    used = engine.registry.disk_bytes() / 1024 ** 3
+    budget = engine.config.settings.model_disk_budget_gb
+    return f"{used:.1f} GB used" + (f" of {budget:g} GB" if budget > 0 else ", no limit")
+
+def tuned_summary(engine) -> str:
+    profile = engine.tuning.profile(engine.current_model_name or engine.config.settings.model_name)
+    if not profile:
+        return "not tuned"
+    knobs = profile["devices"].get(engine.config.settings.device)
+    if not knobs:
+        return f"tuned for {profile['device']}, not {engine.config.settings.device}"
+    return f"{knobs.get('n_threads') or 'default'} threads, batch {knobs['n_batch']}, context {knobs['n_ctx']}"
+
+def model_status_line(engine) -> str:
+    if engine.swap_state == "building":
+        name, device = engine.swap_target
+        return (f"[dim]Model:[/dim] [cyan]{engine.current_model_name}[/cyan] [yellow](switching to {name} on {device}: "
+                f"{engine.swap_message})[/yellow]")
+    if engine.swap_state == "failed":
+        engine.swap_state = "idle"  # Shown once
+        return f"[red]Model switch failed: {engine.swap_message}[/red] [dim]Still using {engine.current_model_name}.[/dim]"
+    if engine.load_state == "loading":
+        return f"[yellow]Loading model in the background: {engine.load_message}[/yellow]"
+    if engine.model is None:
+        return f"[red]No model loaded.[/red] [dim]{engine.load_message}[/dim]"
+    return f"[dim]Model:[/dim] [cyan]{engine.current_model_name}[/cyan] [dim]({engine.config.settings.device})[/dim]"
+
+def main_menu(engine, config, time_to_menu: bool = False):
     while True:
         console.clear()
         print_banner()
+        console.print(model_status_line(engine))
         
         console.print("\n[bold white]Main Menu[/bold white]")
         console.print("1. [bold green]Start Chat with AI[/bold green]")
         console.print("2. [bold cyan]Change AI Model[/bold cyan]")
         console.print("3. [bold blue]Settings[/bold blue]")
         console.print("4. [bold red]Exit[/bold red]")
+
+        if time_to_menu:
+            print(f"time-to-menu: {(time.perf_counter() - STARTED) * 1000:.1f} ms")
+            return
         
         choice = Prompt.ask("\n[bold]Choose an option[/bold]", choices=["1", "2", "3", "4"], default="1")
         
@@ -342,19 +981,173 @@ def main_menu(engine, config):
             console.print("[yellow]Goodbye![/yellow]")
             sys.exit(0)
 
+def serve_mode(args):
+    """Runs the OpenAI-compatible HTTP server instead of the interactive menu."""
+    from core.server import CompletionServer
+
+    config = ConfigManager()
+    model_class = None
+    if args.stub:
+        from core.stub import StubGPT4All
+        model_class = StubGPT4All
+    engine = ModelEngine(config, model_class=model_class)
+
+    with console.status("[bold green]Loading model...[/bold green]"):
+        if not engine.load_model(args.model, persist=False):
+            console.print("[bold red]Failed to load model. Please check settings.[/bold red]")
+            sys.exit(1)
+
+    CompletionServer(engine, host=args.host, port=args.port, max_queue=args.queue_size).serve_forever()
+
+def tune_mode(args):
+    """Finds and saves the fastest settings for a model, then exits."""
+    config = ConfigManager()
+    model_class = None
+    if args.stub:
+        from core.stub import StubGPT4All
+        model_class = StubGPT4All
+    engine = ModelEngine(config, model_class=model_class)
+    name = args.model or config.settings.model_name
+    console.print(f"[bold]Tuning {name}[/bold] [dim](short benchmark runs; this takes a few minutes)[/dim]")
+    try:
+        # Nothing to reload into: the process exits right after
+        best = engine.tune(name, devices=args.devices.split(",") if args.devices else None, say=console.print,
+                           reload=False)
+    except (FileNotFoundError, RuntimeError) as e:
+        console.print(f"[bold red]Tuning failed:[/bold red] {e}")
+        sys.exit(1)
+    show_tuned(best)
+
+def show_tuned(best: dict):
+    console.print(f"[green]Fastest: {best['device']} with {best.get('n_threads') or 'default'} threads, "
+                  f"batch {best['n_batch']}, context {best['n_ctx']}"
+                  + (f", {best['ngl']} GPU layers" if best['device'] != "cpu" else "")
+                  + f" ({best['decode_tok_s'] or 0:.1f} tok/s, first token in {best['ttft_ms']:.0f} ms). "
+                  f"Saved; it is applied whenever this model loads.[/green]")
+
+def batch_mode(args):
+    """Runs every prompt in --batch through a pool of worker processes and exits."""
+    from core.batch import default_workers, run_batch
+    from core.pool import estimate_footprint_gb
+
+    config = ConfigManager()
+    model_name = args.model or config.settings.model_name
+    workers = args.workers or default_workers(args.threads)
+    if not args.stub:
+        # Every worker holds its own copy of the model: keep them within physical RAM
+        footprint = estimate_footprint_gb(os.path.join(config.settings.model_path, model_name))
+        fit = max(1, int(total_ram_gb() * 0.9 // footprint))
+        if workers > fit:
+            console.print(f"[yellow]Only {fit} copies of {model_name} (~{footprint:.1f} GB each) fit in RAM; "
+                          f"using {fit} workers instead of {workers}.[/yellow]")
+            workers = fit
+
+    try:
+        summary = run_batch(args.batch, args.out, workers=workers, threads=args.threads,
+                            config_path=config.config_path, model_name=model_name, stub=args.stub)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    except RuntimeError as e:
+        console.print(f"[red]Batch aborted: {e}[/red]")
+        sys.exit(1)
+    console.print(f"[green]Done: {summary['items']} prompts in {summary['seconds']}s "
+                  f"({summary['items_per_s']} prompts/s, {summary['tokens_per_s']} tokens/s, "
+                  f"{summary['errors']} errors).[/green] Output: {args.out}")
+
+def prune_mode(args):
+    """Deletes least recently used models until the model directory fits --prune-models GB, then exits."""
+    config = ConfigManager()
+    engine = ModelEngine(config)
+    entries = engine.registry.entries()
+    used = sum(e['size'] for e in entries) / 1024 ** 3
+    console.print(f"{len(entries)} models, {used:.1f} GB in {config.settings.model_path}")
+    show_model_usage(entries)
+
+    removed = engine.prune_models(args.prune_models, dry_run=args.dry_run)
+    if not removed:
+        console.print(f"[green]Already within {args.prune_models:g} GB; nothing to delete.[/green]")
+        return
+    freed = sum(e['size'] for e in removed) / 1024 ** 3
+    verb = "Would delete" if args.dry_run else "Deleted"
+    for e in removed:
+        console.print(f"{verb} {e['filename']} ({e['size'] / 1024 ** 3:.1f} GB)")
+    console.print(f"[green]{verb} {len(removed)} models, {freed:.1f} GB.[/green]")
+    if used - freed > args.prune_models:
+        console.print("[yellow]Still over budget: the configured model is never deleted.[/yellow]")
+
+def show_model_usage(entries: list):
+    from core.registry import format_parameters
+
+    table = Table(show_header=True, header_style="bold magenta", box=None)
+    for column in ("Model", "Size", "Quant", "Params", "Loads", "Last used"):
+        table.add_column(column)
+    for e in entries:
+        last = time.strftime('%Y-%m-%d %H:%M', time.localtime(e['last_used'])) if e['last_used'] else "never"
+        name = e['filename'] + (" [red](incomplete)[/red]" if e['complete'] is False else "")
+        table.add_row(name, f"{e['size'] / 1024 ** 3:.1f} GB", e['quantization'] or "?",
+                      format_parameters(e['parameters']), str(e['load_count']), last)
+    console.print(table)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OnyxAI terminal assistant.")
+    parser.add_argument("--serve", action="store_true", help="Serve an OpenAI-compatible HTTP API instead of the menu")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address for --serve (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port for --serve (default: 8080)")
+    parser.add_argument("--queue-size", type=int, default=32, help="Max queued requests for --serve before 429s")
+    parser.add_argument("--model", help="Model file to load instead of the configured one")
+    parser.add_argument("--stub", action="store_true", help="Use the deterministic stub model (no weights needed)")
+    parser.add_argument("--batch", metavar="IN.jsonl", help="Answer every prompt in a JSONL file and exit")
+    parser.add_argument("--out", metavar="OUT.jsonl", help="Output file for --batch (also the resume checkpoint)")
+    parser.add_argument("--workers", type=int, help="Worker processes for --batch (default: cores / threads)")
+    parser.add_argument("--threads", type=int, help="CPU threads per --batch worker (default: cores / workers)")
+    parser.add_argument("--tune", action="store_true",
+                        help="Benchmark devices, threads, batch size, GPU layers and context length for the model "
+                             "and save the fastest profile")
+    parser.add_argument("--devices", help="Comma-separated devices for --tune (default: CPU and detected GPUs)")
+    parser.add_argument("--prune-models", type=float, metavar="GB",
+                        help="Delete least recently used models until the model directory fits in GB, and exit")
+    parser.add_argument("--dry-run", action="store_true", help="With --prune-models: only list what would be deleted")
+    parser.add_argument("--time-to-menu", action="store_true",
+                        help="Draw the main menu once, print the time it took since startup and exit")
+    return parser.parse_args(argv)
+
 def main():
+    args = parse_args()
     check_dependencies()
+
+    if args.serve:
+        serve_mode(args)
+        return
+
+    if args.tune:
+        tune_mode(args)
+        return
+
+    if args.prune_models is not None:
+        prune_mode(args)
+        return
+
+    if args.batch:
+        if not args.out:
+            console.print("[red]--batch needs --out OUT.jsonl[/red]")
+            sys.exit(2)
+        batch_mode(args)
+        return
     
     # Initialize Configuration
-    with console.status("[bold green]Initializing system...[/bold green]"):
-        config = ConfigManager()
-        engine = ModelEngine(config)
-        
-        # Initial Model Load
-        if not engine.load_model():
-            console.print("[bold red]Failed to load initial model. Please check settings.[/bold red]")
+    config = ConfigManager()
+    model_class = None
+    if args.stub:
+        from core.stub import StubGPT4All
+        model_class = StubGPT4All
+    engine = ModelEngine(config, model_class=model_class)
+
+    # Initial Model Load runs in the background; the menu comes up right away
+    if not args.time_to_menu:
+        engine.start_background_load(args.model, persist=False)
+        engine.catalog.refresh_in_background()  # Revalidate a stale catalog while the model loads
 
-    main_menu(engine, config)
+    main_menu(engine, config, time_to_menu=args.time_to_menu)
 
 if __name__ == "__main__":
     main()
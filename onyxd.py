@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+onyxd: keep a model resident and chat with it from short-lived terminals.
+
+    python onyxd.py start                 # load the model and serve (foreground)
+    python onyxd.py chat --session work   # attach a thin client to a named session
+    python onyxd.py sessions | status | stop
+"""
+import argparse
+import sys
+
+
+def start(args):
+    # Heavy imports only on the daemon side; clients never load gpt4all.
+    from core.config import ConfigManager
+    from core.engine import ModelEngine
+    from core.daemon import OnyxDaemon
+
+    config = ConfigManager()
+    engine = ModelEngine(config)
+    if not engine.load_model(args.model, persist=False):
+        print("Failed to load model. Check settings.", file=sys.stderr)
+        return 1
+    daemon = OnyxDaemon(engine, socket_path=args.socket)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def client_command(args):
+    from core.client import OnyxClient, DaemonUnavailable, chat_loop
+
+    try:
+        with OnyxClient(socket_path=args.socket, session=args.session) as client:
+            if args.command == "chat":
+                chat_loop(client)
+            elif args.command == "sessions":
+                for info in client.sessions():
+                    print(f"{info['name']}\t{info['persona']}\t{info['turns']} turns")
+            elif args.command == "status":
+                for key, value in client.status().items():
+                    print(f"{key}: {value}")
+            elif args.command == "stop":
+                client.shutdown()
+                print("onyxd stopped.")
+    except DaemonUnavailable as e:
+        print(f"{e}\nStart it with: python onyxd.py start", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="onyxd", description="OnyxAI resident model daemon.")
+    parser.add_argument("command", choices=["start", "chat", "sessions", "status", "stop"])
+    parser.add_argument("--socket", help="Unix socket path (default: per-user runtime dir)")
+    parser.add_argument("--session", default="default", help="Named session to attach to (chat)")
+    parser.add_argument("--model", help="Model file to load instead of the configured one (start)")
+    args = parser.parse_args(argv)
+
+    if args.command == "start":
+        return start(args)
+    return client_command(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+
+from core.catalog import CatalogCache
+
+MANIFEST = [{"name": "Tiny", "filename": "tiny.Q4_0.gguf", "filesize": "1024", "md5sum": "0" * 32}]
+ETAG = '"manifest-v1"'
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class ManifestHandler(BaseHTTPRequestHandler):
+    """Serves MANIFEST with validators; answers 304 when the client's ETag or date still matches."""
+    requests = []
+    statuses = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            type(self).statuses.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(MANIFEST).encode("utf-8")
+        type(self).statuses.append(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_manifest(http_server):
+    ManifestHandler.requests = []
+    ManifestHandler.statuses = []
+    server = http_server(ManifestHandler)
+    return server, server.url + "/models3.json"
+
+
+def test_fetch_stores_manifest_and_validators(tmp_path, http_server):
+    _, url = serve_manifest(http_server)
+    cache = CatalogCache(str(tmp_path / "catalog.json"), url, ttl_hours=1)
+    assert cache.models() == [] and cache.is_stale()
+
+    assert cache.refresh()
+    assert cache.models() == MANIFEST
+    assert not cache.is_stale()
+    with open(tmp_path / "catalog.json", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert (saved["url"], saved["etag"], saved["last_modified"]) == (url, ETAG, LAST_MODIFIED)
+
+
+def test_revalidation_gets_304_and_keeps_models(tmp_path, http_server):
+    _, url = serve_manifest(http_server)
+    path = str(tmp_path / "catalog.json")
+    assert CatalogCache(path, url).refresh()
+
+    cache = CatalogCache(path, url)  # A new process: validators come from the file
+    first_fetch = cache.fetched_at
+    time.sleep(0.01)
+    assert cache.refresh()
+    sent = ManifestHandler.requests[-1]
+    assert sent.get("If-None-Match") == ETAG
+    assert sent.get("If-Modified-Since") == LAST_MODIFIED
+    assert ManifestHandler.statuses == [200, 304]
+    assert cache.models() == MANIFEST
+    assert cache.fetched_at > first_fetch
+
+
+def test_ttl_expiry_triggers_background_refresh(tmp_path, http_server):
+    _, url = serve_manifest(http_server)
+    path = str(tmp_path / "catalog.json")
+    cache = CatalogCache(path, url, ttl_hours=1)
+    assert cache.refresh()
+    assert cache.refresh_in_background() is None  # Fresh: no request
+    assert len(ManifestHandler.requests) == 1
+
+    cache._data["fetched_at"] = time.time() - 2 * 3600
+    assert cache.is_stale()
+    thread = cache.refresh_in_background()
+    assert thread is not None and cache.wait(5)
+    assert not cache.is_stale()
+    assert len(ManifestHandler.requests) == 2
+
+
+def test_offline_falls_back_to_disk_cache(tmp_path, http_server):
+    server, url = serve_manifest(http_server)
+    path = str(tmp_path / "catalog.json")
+    assert CatalogCache(path, url).refresh()
+    server.shutdown()
+    server.server_close()  # Offline: nothing listens on the manifest's port any more
+
+    cache = CatalogCache(path, url, ttl_hours=0, timeout=2)
+    assert cache.is_stale()
+    assert not cache.refresh()
+    assert cache.last_error
+    assert cache.models() == MANIFEST
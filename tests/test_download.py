@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from core.download import DownloadError, ModelDownloader
+
+CHUNK = 64 * 1024
+# A fake GGUF: the magic and version, then filler. Five and a half chunks.
+CONTENT = b"GGUF" + (3).to_bytes(4, "little") + bytes(range(256)) * (CHUNK * 11 // 2 // 256)
+ETAG = '"fake-gguf-1"'
+
+
+class GGUFHandler(BaseHTTPRequestHandler):
+    """Serves CONTENT with HEAD and byte ranges, recording the ranges and how many overlap."""
+    ranges = []
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(CONTENT)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+
+    def do_GET(self):
+        cls = type(self)
+        start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", self.headers["Range"]).groups())
+        with cls.lock:
+            cls.ranges.append((start, end))
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            time.sleep(0.05)  # Long enough for the other connections to be in flight too
+            body = CONTENT[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(CONTENT)}")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gguf_url(http_server):
+    GGUFHandler.ranges, GGUFHandler.active, GGUFHandler.peak = [], 0, 0
+    return http_server(GGUFHandler).url + "/fake.Q4_0.gguf"
+
+
+def downloader(url, dest, **kwargs):
+    kwargs.setdefault("expected_md5", hashlib.md5(CONTENT).hexdigest())
+    return ModelDownloader(url, str(dest), expected_size=len(CONTENT), connections=4, chunk_size=CHUNK,
+                           retries=0, **kwargs)
+
+
+def test_parallel_ranges_download_and_verify(tmp_path, gguf_url):
+    dest = tmp_path / "fake.Q4_0.gguf"
+    phases = set()
+    path = downloader(gguf_url, dest, progress=lambda done, total, rate, phase: phases.add(phase)).run()
+
+    assert path == str(dest)
+    assert dest.read_bytes() == CONTENT
+    assert sorted(GGUFHandler.ranges) == [(s, min(s + CHUNK, len(CONTENT)) - 1) for s in range(0, len(CONTENT), CHUNK)]
+    assert GGUFHandler.peak > 1
+    assert phases == {"download", "verify"}
+    assert not os.path.exists(str(dest) + ".part") and not os.path.exists(str(dest) + ".part.json")
+
+
+def test_resume_skips_chunks_already_done(tmp_path, gguf_url):
+    dest = tmp_path / "fake.Q4_0.gguf"
+    part = bytearray(len(CONTENT))
+    part[:2 * CHUNK] = CONTENT[:2 * CHUNK]  # An earlier run got chunks 0 and 1
+    (tmp_path / "fake.Q4_0.gguf.part").write_bytes(bytes(part))
+    (tmp_path / "fake.Q4_0.gguf.part.json").write_text(json.dumps(
+        {"url": gguf_url, "size": len(CONTENT), "etag": ETAG, "chunk_size": CHUNK, "done": [0, 1]}))
+    messages = []
+
+    downloader(gguf_url, dest, status=messages.append).run()
+
+    assert dest.read_bytes() == CONTENT
+    assert min(start for start, _ in GGUFHandler.ranges) == 2 * CHUNK
+    assert len(GGUFHandler.ranges) == 4
+    assert any(m.startswith("Resuming download") for m in messages)
+
+
+def test_md5_mismatch_discards_the_download(tmp_path, gguf_url):
+    dest = tmp_path / "fake.Q4_0.gguf"
+    with pytest.raises(DownloadError, match="MD5 mismatch"):
+        downloader(gguf_url, dest, expected_md5="0" * 32).run()
+
+    assert not dest.exists()
+    assert not os.path.exists(str(dest) + ".part") and not os.path.exists(str(dest) + ".part.json")
+
+
+def test_unreachable_server_raises_download_error(tmp_path, http_server):
+    server = http_server(GGUFHandler)
+    url = server.url + "/fake.Q4_0.gguf"
+    server.shutdown()
+    server.server_close()  # Offline: nothing listens on that port any more
+
+    with pytest.raises(DownloadError):
+        ModelDownloader(url, str(tmp_path / "fake.Q4_0.gguf"), timeout=2, retries=0).run()
+    assert not (tmp_path / "fake.Q4_0.gguf").exists()
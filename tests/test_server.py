@@ -0,0 +1,179 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.config import ConfigManager
+from core.engine import ModelEngine
+from core.server import CompletionServer, FairQueue, Job, QueueFull
+from core.stub import StubGPT4All
+
+
+@pytest.fixture
+def completion_server(tmp_path, monkeypatch):
+    """
+    Starts a CompletionServer over the stub model on its own event loop thread
+    and returns it; `server.port` is the port it listens on. Stopped after the test.
+    """
+    monkeypatch.chdir(tmp_path)  # Caches and sessions land in the test's directory
+    running = []
+
+    def start(max_queue: int = 32) -> CompletionServer:
+        config = ConfigManager(str(tmp_path / "config.yaml"), read_only=True)
+        config.settings.metrics_path = ""
+        engine = ModelEngine(config, model_class=StubGPT4All)
+        assert engine.load_model(persist=False)
+        server = CompletionServer(engine, port=0, max_queue=max_queue)
+        server.generated = []  # Tokens produced per job, in the order the worker ran them
+        generate = engine.generate_stateless
+
+        def counting(*args, **kwargs):
+            server.generated.append(0)
+            for token in generate(*args, **kwargs):
+                server.generated[-1] += 1
+                yield token
+
+        engine.generate_stateless = counting
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(server.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        assert ready.wait(5)
+        running.append((server, loop))
+        return server
+
+    yield start
+    for server, loop in running:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+@pytest.fixture
+def slow_stub(monkeypatch):
+    """Stub replies of 40 tokens at 20 ms each: long enough to queue behind."""
+    monkeypatch.setattr(StubGPT4All, "token_delay", 0.02)
+    monkeypatch.setattr(StubGPT4All, "reply_tokens", 40)
+
+
+def post(server, body: dict, path: str = "/v1/chat/completions", headers: dict = None):
+    """Sends a request and returns the open connection and its response."""
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    conn.request("POST", path, json.dumps(body), dict({"Content-Type": "application/json"}, **(headers or {})))
+    return conn, conn.getresponse()
+
+
+def chat(prompt: str, **fields) -> dict:
+    return dict({"messages": [{"role": "user", "content": prompt}]}, **fields)
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_fair_queue_serves_clients_round_robin():
+    async def scenario():
+        queue = FairQueue(maxsize=5)
+        jobs = [Job(client, "chat", {"n": n}) for client, n in
+                [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("c", 1)]]
+        for job in jobs:
+            await queue.put(job)
+        with pytest.raises(QueueFull):
+            await queue.put(Job("d", "chat", {}))
+        jobs[3].cancelled.set()  # b hung up while queued: skipped
+        return [(job.client, job.body["n"]) for job in [await queue.get() for _ in range(4)]], len(queue)
+
+    order, left = asyncio.run(scenario())
+    assert order == [("a", 1), ("c", 1), ("a", 2), ("a", 3)]
+    assert left == 0
+
+
+def test_completion_matches_stream(completion_server):
+    server = completion_server()
+    _, response = post(server, chat("hello there"))
+    assert response.status == 200
+    full = json.loads(response.read())
+    text = full["choices"][0]["message"]["content"]
+    assert full["choices"][0]["finish_reason"] == "stop"
+    assert full["usage"]["completion_tokens"] == StubGPT4All.reply_tokens
+
+    _, response = post(server, chat("hello there", stream=True))
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "text/event-stream"
+    events = [line[len("data: "):] for line in response.read().decode().split("\n\n") if line]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event)["choices"][0] for event in events[:-1]]
+    assert chunks[0]["delta"] == {"role": "assistant"}
+    assert chunks[-1]["finish_reason"] == "stop"
+    assert "".join(c["delta"].get("content", "") for c in chunks) == text
+    assert len(chunks) == StubGPT4All.reply_tokens + 2
+
+
+def test_full_queue_answers_429(completion_server, slow_stub):
+    server = completion_server(max_queue=1)
+    running, response = post(server, chat("first", stream=True))
+    assert response.status == 200  # Headers come once the worker has picked the job up
+    with ThreadPoolExecutor(1) as pool:
+        queued = pool.submit(lambda: post(server, chat("second"))[1].status)
+        wait_for(lambda: len(server.queue) == 1)
+
+        _, rejected = post(server, chat("third"))
+        assert rejected.status == 429
+        assert rejected.getheader("Retry-After") == "1"
+        assert "queue is full" in json.loads(rejected.read())["error"]["message"]
+
+        response.read()
+        assert queued.result(10) == 200
+    running.close()
+    assert len(server.generated) == 2
+
+
+def test_hang_up_cancels_running_and_queued_jobs(completion_server, slow_stub):
+    server = completion_server()
+    running, response = post(server, chat("long reply", stream=True))
+    assert response.status == 200
+    response.fp.readline()  # The first event: generation is under way
+
+    waiting = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    waiting.request("POST", "/v1/chat/completions", json.dumps(chat("never answered")),
+                    {"Content-Type": "application/json"})
+    wait_for(lambda: len(server.queue) == 1)
+    waiting.close()  # Gone while queued
+    response.close()
+    running.close()  # Gone mid-reply
+
+    wait_for(lambda: server.completed == 1)
+    assert server.generated[0] < StubGPT4All.reply_tokens  # Decoding stopped early
+    _, response = post(server, chat("next"))
+    assert response.status == 200
+    response.read()
+    assert len(server.generated) == 2  # The queued job never ran
+
+
+def test_concurrent_clients_all_served(completion_server):
+    server = completion_server()
+    clients, per_client = 4, 6
+
+    def request(n):
+        conn, response = post(server, chat(f"prompt {n}", stream=n % 2 == 0), headers={"X-Client-Id": f"c{n % clients}"})
+        body = response.read()
+        conn.close()
+        return response.status, body
+
+    with ThreadPoolExecutor(clients * per_client) as pool:
+        results = list(pool.map(request, range(clients * per_client)))
+    assert [status for status, _ in results] == [200] * (clients * per_client)
+    assert server.completed == clients * per_client
+    assert server.generated == [StubGPT4All.reply_tokens] * (clients * per_client)